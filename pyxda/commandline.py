@@ -16,14 +16,10 @@
 
 import sys
 import os
+import argparse
 
-def main():
-    '''
-    args = sys.argv
-    if len(args) == 2 and args[1] == '--rawviewer':
-        os.system("python rawviewer/controlpanel.py")    
-    else:
-    '''
+def banner():
+    '''Prints the list of commands'''
     print ' ___________________________________________________'    
     print '|                                                   |'
     print '|                                                   |'
@@ -32,6 +28,96 @@ def main():
     print '|                                                   |'
     print '|  Command:                                         |'
     print '|  rawviewer                 opens Raw Viewer       |'
-    print '|                                                   |'
+    print '|  pyxda reduce <dir>        reduces frames without |'
+    print '|                            a display              |'
+    print '|  pyxda convert <dir> <h5>  packs frames into one  |'
+    print '|                            HDF5 stack             |'
     print '|                                                   |'
     print '|___________________________________________________|'    
+
+def reduce(args):
+    '''Runs the headless reduction of the reduce subcommand'''
+    # Imported here so that the banner does not need numpy.
+    from pyxda.rawviewer.batch import reduceDirectory
+    try:
+        info = reduceDirectory(args.dirpath, args.output, args.nprocs,
+                               args.pattern, not args.nocache, args.metadata,
+                               args.order, args.dark, args.mask)
+    except (IOError, OSError, ValueError) as msg:
+        print >> sys.stderr, 'pyxda reduce: %s' % msg
+        return 1
+    print 'Wrote %s' % info['output']
+    print '%d frames in %.2f s: %.1f frames/s, %.1f MB/s' % (info['frames'],
+            info['seconds'], info['framespersecond'], info['mbpersecond'])
+    return 0
+
+def convert(args):
+    '''Runs the HDF5 stack conversion of the convert subcommand'''
+    from pyxda.rawviewer.batch import convertDirectory
+    try:
+        info = convertDirectory(args.dirpath, args.output, args.pattern,
+                                args.order, args.compression or None)
+    except (IOError, OSError, ValueError) as msg:
+        print >> sys.stderr, 'pyxda convert: %s' % msg
+        return 1
+    print 'Wrote %s' % info['output']
+    print '%d frames in %.2f s, %.1fx smaller' % (info['frames'],
+            info['seconds'], info['ratio'])
+    return 0
+
+def main():
+    '''
+    args = sys.argv
+    if len(args) == 2 and args[1] == '--rawviewer':
+        os.system("python rawviewer/controlpanel.py")    
+    else:
+    '''
+    if len(sys.argv) < 2:
+        banner()
+        return 0
+
+    parser = argparse.ArgumentParser(prog='pyxda')
+    commands = parser.add_subparsers()
+    cmd = commands.add_parser('reduce',
+            help='compute reduced representations of every frame')
+    cmd.add_argument('dirpath', 
+            help='folder containing the frames, or an HDF5 stack')
+    cmd.add_argument('-o', '--output', 
+            help='output file, .h5 for HDF5, CSV otherwise '
+                 '(default: <dirpath>/rr.csv)')
+    cmd.add_argument('-j', '--nprocs', type=int, 
+            help='number of worker processes (default: all cores)')
+    cmd.add_argument('--pattern', default='*.tif',
+            help='shell pattern of the frame files (default: *.tif)')
+    cmd.add_argument('--nocache', action='store_true',
+            help='do not use the persistent RR cache')
+    cmd.add_argument('--metadata', action='store_true',
+            help='add the .metadata entries as columns')
+    cmd.add_argument('--order', choices=('natural', 'imageNumber'),
+            default='natural',
+            help='order frames by file name or by the imageNumber '
+                 'metadata entry (default: natural)')
+    cmd.add_argument('--dark', nargs='+', metavar='FRAME',
+            help='subtract this dark frame, or the median of these frames, '
+                 'from every frame')
+    cmd.add_argument('--mask', metavar='FILE',
+            help='leave out the nonzero pixels of this mask image or .npy '
+                 'file')
+    cmd.set_defaults(func=reduce)
+    cmd = commands.add_parser('convert',
+            help='pack the frames of a folder into one HDF5 stack')
+    cmd.add_argument('dirpath', help='folder containing the frames')
+    cmd.add_argument('output', help='output .h5 file')
+    cmd.add_argument('--pattern', default='*.tif',
+            help='shell pattern of the frame files (default: *.tif)')
+    cmd.add_argument('--order', choices=('natural', 'imageNumber'),
+            default='natural',
+            help='order frames by file name or by the imageNumber '
+                 'metadata entry (default: natural)')
+    cmd.add_argument('--compression', choices=('gzip', 'lzf', ''),
+            default='lzf',
+            help='compression of the frames, empty for none; lzf reads '
+                 'fastest, gzip is readable without h5py (default: lzf)')
+    cmd.set_defaults(func=convert)
+    args = parser.parse_args()
+    return args.func(args)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import os
+import csv
+import time
+
+from rrengine import RREngine
+from rrcache import RRCache
+from reduction import SCALARFIELDS
+from metadata import MetadataTable
+from scanner import scanDataset, listFrames
+from stack import writeStack, splitStackPath, frameName
+from tiffreader import readFrame
+from correction import loadDark
+from mask import loadMask
+
+def writeCSV(path, rows, columns, info):
+    '''Writes per-frame results to a CSV file
+
+    Args:
+        path:    Output file path.
+        rows:    List of row tuples.
+        columns: Column names.
+        info:    Dict of run information written as leading comment lines.
+    '''
+
+    with open(path, 'wb') as fp:
+        for key in sorted(info):
+            fp.write('# %s: %s\n' % (key, info[key]))
+        writer = csv.writer(fp)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return
+
+def writeHDF5(path, rows, columns, info):
+    '''Writes per-frame results to an HDF5 file
+
+    Every column becomes a dataset in the root group and the run information
+    is stored as attributes of the file. Requires h5py.
+
+    Args:
+        path:    Output file path.
+        rows:    List of row tuples.
+        columns: Column names.
+        info:    Dict of run information.
+    '''
+
+    import h5py
+    import numpy as np
+    with h5py.File(path, 'w') as fp:
+        for i, name in enumerate(columns):
+            values = [row[i] for row in rows]
+            if values and isinstance(values[0], basestring):
+                values = np.array(values, dtype='S')
+            fp.create_dataset(name, data=np.array(values))
+        for key, value in info.items():
+            fp.attrs[key] = value
+    return
+
+def reduceDirectory(dirpath, output=None, nprocs=None, pattern='*.tif',
+                    usecache=True, metadata=False, order='natural',
+                    dark=None, mask=None):
+    '''Reduces every frame of a directory without a display
+
+    Args:
+        dirpath:  The folder path containing the frames, or an HDF5 stack,
+                  see stack.py.
+        output:   Output file path. Files ending in .h5 or .hdf5 are written
+                  as HDF5, anything else as CSV. Defaults to rr.csv in
+                  dirpath, or next to the stack.
+        nprocs:   Number of worker processes. Defaults to the number of
+                  cores.
+        pattern:  Shell pattern of the frame file names.
+        usecache: Read and update the persistent RR cache of the directory.
+        metadata: Add the .metadata sidecar entries as extra columns.
+        order:    Frame order, see scanner.scanDirectory.
+        dark:     File paths of dark frames subtracted from every frame,
+                  see correction.loadDark.
+        mask:     File path of a pixel mask, see mask.loadMask.
+    Returns:
+        A dict with the run information, including the throughput.
+    Exceptions:
+        IOError: dirpath holds no frames.
+        OSError: dirpath can not be listed.
+        ValueError: The dark frames or the mask do not fit the frames.
+    '''
+
+    mdtable = MetadataTable()
+    paths, sizes, mtimes = [], [], []
+    for batch in scanDataset(dirpath, pattern, order, mdtable):
+        paths += batch[0]
+        sizes += batch[1]
+        mtimes += batch[2]
+    if not paths:
+        raise IOError('No frames matching %s in %s' % (pattern, dirpath))
+    if not output:
+        outdir = dirpath if os.path.isdir(dirpath) else \
+                    os.path.dirname(os.path.abspath(dirpath))
+        output = os.path.join(outdir, 'rr.csv')
+
+    engine = RREngine(nprocs)
+    if dark:
+        engine.correction = loadDark(dark)
+    if mask:
+        engine.mask = loadMask(mask)
+    cache = RRCache(dirpath) if usecache else None
+    start = time.time()
+    rows = []
+    try:
+        statsiter = engine.imap(paths, cache=cache, keys=zip(sizes, mtimes))
+        for i, stats in enumerate(statsiter):
+            rows.append((i, paths[i], frameName(paths[i])) +
+                        tuple(stats[f].item() for f in SCALARFIELDS))
+    finally:
+        engine.close()
+        if cache is not None:
+            cache.close()
+    elapsed = max(time.time() - start, 1e-9)
+    # The frames of a stack all carry the size of its file.
+    filesizes = {}
+    for path, size in zip(paths, sizes):
+        split = splitStackPath(path)
+        filesizes[split[0] if split else path] = size
+    nbytes = sum(filesizes.values())
+    columns = ['index', 'path', 'name'] + list(SCALARFIELDS)
+
+    if metadata:
+        mds = mdtable.parseAll(paths, nprocs)
+        keys = sorted(set(key for md in mds for key in md))
+        columns += keys
+        rows = [row + tuple(md.get(key, '') for key in keys)
+                for row, md in zip(rows, mds)]
+
+    info = {'dirpath': os.path.abspath(dirpath),
+            'frames': len(paths),
+            'nprocs': engine.nprocs,
+            'dark': engine.correction.key if dark else '',
+            'mask': engine.mask.key if mask else '',
+            'seconds': elapsed,
+            'framespersecond': len(paths) / elapsed,
+            'mbpersecond': nbytes / 2.0**20 / elapsed,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+    if os.path.splitext(output)[1].lower() in ('.h5', '.hdf5'):
+        writeHDF5(output, rows, columns, info)
+    else:
+        writeCSV(output, rows, columns, info)
+    info['output'] = output
+    return info
+
+def convertDirectory(dirpath, output, pattern='*.tif', order='natural',
+                     compression='lzf'):
+    '''Converts the frames of a directory into an HDF5 stack
+
+    The frames are written in the given order, one compressed chunk per
+    frame, with their .metadata sidecars as columns, see stack.writeStack.
+    The stack can then be opened and reduced in place of the directory.
+
+    Args:
+        dirpath:     The folder path containing the frames.
+        output:      Output file path, ending in .h5 or .hdf5.
+        pattern:     Shell pattern of the frame file names.
+        order:       Frame order, see scanner.scanDirectory.
+        compression: h5py compression filter, or None.
+    Returns:
+        A dict with the run information.
+    Exceptions:
+        IOError:    dirpath holds no frames.
+        OSError:    dirpath can not be listed.
+        ValueError: The frames differ in shape or type.
+    '''
+
+    paths = listFrames(dirpath, pattern, order)
+    if not paths:
+        raise IOError('No frames matching %s in %s' % (pattern, dirpath))
+    start = time.time()
+    mds = MetadataTable().parseAll(paths)
+    names = [os.path.basename(path) for path in paths]
+    frames = (readFrame(path) for path in paths)
+    writeStack(output, frames, names, mds, compression)
+    elapsed = max(time.time() - start, 1e-9)
+    nbytes = sum(os.path.getsize(path) for path in paths)
+    return {'dirpath': os.path.abspath(dirpath),
+            'output': output,
+            'frames': len(paths),
+            'seconds': elapsed,
+            'ratio': nbytes / float(max(os.path.getsize(output), 1))}
@@ -14,10 +14,14 @@
 #
 ##############################################################################
 
-from traits.api import HasTraits, Directory, Button, Int, Str, Enum, CStr
+from traits.api import HasTraits, Directory, Button, Int, Str, Enum, CStr, \
+                        Range, Bool, File, Float
 from enthought.traits.ui.api import View, Item, Group, HGroup, \
                                         DirectoryEditor, TitleEditor, VGrid, \
                                         UItem
+import multiprocessing
+
+from pixelstats import IMAGES
 
 class ControlPanel(HasTraits):
     '''Module that contains GUI widgets
@@ -33,19 +37,44 @@ class ControlPanel(HasTraits):
     right_arrow = Button('>')
     reset = Button('Reset')
     generate = Button('Generate Reduced Representation Map')
+    cancel = Button('Cancel')
+    dumpmetrics = Button('Dump Metrics')
     dirpath = Directory()
+    live = Bool(False)
+    stackpath = File(filter=['*.h5', '*.hdf5'])
+    darkpath = File()
+    maskpath = File()
+    clearmask = Button('Clear Mask')
+    beamx = Float(-1.0)
+    beamy = Float(-1.0)
+    distance = Float(0.0)
+    pixelsize = Float(0.2)
     spacer = Str('              ')
     index = Int(0)
     of = Str('of')
     datalistlength = Int(0) 
     rrchoice = Enum('Choose a Reduced Representation', 'Total Intensity', 
                     'Mean', 'Standard Deviation', 'Pixels Above Upper Bound', 
-                    'Pixels Below Lower Bound')
+                    'Pixels Below Lower Bound', 'Frame Difference',
+                    'Frame Correlation')
+    nprocs = Range(1, multiprocessing.cpu_count(), 
+                   multiprocessing.cpu_count())
+    stackimage = Enum(*IMAGES)
+    showstack = Button('Show Stack Image')
+    cachesize = Int(2048)
     filename = Str('')
+    roistats = Str('')
     messageLog = CStr('')
 
     group = Group(
                 Item('dirpath', editor=DirectoryEditor(), show_label=False),
+                Item('live', label = 'Live mode'),
+                Item('stackpath', label = 'HDF5 stack'),
+                Item('darkpath', label = 'Dark frame'),
+                HGroup(
+                    Item('maskpath', label = 'Mask'),
+                    Item('clearmask', show_label = False),
+                      ),
                 HGroup(
                     HGroup(
                         Item('left_arrow', show_label = False), 
@@ -62,9 +91,28 @@ class ControlPanel(HasTraits):
                         padding = 5
                           ) 
                       ),
+                HGroup(
+                    Item('beamx', label = 'Beam x'),
+                    Item('beamy', label = 'y'),
+                      ),
+                HGroup(
+                    Item('distance', label = 'Distance (mm)'),
+                    Item('pixelsize', label = 'Pixel (mm)'),
+                      ),
                 Item('rrchoice', show_label = False),
-                Item('generate', show_label = False),
+                Item('nprocs', label = 'Workers'),
+                Item('cachesize', label = 'Cache (MB)'),
+                HGroup(
+                    Item('generate', show_label = False),
+                    Item('cancel', show_label = False),
+                      ),
+                HGroup(
+                    Item('stackimage', show_label = False),
+                    Item('showstack', show_label = False),
+                      ),
+                Item('dumpmetrics', show_label = False),
                 UItem('filename', style = 'readonly'),
+                UItem('roistats', style = 'readonly'),
                 show_border = True,
             )
     
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import hashlib
+
+import numpy as np
+
+from tiffreader import readFrame
+
+class DarkCorrection(object):
+    '''Dark current or background subtraction applied to frames on load
+
+    The reference frame stays in memory, and a copy converted to the pixel
+    type of the frames is made once per type, so correcting a frame is a
+    single in place subtraction. Unsigned frames are clipped at zero rather
+    than wrapping around.
+    '''
+
+    def __init__(self, dark):
+        '''Constructor called when a DarkCorrection object is initialized
+
+        Args:
+            dark: 2D ndarray with the reference frame.
+        '''
+
+        self.dark = np.array(dark, dtype=np.float64)
+        # Identifies the reference, e.g. for cached statistics.
+        self.key = hashlib.md5(str(self.dark.shape) +
+                               self.dark.tostring()).hexdigest()
+        self._refs = {}
+        return
+
+    def __str__(self):
+        return 'Dark Correction: %dx%d frame %s' % (self.dark.shape +
+                                                     (self.key[:8],))
+
+    def reference(self, dtype):
+        '''Returns the reference frame converted to dtype'''
+
+        dtype = np.dtype(dtype)
+        ref = self._refs.get(dtype)
+        if ref is None:
+            ref = self.dark
+            if dtype.kind in 'ui':
+                info = np.iinfo(dtype)
+                ref = np.clip(np.rint(ref), info.min, info.max)
+            self._refs[dtype] = ref = ref.astype(dtype)
+        return ref
+
+    def apply(self, data):
+        '''Subtracts the reference frame from a frame
+
+        Args:
+            data: 2D ndarray with the frame pixels. It is corrected in place
+                  when writable, read-only frames such as memory maps are
+                  copied first.
+        Returns:
+            The corrected frame, of the same type as data.
+        Exceptions:
+            ValueError: The frame and the reference differ in shape.
+        '''
+
+        if data.shape != self.dark.shape:
+            raise ValueError('Frame shape %s does not match dark frame %s'
+                             % (data.shape, self.dark.shape))
+        out = data if data.flags.writeable else np.array(data)
+        ref = self.reference(out.dtype)
+        if out.dtype.kind == 'u':
+            np.maximum(out, ref, out=out)
+        np.subtract(out, ref, out=out)
+        return out
+
+def loadDark(paths):
+    '''Builds a DarkCorrection from one or more reference frames
+
+    Args:
+        paths: File paths of the reference frames. With more than one frame
+               their pixelwise median is used.
+    Returns:
+        A DarkCorrection.
+    Exceptions:
+        ValueError: No paths are given or the frames differ in shape.
+    '''
+
+    if not paths:
+        raise ValueError('No dark frames given')
+    if len(paths) == 1:
+        return DarkCorrection(readFrame(paths[0]))
+    frames = [readFrame(path) for path in paths]
+    if len(set(frame.shape for frame in frames)) > 1:
+        raise ValueError('Dark frames differ in shape')
+    return DarkCorrection(np.median(np.array(frames), axis=0))
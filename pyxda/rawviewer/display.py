@@ -20,19 +20,25 @@ from chaco.tools.api import PanTool, ZoomTool, LineInspector, ScatterInspector,
 
 from chaco.api import ArrayPlotData, Plot, jet, BaseTool, add_default_axes, \
                         add_default_grids, ScatterInspectorOverlay, BarPlot, \
-                        LinearMapper, ColorBar, ToolbarPlot
+                        LinearMapper, ColorBar, ToolbarPlot, AbstractOverlay
 
 from enable.api import BaseTool, KeySpec, ColorTrait, KeySpec
 from traits.api import Any, HasTraits, Instance, Tuple, Int, Event, Float, Property, \
                 cached_property, Str
 
 import numpy as np
+import time
 
+from rrbuffer import RRBuffer
+from pyramid import selectLevel
 
 ####################
 # TODO: globalize size
 SIZE = 12
 
+# Maximum number of redraws per second of a growing RR plot.
+RRREDRAWRATE = 10.0
+
 ####################
 
 class KBInputTool(BaseTool):
@@ -49,6 +55,63 @@ class KBInputTool(BaseTool):
             print 'Right Arrow'
             self.arrow_cb(self, 1)
 
+class MaskTool(BaseTool):
+    '''Masks the rectangle dragged out with the right mouse button'''
+
+    mask_cb = Any()
+    start = Any()
+
+    def normal_right_down(self, event):
+        self.start = self.component.map_data((event.x, event.y))
+        self.event_state = 'masking'
+        event.handled = True
+
+    def masking_right_up(self, event):
+        x1, y1 = self.component.map_data((event.x, event.y))
+        x0, y0 = self.start
+        self.event_state = 'normal'
+        self.mask_cb(self, (x0, y0, x1, y1))
+        event.handled = True
+
+class RoiTool(AbstractOverlay):
+    '''Reports the rectangle dragged out with shift and the left mouse button
+    
+    The callback is called on every mouse move during the drag, with the
+    rectangle in data coordinates, and the rectangle is drawn on the plot.
+    '''
+
+    roi_cb = Any()
+    start = Any()
+    end = Any()
+
+    def normal_left_down(self, event):
+        if not event.shift_down:
+            return
+        self.start = self.end = self.component.map_data((event.x, event.y))
+        self.event_state = 'selecting'
+        event.handled = True
+
+    def selecting_mouse_move(self, event):
+        self.end = self.component.map_data((event.x, event.y))
+        self.roi_cb(self, tuple(self.start) + tuple(self.end))
+        self.component.request_redraw()
+        event.handled = True
+
+    def selecting_left_up(self, event):
+        self.selecting_mouse_move(event)
+        self.event_state = 'normal'
+
+    def overlay(self, component, gc, view_bounds=None, mode='normal'):
+        if self.start is None:
+            return
+        (x0, y0), (x1, y1) = component.map_screen(np.array([self.start,
+                                                            self.end]))
+        with gc:
+            gc.set_stroke_color((1.0, 1.0, 1.0, 1.0))
+            gc.set_line_width(1)
+            gc.rect(min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0))
+            gc.stroke_path()
+
 class MyLineDrawer(LineSegmentTool):
     """
     This class demonstrates how to customize the behavior of the
@@ -65,7 +128,10 @@ class Display(HasTraits, object):
     def __init__(self, queue, **kwargs):
         super(Display, self).__init__()
         self.jobqueue = queue
+        self.image = None
+        self.level = None
         self.add_trait('filename', Int())
+        self.add_trait('roistats', Str(''))
     
     def _arrow_callback(self, tool, n):
         if n == 1:
@@ -73,6 +139,17 @@ class Display(HasTraits, object):
         else:
             self.jobqueue.put(['updatecache', ['left']])
 
+    def _roi_callback(self, tool, rect):
+        image = self.image
+        if image is None or image.data is None or image.n < 0:
+            return
+        s = image.roiStats(*rect)
+        self.roistats = 'ROI: %d px, sum %g, mean %g, std %g' % (s['n'],
+                            s['sum'], s['mean'], s['std'])
+
+    def _mask_callback(self, tool, rect):
+        self.jobqueue.put(['maskrect', list(rect)])
+
     def _metadata_handler(self):
         sel_indices = self.index_datasource.metadata.get('selections', [])
         hover_indices = self.index_datasource.metadata.get('hover', [])
@@ -92,7 +169,12 @@ class Display(HasTraits, object):
         '''plot one image
         image:     Image object
         plot:      plot instance to be update, if None, a plot instance will be created
-        return:    plot instance'''
+        return:    plot instance
+
+        Only the pyramid level matching the plot size on screen and the
+        current zoom is handed to the plot, see pyramid.selectLevel. The plot
+        axes stay in full resolution pixel coordinates for every level.'''
+        self.image = image
         if plot == None:
             pd = ArrayPlotData()
             pd.set_data('imagedata', image.data)
@@ -107,20 +189,66 @@ class Display(HasTraits, object):
             # TODO: mess with color maps on else block    
             imgPlot = plot.img_plot("imagedata", colormap=jet, name='image')[0]
             self.imgPlot = imgPlot
+            self.level = None
             self._appendImageTools(imgPlot)
+            plot.index_range.on_trait_change(self._viewChanged, 'updated')
+            plot.on_trait_change(self._viewChanged, 'bounds')
             #plot.overlays.append(MyLineDrawer(plot))
         else:
-            plot.data.set_data('imagedata', image.data)
             imgPlot = plot.plots['image'][0]
+            self.level = None
+            self.roistats = ''
+            self._showLevel(plot)
             #plot.title = image.name
         plot.aspect_ratio = float(image.data.shape[1]) / image.data.shape[0]
         plot.invalidate_draw()
         return plot
 
+    def _viewChanged(self):
+        self._showLevel(self.imageplot)
+        return
+
+    def _showLevel(self, plot):
+        '''hand the pyramid level matching the current view to the plot'''
+        image = self.image
+        if image is None or image.data is None:
+            return
+        levels = image.pyramid()
+        h, w = image.data.shape
+        xr, yr = plot.index_range, plot.value_range
+        visible = (min(xr.high, w) - max(xr.low, 0),
+                   min(yr.high, h) - max(yr.low, 0))
+        if visible[0] <= 0 or visible[1] <= 0:
+            visible = (w, h)
+        level = selectLevel(len(levels), visible, plot.bounds)
+        if level == self.level:
+            return
+        self.level = level
+        data = levels[level]
+        # Each level pixel spans 2**level full resolution pixels.
+        imgPlot = plot.plots['image'][0]
+        scale = 2 ** level
+        imgPlot.index.set_data(np.arange(data.shape[1] + 1) * scale,
+                               np.arange(data.shape[0] + 1) * scale)
+        plot.data.set_data('imagedata', data)
+        plot.invalidate_draw()
+        return
+
     def plotRRMap(self, rr, rrchoice, plot=None):
+        '''plot reduced representation values
+        rr:        value or array of values to append, or None
+        rrchoice:  name of the reduced representation
+        plot:      plot instance to be update, if None, a plot instance will be created
+        return:    plot instance
+
+        Values are collected in an RRBuffer and the plot data is only updated
+        RRREDRAWRATE times per second. Call flushRRMap once all values are
+        appended.'''
         if plot == None:
             pd = ArrayPlotData(y=np.array([0]), x=np.array([0]))
             plot = Plot(pd, padding=(70, 5, 0, 0))
+            plot.rrbuffer = RRBuffer()
+            plot.rrflushed = 0.0
             self._setData(rr, plot)
             plot.plot(('x', 'y'), name='rrplot', type="scatter", color='green',
                       marker="circle", marker_size=6)
@@ -133,27 +261,42 @@ class Display(HasTraits, object):
             #left, bottom = add_default_axes(plot)
             hgrid, vgrid = add_default_grids(plot)
             self._appendCMapTools(plot)
+            self.flushRRMap(plot)
         else:
             self._setData(rr, plot)
-        plot.request_redraw()
         return plot
 
     def _setData(self, rr, plot):
-        if rr == None:
+        if rr is None:
             return
-        ydata = plot.data.get_data('y')
-        if len(ydata) == 1 and ydata[0] == 0:
-            ydata = np.array([rr])
-        else:
-            ydata = np.append(ydata, [rr])
-            plot.data.set_data('x', range(len(ydata)))
-        plot.data.set_data('y', ydata)
-        #print rr
-        #print plot.data.get_data('y')
-        #print plot.data.get_data('x')
+        plot.rrbuffer.append(rr)
+        if time.time() - plot.rrflushed >= 1.0 / RRREDRAWRATE:
+            self.flushRRMap(plot)
         return
 
-    def plotHistogram(self, image, plot=None):
+    def clearRRMap(self, plot):
+        '''remove all values from a reduced representation plot'''
+        plot.rrbuffer = RRBuffer()
+        plot.data.update_data(x=np.array([0]), y=np.array([0]))
+        plot.rrflushed = time.time()
+        plot.request_redraw()
+        return
+
+    def flushRRMap(self, plot):
+        '''hand all buffered values to the plot and redraw it'''
+        buf = plot.rrbuffer
+        if len(buf) > 0:
+            plot.data.update_data(x=buf.index, y=buf.values)
+        plot.rrflushed = time.time()
+        plot.request_redraw()
+        return
+
+    def plotHistogram(self, image, plot=None, exact=True):
+        '''plot the histogram of an image
+        image:     Image object
+        plot:      plot instance to be update, if None, a plot instance will be created
+        exact:     if False a sampled histogram may be plotted
+        return:    plot instance'''
         if plot == None:
             pd = ArrayPlotData(y=np.array([0]), x=np.array([0]))
             plot = Plot(pd, padding=(70, 10, 0, 0))
@@ -170,9 +313,8 @@ class Display(HasTraits, object):
             plot.overlays.append(PlotAxis(plot, orientation='bottom'))
             '''
         else:
-            data = np.histogram(image.data, bins=10000)
-            index = np.delete(data[1], data[1].size-1)
-            values = data[0]
+            values, edges = image.histogram(exact)
+            index = edges[:-1]
             
             plot.index_range.low= np.min(index)
             plot.index_range.high = np.max(index)
@@ -185,6 +327,33 @@ class Display(HasTraits, object):
         return plot
 
 
+    def plotIntegration(self, radial=None, intensity=None, unit='',
+                        plot=None):
+        '''plot the azimuthally integrated pattern of an image
+        radial:    bin centres of the pattern, if None only a plot is created
+        intensity: mean intensity of every bin
+        unit:      name of the radial coordinate
+        plot:      plot instance to be update, if None, a plot instance will be created
+        return:    plot instance'''
+        if plot == None:
+            pd = ArrayPlotData(y=np.array([0]), x=np.array([0]))
+            plot = Plot(pd, padding=(70, 10, 0, 0))
+            plot.plot(('x', 'y'), name='1D Cut', type='line', color='blue')
+            plot.bgcolor = "white"
+            plot.fixed_preferred_size = (100, 30)
+            add_default_grids(plot)
+            plot.value_axis.title = "1D Cut"
+        if radial is not None:
+            plot.index_range.low = radial[0]
+            plot.index_range.high = radial[-1]
+            plot.value_range.low = np.min(intensity)
+            plot.value_range.high = np.max(intensity)
+            plot.data.set_data('x', radial)
+            plot.data.set_data('y', intensity)
+            plot.index_axis.title = unit
+        plot.request_redraw()
+        return plot
+
     def _appendImageTools(self, plot):
         '''append xy position, zoom, pan tools to plot
         '''
@@ -201,6 +370,8 @@ class Display(HasTraits, object):
         plot.overlays.append(zoom)
         plot.zoom = zoom
         plot.tools.append(KBInputTool(plot, arrow_cb=self._arrow_callback))
+        plot.tools.append(MaskTool(plot, mask_cb=self._mask_callback))
+        plot.overlays.append(RoiTool(plot, roi_cb=self._roi_callback))
         #plot.overlays.append(MyLineDrawer(plot))
 
         colormap = plot.color_mapper
@@ -254,8 +425,11 @@ class Display(HasTraits, object):
         return
 
     def _selection_changed(self):
+        selection = self.range_selection.selection
         print 'Region highlighted'
-        print self.range_selection._selection
+        print selection
+        if selection is not None:
+            self.jobqueue.put(['setbounds', list(selection)])
         return
 
 
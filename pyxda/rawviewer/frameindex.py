@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import sys
+import threading
+import weakref
+
+import numpy as np
+
+from imagecontainer import Image
+from stack import frameName
+
+class FrameIndex(object):
+    '''Compact index of the frames of a dataset
+
+    All paths are kept in a single byte string table addressed by an offset
+    array, and file sizes and modification times in numpy arrays, all grown
+    by doubling their capacity. Image handles are only created when a frame
+    is indexed. A handle stays the same object for as long as anything, such
+    as the image cache, still refers to it.
+    '''
+
+    def __init__(self, mdtable=None, capacity=1024):
+        '''Constructor called when a FrameIndex object is initialized
+
+        Args:
+            mdtable:  MetadataTable handed to the Image handles.
+            capacity: Number of frames to preallocate room for.
+        '''
+
+        self.mdtable = mdtable
+        self.correction = None
+        self.mask = None
+        self.size = 0
+        self._names = bytearray()
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._sizes = np.empty(capacity, dtype=np.int64)
+        self._mtimes = np.empty(capacity, dtype=np.float64)
+        self._handles = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        return
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for i in xrange(self.size):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(self.size))]
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('frame index out of range')
+        with self.lock:
+            image = self._handles.get(i)
+            if image is None:
+                image = Image(i, self.path(i), self.mdtable,
+                              self.correction, self.mask)
+                self._handles[i] = image
+        return image
+
+    def setCorrection(self, correction):
+        '''Sets the DarkCorrection applied when frames are loaded
+
+        Existing handles are updated as well. Frames that are already loaded
+        keep their data until it is released.
+
+        Args:
+            correction: A DarkCorrection, or None for raw frames.
+        '''
+
+        self._setHandles('correction', correction)
+        return
+
+    def setMask(self, mask):
+        '''Sets the PixelMask of the frames
+
+        Existing handles are updated as well.
+
+        Args:
+            mask: A PixelMask, or None to use all pixels.
+        '''
+
+        self._setHandles('mask', mask)
+        return
+
+    def _setHandles(self, attr, value):
+        with self.lock:
+            setattr(self, attr, value)
+            for image in self._handles.values():
+                setattr(image, attr, value)
+        return
+
+    @property
+    def capacity(self):
+        return len(self._sizes)
+
+    @property
+    def sizes(self):
+        '''View of the file sizes in bytes, -1 where unknown'''
+        return self._sizes[:self.size]
+
+    @property
+    def mtimes(self):
+        '''View of the file modification times, NaN where unknown'''
+        return self._mtimes[:self.size]
+
+    @property
+    def nbytes(self):
+        '''Number of bytes held by the index tables'''
+        return (len(self._names) + self._offsets.nbytes + self._sizes.nbytes
+                + self._mtimes.nbytes)
+
+    def path(self, i):
+        '''Returns the file path of frame i'''
+        start, end = self._offsets[i:i+2]
+        return str(self._names[start:end])
+
+    def name(self, i):
+        '''Returns the file name of frame i, see stack.frameName'''
+        return frameName(self.path(i))
+
+    def paths(self, start=0, stop=None):
+        '''Returns the file paths of frames start to stop as a list'''
+        start, stop, step = slice(start, stop).indices(self.size)
+        offsets = self._offsets[start:stop+1].tolist()
+        names = str(self._names[offsets[0]:offsets[-1]]) if offsets else ''
+        base = offsets[0] if offsets else 0
+        return [names[a-base:b-base] for a, b in zip(offsets, offsets[1:])]
+
+    def keys(self, start=0, stop=None):
+        '''Returns the (size, mtime) of frames start to stop as a list
+
+        Frames whose file could not be stat'ed have None instead.
+        '''
+        sizes = self.sizes[start:stop].tolist()
+        mtimes = self.mtimes[start:stop].tolist()
+        return [(size, mtime) if size >= 0 else None
+                for size, mtime in zip(sizes, mtimes)]
+
+    def extend(self, paths, sizes=None, mtimes=None):
+        '''Appends frames in bulk
+
+        Args:
+            paths:  List of frame file paths.
+            sizes:  File sizes of the frames. Read from the files if omitted.
+            mtimes: Modification times of the frames. Read from the files if
+                    omitted.
+        Returns:
+            The index of the first appended frame.
+        '''
+
+        encoding = sys.getfilesystemencoding()
+        paths = [p.encode(encoding) if isinstance(p, unicode) else p
+                 for p in paths]
+        if sizes is None or mtimes is None:
+            sizes = []
+            mtimes = []
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                    sizes.append(st.st_size)
+                    mtimes.append(st.st_mtime)
+                except OSError:
+                    sizes.append(-1)
+                    mtimes.append(np.nan)
+
+        with self.lock:
+            start = self.size
+            end = start + len(paths)
+            if end > self.capacity:
+                self._grow(end)
+            lengths = np.fromiter((len(p) for p in paths), np.int64,
+                                  len(paths))
+            self._offsets[start+1:end+1] = (self._offsets[start]
+                                            + np.cumsum(lengths))
+            self._names.extend(''.join(paths))
+            self._sizes[start:end] = sizes
+            self._mtimes[start:end] = mtimes
+            self.size = end
+        return start
+
+    def append(self, path, size=None, mtime=None):
+        '''Appends one frame, see extend'''
+        if size is None or mtime is None:
+            return self.extend([path])
+        return self.extend([path], [size], [mtime])
+
+    def _grow(self, end):
+        capacity = max(self.capacity, 1)
+        while capacity < end:
+            capacity *= 2
+        offsets = np.zeros(capacity + 1, dtype=np.int64)
+        offsets[:self.size+1] = self._offsets[:self.size+1]
+        self._offsets = offsets
+        for attr in ('_sizes', '_mtimes'):
+            old = getattr(self, attr)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, attr, grown)
+        return
+
+    def clear(self):
+        '''Removes all frames'''
+
+        with self.lock:
+            self.size = 0
+            self._names = bytearray()
+            self._offsets[0] = 0
+            self._handles.clear()
+        return
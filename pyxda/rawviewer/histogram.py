@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import numpy as np
+
+# Number of bins of the histogram panel.
+HISTBINS = 10000
+
+# Number of pixels sampled for an approximate histogram.
+SAMPLESIZE = 1 << 18
+
+# Widest integer value range histogrammed with np.bincount.
+MAXBINCOUNT = 1 << 24
+
+_edgecache = {}
+
+def binEdges(lo, width, nbins):
+    '''Returns the cached edges of nbins integer bins starting at lo'''
+
+    key = (lo, width, nbins)
+    edges = _edgecache.get(key)
+    if edges is None:
+        if len(_edgecache) > 64:
+            _edgecache.clear()
+        edges = lo + width * np.arange(nbins + 1, dtype=np.float64)
+        _edgecache[key] = edges
+    return edges
+
+def histogram(data, bins=HISTBINS, exact=True, mask=None, vrange=None):
+    '''Histograms the pixels of a frame
+
+    Integer frames are counted with np.bincount over their value range and
+    the counts are summed into bins of equal integer width, which avoids the
+    sort and float comparisons of np.histogram. Other frames, and integer
+    frames whose value range spans MAXBINCOUNT values or more, use
+    np.histogram.
+
+    Args:
+        data:  2D ndarray with the frame pixels.
+        bins:  Maximum number of bins.
+        exact: If False only about SAMPLESIZE evenly spread pixels are
+               counted and the counts are scaled up to the full frame.
+        mask:  Optional PixelMask of the pixels to leave out.
+        vrange: The (min, max) of the counted pixels, if already known.
+    Returns:
+        A tuple (counts, edges) like np.histogram.
+    Exceptions:
+        ValueError: The mask does not fit the frame.
+    '''
+
+    flat = np.ravel(data)
+    step = 1
+    if not exact and flat.size > SAMPLESIZE:
+        step = flat.size // SAMPLESIZE
+        flat = flat[::step]
+        if mask is not None:
+            mask.check(data)
+            flat = flat[~mask.masked.ravel()[::step]]
+    elif mask is not None:
+        mask.check(data)
+        flat = flat.take(mask.valid)
+    if flat.size == 0:
+        return np.histogram(flat, bins=bins)
+
+    if flat.dtype.kind in 'ui':
+        if vrange is None or step > 1:
+            vrange = flat.min(), flat.max()
+        lo = int(vrange[0])
+        hi = int(vrange[1])
+        if hi - lo < MAXBINCOUNT:
+            # Values are counted from lo, which keeps the counts as short as
+            # the value range wherever it starts.
+            if flat.dtype.kind == 'i' and lo:
+                flat = np.subtract(flat, lo, dtype=np.int64)
+            elif lo:
+                flat = flat - flat.dtype.type(lo)
+            # np.bincount refuses unsigned 64-bit values.
+            counts = np.bincount(flat.astype(np.intp, copy=False),
+                                 minlength=hi - lo + 1)
+            width = -(-(hi - lo + 1) // bins)
+            nbins = -(-(hi - lo + 1) // width)
+            if width > 1:
+                padded = np.zeros(nbins * width, dtype=counts.dtype)
+                padded[:len(counts)] = counts
+                counts = padded.reshape(nbins, width).sum(axis=1)
+            return counts * step, binEdges(lo, width, nbins)
+
+    if step > 1:
+        vrange = None
+    counts, edges = np.histogram(flat, bins=bins, range=vrange)
+    return counts * step, edges
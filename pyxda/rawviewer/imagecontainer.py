@@ -17,107 +17,307 @@
 import numpy as np
 import scipy as sp
 import scipy.sparse as ssp
-import fabio
-import os
-from traits.api import HasTraits, Instance, Int
-from collections import deque
+import threading
+from collections import OrderedDict
+
+from tiffreader import tiffLayout, readFrame
+from histogram import histogram
+from pyramid import buildPyramid
+from metadata import parseMetadata
+from stack import frameName
+from roi import IntegralImage
+
+# Default memory budget of the frame cache in bytes.
+DEFAULT_BUDGET = 2 * 2**30
+
+# Striped locks serialising concurrent loads of the same frame.
+_LOADLOCKS = [threading.Lock() for i in range(64)]
 
 class Image(object):
 
-    def __init__(self, n, path):
+    # Datasets can hold a handle per frame, so they carry no __dict__.
+    __slots__ = ('name', 'path', 'n', 'data', 'hist', 'levels', 'layout',
+                 'mdtable', '_metadata', 'correction', 'mask', 'integral',
+                 '__weakref__')
+
+    def __init__(self, n, path, mdtable=None, correction=None, mask=None):
         if path == '':
             self.name = '2D Image'
-            self.metadata = {}
+            self.path = path
+            self._metadata = {}
             self.n = -1
             self.data = None
+            self.hist = None
+            self.levels = None
+            self.integral = None
+            self.layout = None
+            self.mdtable = None
+            self.correction = None
+            self.mask = None
             return
-        self.name = os.path.split(path)[1]
+        self.name = frameName(path)
         self.path = path
         self.n = n
         self.data = None
-        self.metadata = self._parseMD()
-        print path
+        self.hist = None
+        self.levels = None
+        self.integral = None
+        self.layout = None
+        self.mdtable = mdtable
+        self._metadata = None
+        self.correction = correction
+        self.mask = mask
         return
 
-    def _parseMD(self):
-        md = {}
-        try:
-            fp = open(self.path+'.metadata', 'rU')
+    @property
+    def metadata(self):
+        '''Dict of the .metadata sidecar entries, parsed on first use
 
-            for i, line in enumerate(fp):
-                line = line.rstrip('\n')
-                if line == '' or line[0] == '[':
-                    continue
-                words = line.split('=', 1)
-                md[words[0]] = str(words[1])
+        The sidecar is looked up in the shared MetadataTable the frame was
+        created with, if any, so a bulk parse is not repeated per frame.
+        '''
+        if self._metadata is None:
+            if self.mdtable is not None:
+                self._metadata = self.mdtable.get(self.path)
+            else:
+                self._metadata = parseMetadata(self.path) or {}
+        return self._metadata
+
+    @property
+    def nbytes(self):
+        '''Number of bytes held by the decoded data and its pyramid levels
+
+        The integral image is left out, see integralImage.
+        '''
+        data = self.data
+        if data is None:
+            return 0
+        nbytes = data.nbytes
+        levels = self.levels
+        if levels is not None and levels[0] is data:
+            # Level 0 is the data itself.
+            nbytes += sum(level.nbytes for level in levels[1:])
+        return nbytes
+
+    def histogram(self, exact=True):
+        '''Returns the (counts, edges) histogram of the loaded data
+
+        The histogram is kept with the frame until its data is released. An
+        approximate histogram is replaced once an exact one is requested.
+        Pixels of the frame's PixelMask are left out.
+
+        Args:
+            exact: If False a sampled histogram may be returned.
+        '''
+        hist = self.hist
+        if hist is None or (exact and not hist[2]):
+            counts, edges = histogram(self.data, exact=exact, mask=self.mask)
+            self.hist = hist = (counts, edges, exact)
+        return hist[0], hist[1]
+
+    def pyramid(self):
+        '''Returns the multi-resolution levels of the loaded data
 
-            fp.close()
-        except IOError:
-            print 'No metadata found for %s' % self.path
-        return md
+        Level 0 is the data itself and every following level halves the
+        resolution, see pyramid.buildPyramid. The levels are kept with the
+        frame until its data is released.
+        '''
+        levels = self.levels
+        if levels is None or levels[0] is not self.data:
+            self.levels = levels = buildPyramid(self.data)
+        return levels
+
+    def integralImage(self):
+        '''Returns the integral image of the loaded data
+
+        It is built on first use, when a ROI is first dragged on the frame,
+        and kept with the frame until its data is released or the frame is
+        no longer displayed. As only the displayed frame holds one it is
+        not counted in the ImageCache budget. Pixels of the frame's
+        PixelMask are left out.
+        '''
+        integral = self.integral
+        if integral is None:
+            self.integral = integral = IntegralImage(self.data, self.mask)
+        return integral
+
+    def roiStats(self, x0, y0, x1, y1):
+        '''Returns the statistics of a rectangle of the loaded data
+
+        Takes constant time once the integral image is built, see
+        roi.IntegralImage.stats for the arguments.
+        '''
+        return self.integralImage().stats(x0, y0, x1, y1)
+
+    def release(self):
+        '''Drops the data and everything derived from it'''
+        self.data = None
+        self.hist = None
+        self.levels = None
+        self.integral = None
+        return
 
     def load(self):
-        '''return 2d ndarray image array'''
+        '''return 2d ndarray image array
+        
+        The frame is corrected with its DarkCorrection, if it has one.
+        '''
         if self.data is None:
-            print 'load data for ' + self.name
-            fo = fabio.open(self.path)
-            self.data = fo.data
+            # Threads loading the same frame wait for one decode.
+            with _LOADLOCKS[hash(self.path) % len(_LOADLOCKS)]:
+                if self.data is None:
+                    print 'load data for ' + self.name
+                    if self.layout is None:
+                        self.layout = tiffLayout(self.path) or ()
+                    data = readFrame(self.path, self.layout)
+                    if self.correction is not None:
+                        data = self.correction.apply(data)
+                    self.data = data
         return
 
-class ImageCache(HasTraits, object):
-    
-    def __init__(self):
-        self.cache = deque(maxlen=3)
-        for i in range(3):
-            self.cache.append(Image(-1, ''))
+class ImageCache(object):
+    '''Least recently used frame cache with a memory budget
+
+    Frames are kept by index in an OrderedDict, ordered from least to most
+    recently used, together with the number of bytes they held when last
+    measured, and a running total of those. Pyramid levels built after a
+    frame was added are taken into account once it is measured again, see
+    update. Whenever the decoded frames exceed the byte budget the least
+    recently used ones have their data released. The frame last returned
+    by get, which is the displayed one, is never released, however many
+    frames are added after it.
+    '''
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        '''Constructor called when an ImageCache object is initialized
+
+        Args:
+            budget: Memory budget for decoded frame data in bytes.
+        '''
+
+        self.budget = budget
+        self.cache = OrderedDict()
+        self.nbytes = 0
+        self.pinned = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
         return
 
     def __str__(self):
-        temp1 = self.cache.popleft()
-        temp2 = self.cache.popleft()
-        temp3 = self.cache.popleft()
-        s1 = 'Image Cache:\n%d\n%d\n%d' % (temp1.n, temp2.n, temp3.n)
-        self.cache.append(temp1)
-        self.cache.append(temp2)
-        self.cache.append(temp3)
-        return s1
-
-    def append(self, image):
-        temp = self.cache.popleft()
-        if temp.n is not -1:
-            temp.data = None
-        self.cache.append(image)
+        return 'Image Cache: %d frames, %.1f of %.1f MB, %d hits, %d misses' \
+                % (len(self.cache), self.nbytes / 2.0**20, 
+                   self.budget / 2.0**20, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __contains__(self, n):
+        return n in self.cache
+
+    def get(self, image):
+        '''Returns a frame with its data loaded
+
+        The frame stays cached until another frame is returned by get.
+
+        Args:
+            image: The Image to look up. Its data is loaded and added to the
+                   cache on a miss.
+        Returns:
+            The cached Image for that frame index.
+        '''
+
+        with self.lock:
+            self.pinned = image.n
+            entry = self.cache.pop(image.n, None)
+            if entry is not None:
+                self.cache[image.n] = entry
+                if entry[0] is image and image.data is not None:
+                    self.hits += 1
+                    return image
+            self.misses += 1
         image.load()
+        self.add(image)
+        return image
+
+    def add(self, image):
+        '''Adds a loaded frame as the most recently used one
+
+        Args:
+            image: An Image with its data loaded.
+        '''
+
+        with self.lock:
+            old = self.cache.pop(image.n, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self.cache[image.n] = (image, image.nbytes)
+            self.nbytes += image.nbytes
+            self.shrink()
         return
 
-    def appendleft(self, image):
-        temp = self.cache.pop()
-        if temp.n is not -1:
-            temp.data = None
-        self.cache.appendleft(image)
-        image.load()
+    def update(self, image):
+        '''Measures a cached frame again
+
+        Called once data was derived from the frame, e.g. its pyramid
+        levels, so that it counts in the budget. The frame keeps its place
+        in the order.
+
+        Args:
+            image: The Image. Ignored unless it is cached.
+        '''
+
+        with self.lock:
+            entry = self.cache.get(image.n)
+            if entry is None or entry[0] is not image:
+                return
+            size = image.nbytes
+            # Assigning an existing key keeps its place in the order.
+            self.cache[image.n] = (image, size)
+            self.nbytes += size - entry[1]
+            self.shrink()
         return
 
-    def pop(self):
-        temp = self.cache.pop()
-        self.cache.appendleft(Image(-1, ''))
-        return temp
+    def shrink(self):
+        '''Releases least recently used frames until within budget
 
-    def popleft(self):
-        temp = self.cache.popleft()
-        self.cache.append(Image(-1, ''))
-        return temp
+        The pinned frame, see get, is moved to the most recently used end
+        instead.
+        '''
 
-    def reverse(self):
-        self.cache.reverse()
+        with self.lock:
+            while self.nbytes > self.budget and len(self.cache) > 1:
+                n, entry = self.cache.popitem(last=False)
+                if n == self.pinned:
+                    self.cache[n] = entry
+                    continue
+                self.nbytes -= entry[1]
+                entry[0].release()
         return
 
+    def dropMasked(self):
+        '''Drops what was derived from the cached frames with their mask
+
+        Histograms and integral images are dropped, the data is kept.
+        '''
+
+        with self.lock:
+            for image, size in self.cache.values():
+                image.hist = None
+                image.integral = None
+        return
+
+    def hitRate(self):
+        '''Returns the fraction of lookups served from the cache'''
+
+        total = self.hits + self.misses
+        return self.hits / float(total) if total else 0.0
+
     def clear(self):
-        while True:
-            try:
-                self.cache.pop().data = None
-            except IndexError:
-                break
-        for i in range(3):
-            self.cache.append(Image(-1, ''))
-        return
\ No newline at end of file
+        '''Releases all cached frames'''
+
+        with self.lock:
+            while self.cache:
+                self.cache.popitem()[1][0].release()
+            self.nbytes = 0
+        return
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import hashlib
+
+import numpy as np
+import scipy.sparse as ssp
+
+from rrcache import userCacheDir
+
+class Geometry(object):
+    '''Detector geometry of an azimuthal integration
+
+    Without a sample to detector distance the pattern is taken over the
+    distance to the beam centre in pixels, otherwise over the scattering
+    angle 2theta in degrees.
+    '''
+
+    def __init__(self, shape, centre=None, pixelsize=0.2, distance=None,
+                 nbins=None):
+        '''Constructor called when a Geometry object is initialized
+
+        Args:
+            shape:     Shape (rows, columns) of the frames.
+            centre:    Beam centre (column, row) in pixels. Defaults to the
+                       centre of the frame.
+            pixelsize: Pixel size in mm.
+            distance:  Sample to detector distance in mm, or None.
+            nbins:     Number of bins of the pattern. Defaults to one per
+                       pixel of radius.
+        '''
+
+        h, w = self.shape = tuple(int(n) for n in shape)
+        if centre is None:
+            centre = ((w - 1) / 2.0, (h - 1) / 2.0)
+        self.centre = tuple(float(c) for c in centre)
+        self.pixelsize = float(pixelsize)
+        self.distance = float(distance) if distance else None
+        if self.distance is not None and self.pixelsize <= 0:
+            raise ValueError('Pixel size must be positive')
+        cx, cy = self.centre
+        # Closest and farthest pixel centres from the beam centre.
+        dx = max(-cx, 0.0, cx - (w - 1))
+        dy = max(-cy, 0.0, cy - (h - 1))
+        self.rmin = float(np.hypot(dx, dy))
+        self.rmax = float(max(np.hypot(x - cx, y - cy) for x in (0, w - 1)
+                              for y in (0, h - 1)))
+        self.nbins = int(nbins or max(np.ceil(self.rmax - self.rmin), 1))
+        self.unit = '2theta (deg)' if self.distance else 'r (pixels)'
+        # Identifies the geometry, e.g. for cached lookup tables.
+        self.key = hashlib.md5(repr((self.shape, self.centre, self.pixelsize,
+                                     self.distance, self.nbins))).hexdigest()
+        return
+
+    def __str__(self):
+        return 'Geometry: centre (%.1f, %.1f), %d bins of %s' % (
+                    self.centre + (self.nbins, self.unit))
+
+    def radial(self, r):
+        '''Converts distances to the beam centre in pixels to the pattern
+        coordinate'''
+
+        if self.distance is None:
+            return r
+        return np.degrees(np.arctan(r * (self.pixelsize / self.distance)))
+
+    def range(self):
+        '''Returns the lowest and highest pattern coordinate of the frame'''
+
+        lo, hi = self.radial(np.array([self.rmin, self.rmax]))
+        return float(lo), float(hi)
+
+    def axis(self):
+        '''Returns the pattern coordinate of the bin centres'''
+
+        lo, hi = self.range()
+        width = (hi - lo) / self.nbins or 1.0
+        return lo + (np.arange(self.nbins) + 0.5) * width
+
+    def pixels(self):
+        '''Returns the pattern coordinate of every pixel, as a 2D ndarray'''
+
+        h, w = self.shape
+        cx, cy = self.centre
+        x = np.arange(w, dtype=np.float64) - cx
+        y = np.arange(h, dtype=np.float64)[:, np.newaxis] - cy
+        return self.radial(np.sqrt(x * x + y * y))
+
+def buildLUT(geometry, mask=None):
+    '''Builds the pixel to bin matrix of an azimuthal integration
+
+    Every pixel is split between the two bins whose centres enclose it, in
+    proportion to its distance to them, and every row is scaled to sum to
+    one, so the matrix times a frame gives the mean intensity of each bin.
+
+    Args:
+        geometry: The Geometry of the integration.
+        mask:     Optional PixelMask of the pixels to leave out.
+    Returns:
+        A scipy.sparse CSR matrix of nbins rows by one column per pixel.
+    '''
+
+    lo, hi = geometry.range()
+    nbins = geometry.nbins
+    width = (hi - lo) / nbins or 1.0
+    pos = geometry.pixels().ravel()
+    pos -= lo
+    pos /= width
+    pos -= 0.5
+    first = np.floor(pos)
+    weight = pos - first
+    first = first.astype(np.int32)
+    cols = np.arange(pos.size, dtype=np.int32)
+    if mask is not None:
+        keep = mask.valid
+        cols, first, weight = cols[keep], first[keep], weight[keep]
+    # Every pixel is a column with its two bins, so the matrix is built
+    # column wise without sorting.
+    rows = np.empty((len(cols), 2), dtype=np.int32)
+    np.clip(first, 0, nbins - 1, out=rows[:, 0])
+    np.clip(first + 1, 0, nbins - 1, out=rows[:, 1])
+    values = np.empty((len(cols), 2), dtype=np.float32)
+    values[:, 1] = weight
+    values[:, 0] = 1 - weight
+    indptr = np.zeros(pos.size + 1, dtype=np.int32)
+    indptr[cols + 1] = 2
+    np.cumsum(indptr, out=indptr)
+    lut = ssp.csc_matrix((values.ravel(), rows.ravel(), indptr),
+                         shape=(nbins, pos.size)).tocsr()
+    lut.eliminate_zeros()
+    norm = np.asarray(lut.sum(axis=1)).ravel()
+    norm[norm > 0] = 1.0 / norm[norm > 0]
+    return (ssp.diags(norm.astype(np.float32)) * lut).tocsr()
+
+class AzimuthalIntegrator(object):
+    '''Radial pattern of frames from a precomputed lookup table
+
+    The pixel to bin matrix is built once per geometry and mask, see
+    buildLUT, and kept on disk under a hash of both, so integrating a frame
+    is a single sparse matrix vector product.
+    '''
+
+    def __init__(self, geometry, mask=None, cachedir=None):
+        '''Constructor called when an AzimuthalIntegrator is initialized
+
+        Args:
+            geometry: The Geometry of the integration.
+            mask:     Optional PixelMask of the pixels to leave out.
+            cachedir: Directory of the lookup tables. Defaults to a 'lut'
+                      directory in userCacheDir(). False keeps them in
+                      memory only.
+        Exceptions:
+            ValueError: The mask does not fit the geometry.
+        '''
+
+        if mask is not None and mask.shape != geometry.shape:
+            raise ValueError('Mask shape %s does not match the frames %s'
+                             % (mask.shape, geometry.shape))
+        self.geometry = geometry
+        self.shape = geometry.shape
+        self.mask = mask
+        self.radial = geometry.axis()
+        key = geometry.key
+        if mask is not None:
+            key = hashlib.md5(key + mask.key).hexdigest()
+        self.key = key
+        if cachedir is None:
+            cachedir = os.path.join(userCacheDir(), 'lut')
+        self.path = cachedir and os.path.join(cachedir, key + '.npz')
+        self.lut = self._load()
+        if self.lut is None:
+            self.lut = buildLUT(geometry, mask)
+            self._save()
+        return
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            lut = ssp.load_npz(self.path).tocsr()
+        except (IOError, OSError, ValueError, KeyError) as msg:
+            print 'Lookup table %s not read: %s' % (self.path, msg)
+            return None
+        if lut.shape != (self.geometry.nbins, self.shape[0] * self.shape[1]):
+            return None
+        return lut
+
+    def _save(self):
+        if not self.path:
+            return
+        tmppath = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            dirpath = os.path.dirname(self.path)
+            if not os.path.isdir(dirpath):
+                os.makedirs(dirpath)
+            with open(tmppath, 'wb') as fp:
+                ssp.save_npz(fp, self.lut, compressed=False)
+            os.rename(tmppath, self.path)
+        except (IOError, OSError) as msg:
+            print 'Lookup table %s not saved: %s' % (self.path, msg)
+        return
+
+    @property
+    def nbytes(self):
+        '''Number of bytes held by the lookup table'''
+        lut = self.lut
+        return lut.data.nbytes + lut.indices.nbytes + lut.indptr.nbytes
+
+    def integrate(self, data):
+        '''Integrates a frame
+
+        Args:
+            data: 2D ndarray with the frame pixels.
+        Returns:
+            The mean intensity of every bin, see the radial attribute for
+            their coordinates.
+        Exceptions:
+            ValueError: The frame does not fit the geometry.
+        '''
+
+        if data.shape != self.shape:
+            raise ValueError('Frame shape %s does not match the geometry %s'
+                             % (data.shape, self.shape))
+        return self.lut.dot(np.ravel(data))
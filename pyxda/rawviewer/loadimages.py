@@ -17,23 +17,31 @@
 import time
 import os
 import threading
-import glob
 from enthought.traits.api import HasTraits, Instance, Str
 
-# TODO: Enable Live Mode
+from watcher import DirectoryWatcher
+from scanner import scanDataset
+from stack import isStack
+
+# Seconds between checks of the watched directory in live mode.
+WATCHINTERVAL = 0.1
+
 class LoadImage(HasTraits, threading.Thread):
     """Thread that loads image paths into queue
     
-    Waits until dirpath is not empty and then loads all .tif paths into a list.
-    These paths are then inserted into an associated job queue with the title
-    'newimage'.
+    Waits until dirpath is not empty and then scans it for .tif paths in
+    natural order, or for the frames of an HDF5 stack when dirpath is a
+    stack file. These paths are inserted into an associated job queue in
+    batches with the title 'newimages' while the scan goes on. In live mode
+    the thread then keeps watching the directory and queues every frame
+    written to it, followed by an 'extendrr' job.
     
     Exceptions:
         TypeError: Is thrown on instantiation when a queue and dirpath are not 
                    specified or are of the wrong type.             
     """
 
-    def __init__(self, queue, dirpath):
+    def __init__(self, queue, dirpath, live=False):
         """Constructor called when a LoadImage object is initialized
         
         Creates thread and defines thread attributes. Specifies the directory 
@@ -42,6 +50,7 @@ class LoadImage(HasTraits, threading.Thread):
     	Args:
     	    queue:   Job queue of processes  
        	    dirpath: Path of the directory containing the image files 
+            live:    Keep watching the directory for new frames
     	"""
     	
         threading.Thread.__init__(self)
@@ -53,6 +62,8 @@ class LoadImage(HasTraits, threading.Thread):
         self.jobqueue = queue
         self.backgroundenable = False
         self.daemon=True
+        self.live = live
+        self.stopped = threading.Event()
         self.add_trait('message', Str(''))
         
         return
@@ -64,59 +75,102 @@ class LoadImage(HasTraits, threading.Thread):
         at dirpath and inserts them into jobqueue.    
     	"""
     	
-        self.loadPath()
-        self.putPath()
+        if self.loadPath():
+            self.putPath()
+        if self.live and os.path.isdir(self.dirpath):
+            self.watchPath()
+        return
+
+    def stop(self):
+        """Stops watching the directory in live mode"""
+
+        self.stopped.set()
         return
 
     def loadPath(self):
-        """Extracts .tif paths from dirpath into filelist
+        """Waits for dirpath and checks that it is a directory or a stack
         
-        Loops until dirpath is not empty. When dirpath
-        contains a string it will load all .tif file paths in that directory 
-        into filelist and break the loop.   
+        Loops until dirpath is not empty.
         
+        Returns:
+            True if dirpath is a directory or stack that can be scanned.
         Exceptions:
-                 NoTiffs:     Raised when a chosen directory contains no tiff 
-                              files
                  InvalidPath: Raised when the path is not real  
     	"""
     	try:
             while True:
                 if self.dirpath == '':
                     time.sleep(0.5)
-                elif os.path.isdir(self.dirpath):
-                    self.filelist = glob.glob(self.dirpath + '/*.tif')
-                    if len(self.filelist) == 0:
-                            raise Exception('No tiff files in that directory.')
-                    self.message = str(' ')
-                    break
+                elif os.path.isdir(self.dirpath) or isStack(self.dirpath):
+                    return True
                 else:
                     raise Exception('Invalid file path selected.')
-                    break 
         except Exception as msg:
             self.message = str(msg)
-        return
+        return False
 
     def putPath(self):
-        """Inserts paths in filelist into jobqueue with job description
+        """Scans dirpath and inserts its frames into jobqueue
         
-        Adds image paths to the queue in the following pattern:
+        Adds image paths, with the file sizes and modification times found
+        by the scan, to the queue as they are scanned, see
+        scanner.scanDataset:
             
-            [['newimage', {'path':<path1>}],
-             ['newimage', {'path':<path2>}],
-             ['newimage', {'path':<path3>}],
-             ['initcache']],
-             ['newimage', {'path':<path4>}],
-             ['newimage', {'path':<path5>}],
+            [['newimages', {'paths':[<path1>, ..., <path64>],
+                            'sizes':[...], 'mtimes':[...]}],
+             ['initcache'],
+             ['newimages', {'paths':[<path65>, ..., <path1088>], ...}],
             etc...  
             
-        The fourth job in the queue is the initialization of the cache which
-        will plot the first image to the screen.
+        The job following the first batch is the initialization of the cache
+        which will plot the first image to the screen.
+        
+        Exceptions:
+                 NoTiffs:     Raised when a chosen directory contains no tiff 
+                              files
     	"""
         
-        #TODO: Hard Coded
-        for i in range(len(self.filelist)):
-            self.jobqueue.put(['newimage', {'path':self.filelist[i]}])
-            if i == 2:
-                self.jobqueue.put(['initcache'])
-        return
\ No newline at end of file
+        try:
+            for paths, sizes, mtimes in scanDataset(self.dirpath):
+                if self.stopped.is_set():
+                    return
+                self.jobqueue.put(['newimages', {'paths':paths, 'sizes':sizes,
+                                                 'mtimes':mtimes}])
+                if len(self.filelist) == 0:
+                    self.jobqueue.put(['initcache'])
+                self.filelist.extend(paths)
+            if len(self.filelist) == 0 and self.live:
+                self.message = 'Waiting for tiff files.'
+            elif len(self.filelist) == 0:
+                raise Exception('No tiff files in that directory.')
+            else:
+                self.message = str(' ')
+        except Exception as msg:
+            self.message = str(msg)
+        return
+
+    def watchPath(self):
+        """Queues frames written to dirpath until stopped
+        
+        Every batch of new frames is added to the queue as one 'newimages' job
+        followed by one 'extendrr' job, so that reduced representation plots
+        grow with the data. If the directory held no frames when loading
+        started, the first frame also initializes the cache.
+        """
+        
+        watcher = DirectoryWatcher(self.dirpath, known=self.filelist)
+        try:
+            while not self.stopped.is_set():
+                paths = watcher.poll(WATCHINTERVAL)
+                if not paths or self.stopped.is_set():
+                    continue
+                self.jobqueue.put(['newimages', {'paths':paths}])
+                if len(self.filelist) == 0:
+                    self.jobqueue.put(['initcache'])
+                self.filelist.extend(paths)
+                self.jobqueue.put(['extendrr'])
+        except OSError as msg:
+            self.message = str(msg)
+        finally:
+            watcher.close()
+        return
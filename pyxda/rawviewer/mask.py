@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import hashlib
+
+import numpy as np
+import fabio
+
+class PixelMask(object):
+    '''Set of detector pixels left out of statistics and histograms
+
+    The mask is kept as a bitmap together with the flat indices of the
+    masked and of the valid pixels, and per block of the statistics kernel
+    the offsets of the valid pixels of every block that has masked ones.
+    These are computed once, so applying the mask to a frame costs no more
+    than gathering its valid pixels. Masks are not changed after they are
+    made; adding pixels returns a new mask.
+    '''
+
+    def __init__(self, masked):
+        '''Constructor called when a PixelMask object is initialized
+
+        Args:
+            masked: 2D boolean ndarray, True for pixels to leave out.
+        '''
+
+        self.masked = np.ascontiguousarray(masked, dtype=bool)
+        self.shape = self.masked.shape
+        self.indices = np.flatnonzero(self.masked)
+        # Identifies the mask, e.g. for cached statistics.
+        self.key = hashlib.md5(str(self.shape) +
+                               np.packbits(self.masked).tostring()).hexdigest()
+        self._valid = None
+        self._blocks = {}
+        return
+
+    def __str__(self):
+        return 'Pixel Mask: %d of %d pixels masked' % (len(self),
+                                                        self.masked.size)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def valid(self):
+        '''Flat indices of the pixels that are not masked'''
+        if self._valid is None:
+            self._valid = np.flatnonzero(~self.masked)
+        return self._valid
+
+    def blocks(self, blocksize):
+        '''Returns the valid pixels of the blocks that have masked ones
+
+        Args:
+            blocksize: Number of pixels per block.
+        Returns:
+            A dict mapping the flat start index of every block with masked
+            pixels to the offsets of its valid pixels within the block.
+        '''
+
+        blocks = self._blocks.get(blocksize)
+        if blocks is None:
+            flat = self.masked.ravel()
+            blocks = {}
+            for start in np.unique(self.indices // blocksize) * blocksize:
+                start = int(start)
+                blocks[start] = np.flatnonzero(~flat[start:start+blocksize])
+            self._blocks[blocksize] = blocks
+        return blocks
+
+    def check(self, data):
+        '''Raises ValueError unless data has the shape of the mask'''
+        if data.shape != self.shape:
+            raise ValueError('Frame shape %s does not match mask %s'
+                             % (data.shape, self.shape))
+        return
+
+    def addRect(self, x0, y0, x1, y1):
+        '''Returns a mask that also masks a rectangle
+
+        Args:
+            x0, y0: Column and row of one corner, in pixels.
+            x1, y1: Column and row of the opposite corner.
+        Returns:
+            A new PixelMask.
+        '''
+
+        h, w = self.shape
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        x0, y0 = int(np.floor(x0)), int(np.floor(y0))
+        x1, y1 = int(np.ceil(x1)), int(np.ceil(y1))
+        masked = self.masked.copy()
+        masked[max(y0, 0):min(y1, h), max(x0, 0):min(x1, w)] = True
+        return PixelMask(masked)
+
+def loadMask(path):
+    '''Reads a pixel mask from a file
+
+    .npy files are read with numpy, anything else as an image with fabio,
+    such as a TIFF or a fit2d .msk file. Nonzero pixels are masked.
+
+    Args:
+        path: File path of the mask.
+    Returns:
+        A PixelMask.
+    Exceptions:
+        IOError: The file can not be read.
+    '''
+
+    if os.path.splitext(path)[1].lower() == '.npy':
+        data = np.load(path)
+    else:
+        data = fabio.open(path).data
+    return PixelMask(np.asarray(data) != 0)
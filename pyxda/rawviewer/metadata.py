@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import multiprocessing
+import threading
+
+from stack import stackPath, splitStackPath, readStackMetadata
+
+# Number of sidecars parsed per pool task by MetadataTable.parseAll.
+PARSECHUNK = 64
+
+# Fewest sidecars worth starting a process pool for.
+POOLMIN = 4096
+
+def parseMetadata(path):
+    '''Reads the .metadata sidecar of a frame
+
+    Args:
+        path: File path of the image.
+    Returns:
+        A dict of metadata strings, or None if there is no sidecar.
+    '''
+
+    md = {}
+    try:
+        fp = open(path+'.metadata', 'rU')
+
+        for i, line in enumerate(fp):
+            line = line.rstrip('\n')
+            if line == '' or line[0] == '[':
+                continue
+            words = line.split('=', 1)
+            md[words[0]] = str(words[1])
+
+        fp.close()
+    except IOError:
+        return None
+    return md
+
+class MetadataTable(object):
+    '''Shared table of parsed .metadata sidecars
+
+    Sidecars are parsed the first time the metadata of a frame is asked for
+    and the result is kept by path, so every sidecar is opened at most once.
+    parseAll fills the table for many frames at once over a process pool,
+    for when a whole metadata column is needed. The metadata of HDF5 stack
+    frames is read for the whole stack at once, see parseStack.
+    '''
+
+    def __init__(self):
+        '''Constructor called when a MetadataTable object is initialized'''
+
+        self.table = {}
+        self.lock = threading.Lock()
+        return
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, path):
+        return path in self.table
+
+    def get(self, path):
+        '''Returns the metadata of a frame, parsing its sidecar if needed
+
+        Args:
+            path: File path of the image.
+        Returns:
+            A dict of metadata strings, empty if there is no sidecar.
+        '''
+
+        md = self.table.get(path)
+        if md is None and splitStackPath(path):
+            self.parseStack(splitStackPath(path)[0])
+            md = self.table.get(path)
+        if md is None:
+            md = parseMetadata(path) or {}
+            with self.lock:
+                md = self.table.setdefault(path, md)
+        return md
+
+    def parseAll(self, paths, nprocs=None):
+        '''Parses the sidecars of many frames into the table
+
+        Frames already in the table are not parsed again.
+
+        Args:
+            paths:  List of frame file paths.
+            nprocs: Number of worker processes. Defaults to the number of
+                    cores. A value of 1 parses in the calling thread.
+        Returns:
+            A list with the metadata dict of every path, in path order.
+        '''
+
+        missing = [path for path in set(paths) if path not in self.table]
+        stacks = set(splitStackPath(path) for path in missing)
+        stacks.discard(None)
+        for h5path in set(h5path for h5path, i in stacks):
+            self.parseStack(h5path)
+        missing = [path for path in missing if path not in self.table]
+        nprocs = nprocs or multiprocessing.cpu_count()
+        if nprocs > 1 and len(missing) >= POOLMIN:
+            pool = multiprocessing.Pool(nprocs)
+            try:
+                mds = pool.map(parseMetadata, missing, PARSECHUNK)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            mds = [parseMetadata(path) for path in missing]
+        with self.lock:
+            for path, md in zip(missing, mds):
+                self.table.setdefault(path, md or {})
+        return [self.table[path] for path in paths]
+
+    def parseStack(self, h5path):
+        '''Reads the metadata of all frames of an HDF5 stack into the table
+
+        Args:
+            h5path: File path of the stack, see stack.py.
+        '''
+
+        try:
+            mds = readStackMetadata(h5path)
+        except (IOError, KeyError) as msg:
+            print 'Metadata of %s not read: %s' % (h5path, msg)
+            return
+        with self.lock:
+            for i, md in enumerate(mds):
+                self.table.setdefault(stackPath(h5path, i), md)
+        return
+
+    def clear(self):
+        '''Drops all parsed metadata'''
+
+        with self.lock:
+            self.table.clear()
+        return
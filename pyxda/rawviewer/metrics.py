@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import json
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+# Number of latency samples kept per job type.
+MAXSAMPLES = 2048
+
+# Number of queue depth samples kept.
+MAXDEPTHS = 8192
+
+class JobMetrics(object):
+    '''Latency, throughput and queue depth of the job processor
+
+    Every processed job is recorded with its type, latency and the queue
+    depth when it started. Latencies are kept in a bounded window per job
+    type, from which percentiles are computed. Gauges such as cache hit
+    rates are read from callables whenever a snapshot is taken.
+    '''
+
+    def __init__(self):
+        '''Constructor called when a JobMetrics object is initialized'''
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counts = {}
+        self.totals = {}
+        self.latencies = {}
+        self.depths = deque(maxlen=MAXDEPTHS)
+        self.maxdepth = 0
+        self.gauges = {}
+        self.current = None
+        self._logger = None
+        return
+
+    def addGauge(self, name, func):
+        '''Adds a value read on every snapshot
+
+        Args:
+            name: Name of the value in the snapshot.
+            func: Callable returning the value.
+        '''
+
+        self.gauges[name] = func
+        return
+
+    def begin(self, jobtype, depth):
+        '''Marks the start of a job
+
+        Args:
+            jobtype: The job type, eg. 'updatecache'.
+            depth:   Number of jobs left in the queue.
+        Returns:
+            A token to pass to end.
+        '''
+
+        now = time.time()
+        with self.lock:
+            self.depths.append((now - self.started, depth))
+            self.maxdepth = max(self.maxdepth, depth)
+            self.current = (jobtype, now)
+        return (jobtype, now)
+
+    def end(self, token):
+        '''Records the latency of a job started with begin'''
+
+        jobtype, start = token
+        latency = time.time() - start
+        with self.lock:
+            self.counts[jobtype] = self.counts.get(jobtype, 0) + 1
+            self.totals[jobtype] = self.totals.get(jobtype, 0.0) + latency
+            if jobtype not in self.latencies:
+                self.latencies[jobtype] = deque(maxlen=MAXSAMPLES)
+            self.latencies[jobtype].append(latency)
+            self.current = None
+        return
+
+    def snapshot(self):
+        '''Returns all metrics as a dict
+
+        Latencies are given in seconds, with 'p50', 'p95' and 'p99' taken
+        over the last MAXSAMPLES jobs of each type.
+        '''
+
+        with self.lock:
+            jobs = {}
+            for jobtype, samples in self.latencies.items():
+                p50, p95, p99 = np.percentile(list(samples), [50, 95, 99])
+                jobs[jobtype] = {'count': self.counts[jobtype],
+                                 'total': self.totals[jobtype],
+                                 'p50': p50, 'p95': p95, 'p99': p99,
+                                 'max': max(samples)}
+            current = None
+            if self.current is not None:
+                current = {'type': self.current[0],
+                           'running': time.time() - self.current[1]}
+            snap = {'uptime': time.time() - self.started,
+                    'jobs': jobs,
+                    'current': current,
+                    'queuedepth': self.depths[-1][1] if self.depths else 0,
+                    'maxqueuedepth': self.maxdepth}
+        for name, func in self.gauges.items():
+            try:
+                snap[name] = func()
+            except Exception as msg:
+                snap[name] = str(msg)
+        return snap
+
+    def logLine(self):
+        '''Returns a one line summary of the metrics'''
+
+        snap = self.snapshot()
+        parts = ['queue %d (max %d)' % (snap['queuedepth'], 
+                                        snap['maxqueuedepth'])]
+        if snap['current'] is not None:
+            parts.append('running %s for %.1f s' % (snap['current']['type'],
+                                                    snap['current']['running']))
+        for jobtype in sorted(snap['jobs']):
+            job = snap['jobs'][jobtype]
+            parts.append('%s n=%d p50=%.1fms p99=%.1fms' % (jobtype, 
+                         job['count'], 1e3 * job['p50'], 1e3 * job['p99']))
+        for name in sorted(self.gauges):
+            value = snap[name]
+            if isinstance(value, float):
+                value = '%.2f' % value
+            parts.append('%s=%s' % (name, value))
+        return 'Metrics: ' + ', '.join(parts)
+
+    def dump(self, path):
+        '''Writes a snapshot and the queue depth history to a JSON file
+
+        Args:
+            path: Output file path.
+        '''
+
+        snap = self.snapshot()
+        with self.lock:
+            snap['depthhistory'] = list(self.depths)
+        with open(path, 'w') as fp:
+            json.dump(snap, fp, indent=2, sort_keys=True)
+        return
+
+    def startLogging(self, interval=30.0):
+        '''Prints logLine every interval seconds from a daemon thread
+
+        The line is also printed while a job is running, so a job that
+        blocks the processor shows up with its running time.
+        '''
+
+        if self._logger is not None:
+            return
+        def log():
+            while True:
+                time.sleep(interval)
+                print self.logLine()
+        self._logger = threading.Thread(target=log)
+        self._logger.daemon = True
+        self._logger.start()
+        return
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import numpy as np
+
+# Images that can be taken from the statistics, as listed in the
+# ControlPanel.
+IMAGES = ('Mean', 'Standard Deviation', 'Variance', 'Maximum', 'Minimum')
+
+class PixelStats(object):
+    '''Running per-pixel statistics over a stack of frames
+
+    Frames are added one at a time with Welford's update of the mean and of
+    the sum of squared deviations, in float64, so the variance stays
+    accurate for long scans and large pixel offsets. Statistics gathered
+    over separate parts of a stack are combined with merge, which uses the
+    pairwise update of Chan et al., so the parts can be reduced in
+    parallel.
+    '''
+
+    def __init__(self):
+        '''Constructor called when a PixelStats object is initialized'''
+
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+        self.max = None
+        self.min = None
+        self._scratch = None
+        return
+
+    def __str__(self):
+        if self.n == 0:
+            return 'Pixel Stats: no frames'
+        return 'Pixel Stats: %d frames of %dx%d' % ((self.n,) +
+                                                    self.mean.shape)
+
+    def __getstate__(self):
+        # The scratch buffers are not worth sending between processes.
+        state = self.__dict__.copy()
+        state['_scratch'] = None
+        return state
+
+    @property
+    def shape(self):
+        return None if self.mean is None else self.mean.shape
+
+    @property
+    def nbytes(self):
+        '''Number of bytes held by the accumulators'''
+        if self.mean is None:
+            return 0
+        return 4 * self.mean.nbytes
+
+    def add(self, data):
+        '''Adds a frame
+
+        Args:
+            data: 2D ndarray with the frame pixels.
+        Exceptions:
+            ValueError: The frame does not match the earlier ones.
+        '''
+
+        if self.mean is None:
+            self.n = 1
+            self.mean = np.array(data, dtype=np.float64)
+            self.m2 = np.zeros_like(self.mean)
+            self.max = self.mean.copy()
+            self.min = self.mean.copy()
+            return
+        if data.shape != self.mean.shape:
+            raise ValueError('Frame shape %s does not match %s'
+                             % (data.shape, self.mean.shape))
+        if self._scratch is None:
+            self._scratch = (np.empty_like(self.mean),
+                             np.empty_like(self.mean))
+        x, delta = self._scratch
+        self.n += 1
+        x[...] = data
+        np.maximum(self.max, x, out=self.max)
+        np.minimum(self.min, x, out=self.min)
+        np.subtract(x, self.mean, out=delta)
+        # mean += delta / n, and the deviation from the new mean is then
+        # delta * (n - 1) / n.
+        np.multiply(delta, 1.0 / self.n, out=x)
+        self.mean += x
+        x *= self.n - 1
+        x *= delta
+        self.m2 += x
+        return
+
+    def merge(self, other):
+        '''Combines the statistics of another part of the stack into these
+
+        Args:
+            other: A PixelStats of frames not added to this one.
+        Returns:
+            This PixelStats.
+        Exceptions:
+            ValueError: The frames of both do not match.
+        '''
+
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n = other.n
+            self.mean = other.mean.copy()
+            self.m2 = other.m2.copy()
+            self.max = other.max.copy()
+            self.min = other.min.copy()
+            return self
+        if other.shape != self.shape:
+            raise ValueError('Frame shape %s does not match %s'
+                             % (other.shape, self.shape))
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2
+        self.mean += delta * (float(other.n) / n)
+        delta *= delta
+        delta *= float(self.n) * other.n / n
+        self.m2 += delta
+        np.maximum(self.max, other.max, out=self.max)
+        np.minimum(self.min, other.min, out=self.min)
+        self.n = n
+        return self
+
+    def variance(self):
+        '''Returns the population variance of every pixel'''
+        return self.m2 / max(self.n, 1)
+
+    def image(self, name):
+        '''Returns one of the statistics as an image
+
+        Args:
+            name: One of IMAGES.
+        Returns:
+            A 2D float64 ndarray.
+        Exceptions:
+            KeyError: name is not one of IMAGES.
+        '''
+
+        if name == 'Mean':
+            return self.mean
+        elif name == 'Variance':
+            return self.variance()
+        elif name == 'Standard Deviation':
+            return np.sqrt(self.variance())
+        elif name == 'Maximum':
+            return self.max
+        elif name == 'Minimum':
+            return self.min
+        raise KeyError('Unknown stack image: %s' % name)
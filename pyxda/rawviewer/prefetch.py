@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import Queue
+import threading
+
+class Prefetcher(object):
+    '''Background loader for the neighbours of the displayed frame
+
+    A small pool of daemon threads decodes the frames following the current
+    one in the direction of travel, and a shorter window behind it, into the
+    image cache and builds their display pyramids. Every call to update
+    starts a new generation; requests of older generations are dropped when
+    they reach a worker, so changing direction or jumping cancels stale
+    prefetches.
+    '''
+
+    def __init__(self, cache, nthreads=2, ahead=4, behind=1):
+        '''Constructor called when a Prefetcher object is initialized
+
+        Args:
+            cache:    The ImageCache frames are loaded into.
+            nthreads: Number of loader threads.
+            ahead:    Number of frames prefetched in the direction of travel.
+            behind:   Number of frames prefetched in the other direction.
+        '''
+
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.generation = 0
+        self.prefetched = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.queue = Queue.Queue()
+        self.threads = []
+        for i in range(nthreads):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        return
+
+    def __str__(self):
+        return 'Prefetch: %d hits, %d misses, %.0f%% hit rate' \
+                % (self.hits, self.misses, 100 * self.hitRate())
+
+    def update(self, datalist, n, direction):
+        '''Prefetches the neighbours of a frame
+
+        Args:
+            datalist:  List of Image objects.
+            n:         Index of the frame being displayed.
+            direction: 1 when moving right, -1 when moving left.
+        '''
+
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        direction = 1 if direction >= 0 else -1
+        steps = [direction * i for i in range(1, self.ahead + 1)]
+        steps += [-direction * i for i in range(1, self.behind + 1)]
+        for step in steps:
+            i = n + step
+            if 0 <= i < len(datalist) and i not in self.cache:
+                self.queue.put((generation, datalist[i]))
+        return
+
+    def cancel(self):
+        '''Drops all outstanding prefetches'''
+
+        with self.lock:
+            self.generation += 1
+            self.prefetched.clear()
+        return
+
+    def record(self, n):
+        '''Records whether a requested frame had been prefetched
+
+        Args:
+            n: Index of the frame requested for display.
+        '''
+
+        with self.lock:
+            if n in self.prefetched and n in self.cache:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.prefetched.discard(n)
+        return
+
+    def hitRate(self):
+        '''Returns the fraction of displayed frames that were prefetched'''
+
+        total = self.hits + self.misses
+        return self.hits / float(total) if total else 0.0
+
+    def wait(self):
+        '''Blocks until all queued prefetches are done or dropped'''
+
+        self.queue.join()
+        return
+
+    def _work(self):
+        while True:
+            generation, image = self.queue.get()
+            try:
+                if generation == self.generation and image.n not in self.cache:
+                    image.load()
+                    image.pyramid()
+                    with self.lock:
+                        if generation == self.generation:
+                            self.prefetched.add(image.n)
+                    self.cache.add(image)
+            except Exception as msg:
+                print 'Prefetch of %s failed: %s' % (image.name, msg)
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import numpy as np
+
+# Levels are added until both dimensions are at most this many pixels.
+MINSIZE = 256
+
+def bin2(data, mode='mean'):
+    '''Halves the resolution of a frame
+
+    Every 2x2 block of pixels is replaced by its mean or its maximum. An odd
+    last row or column is dropped. Integer frames keep their dtype.
+
+    Args:
+        data: 2D ndarray.
+        mode: 'mean' or 'max'.
+    Returns:
+        The binned 2D ndarray.
+    '''
+
+    h, w = data.shape[0] // 2, data.shape[1] // 2
+    blocks = data[:2*h, :2*w].reshape(h, 2, w, 2)
+    if mode == 'max':
+        return blocks.max(axis=3).max(axis=1)
+    if data.dtype.kind in 'ui':
+        acc = np.uint64 if data.dtype.kind == 'u' else np.int64
+        binned = blocks.sum(axis=3, dtype=acc).sum(axis=1) // 4
+        return binned.astype(data.dtype)
+    return blocks.mean(axis=3).mean(axis=1).astype(data.dtype)
+
+def buildPyramid(data, mode='mean', minsize=MINSIZE):
+    '''Builds successively halved versions of a frame
+
+    Args:
+        data:    2D ndarray with the full resolution frame.
+        mode:    'mean' or 'max', see bin2.
+        minsize: Stop once both dimensions are at most this many pixels.
+    Returns:
+        A list of 2D ndarrays, starting with data itself.
+    '''
+
+    levels = [data]
+    while max(levels[-1].shape) > minsize and min(levels[-1].shape) >= 2:
+        levels.append(bin2(levels[-1], mode))
+    return levels
+
+def selectLevel(nlevels, visible, screen):
+    '''Chooses the coarsest level that still fills the screen
+
+    Args:
+        nlevels: Number of levels in the pyramid.
+        visible: (width, height) of the visible region in full resolution
+                 pixels.
+        screen:  (width, height) of the plot on screen in pixels.
+    Returns:
+        The index of the pyramid level to display.
+    '''
+
+    ratio = min(visible[0] / float(max(screen[0], 1)),
+                visible[1] / float(max(screen[1], 1)))
+    if ratio < 2:
+        return 0
+    return min(int(np.log2(ratio)), nlevels - 1)
@@ -14,24 +14,50 @@
 #
 ##############################################################################
 
-from enthought.traits.api import HasTraits, Instance, Event, Int, List, Bool, Str
+from enthought.traits.api import HasTraits, Instance, Event, Int, Bool, Str
 from chaco.api import Plot
 import numpy as np
-import Queue
 import threading
+import multiprocessing
+import os
+import time
+from itertools import izip
 
 from display import Display
-from imagecontainer import Image, ImageCache
+from imagecontainer import Image, ImageCache, DEFAULT_BUDGET
+from metadata import MetadataTable
+from frameindex import FrameIndex
 from loadimages import LoadImage
+from prefetch import Prefetcher
+from metrics import JobMetrics
+from scheduler import JobQueue, CancelToken
+from rrengine import RREngine
+from rrcache import RRCache
+from reduction import rrValue, boundsExact, STATS_DTYPE
+from correction import loadDark
+from mask import PixelMask, loadMask
+from integrate import Geometry, AzimuthalIntegrator
+
+# Seconds between metrics log lines.
+METRICSINTERVAL = 30.0
+
+# Number of frames reduced per 'extendrr' job before other jobs get a turn.
+RRCHUNK = 16
+
+# Reduced representations that depend on the histogram range selection.
+BOUNDCHOICES = ('Pixels Above Upper Bound', 'Pixels Below Lower Bound')
+
+# Reduced representations comparing every frame with the one before it.
+DIFFCHOICES = ('Frame Difference', 'Frame Correlation')
 
 class RawViewer(HasTraits):
     
     def __init__(self, **kwargs):
         """Constructor called when a RawViewer object is initialized
         
-        Creates thread and defines thread attributes. Creates a job queue, list
-        of image data, and length of list. Establishes trait change attributes
-        for pic and datalistlengthadd. 
+        Creates thread and defines thread attributes. Creates a job queue,
+        index of the frames, and length of the index. Establishes trait change
+        attributes for pic and datalistlengthadd. 
     	"""
     	
         super(RawViewer, self).__init__()
@@ -39,8 +65,10 @@ class RawViewer(HasTraits):
         self.processing_job = threading.Thread(target=self.processJob)
         self.processing_job.daemon = True
         
-        self.jobqueue = Queue.Queue()
-        self.add_trait('datalist', List())
+        self.jobqueue = JobQueue()
+        self.metrics = JobMetrics()
+        self.mdtable = MetadataTable()
+        self.datalist = FrameIndex(self.mdtable)
         self.add_trait('datalistlength', Int(0))
         
         self.on_trait_change(self.plotData, 'pic', dispatch='new')
@@ -55,7 +83,13 @@ class RawViewer(HasTraits):
     def initLoadimage(self):
         '''Initializes load variables'''
         
-        self.cache = ImageCache()
+        self.add_trait('cachesize', Int(DEFAULT_BUDGET / 2**20))
+        self.on_trait_change(self._cachesize_changed, 'cachesize')
+        self.cache = ImageCache(self.cachesize * 2**20)
+        self.prefetcher = Prefetcher(self.cache)
+        self.metrics.addGauge('cachehitrate', self.cache.hitRate)
+        self.metrics.addGauge('prefetchhitrate', self.prefetcher.hitRate)
+        self.metrics.addGauge('cachemb', lambda: self.cache.nbytes / 2.0**20)
         self.add_trait('pic', Instance(Image, Image(-1, '')))
         self.pic.data = np.zeros((2048, 2048))
         self.add_trait('hasImage', Bool(False))
@@ -70,8 +104,9 @@ class RawViewer(HasTraits):
         self.add_trait('imageplot', Instance(Plot, 
                                         self.display.plotImage(self.pic)))
         self.add_trait('plot1d', Instance(Plot,
-                                        self.display.plotHistogram(self.pic)))
-        self.plot1d.value_axis.title = "1D Cut"
+                                        self.display.plotIntegration()))
+        self.geometry = {}
+        self.integrator = None
         self.add_trait('histogram', Instance(Plot,
                                         self.display.plotHistogram(self.pic)))
         self.newndx = -1
@@ -82,30 +117,65 @@ class RawViewer(HasTraits):
         '''Initializes rrplots and hascmap'''
         
         self.hascmap = False
+        self.add_trait('nprocs', Int(multiprocessing.cpu_count()))
+        self.rrengine = RREngine(self.nprocs)
         #TODO
         #self.add_trait('rrplot', Instance(Plot, 
         #                        self.display.plotRRMap(None, None)))
         self.rrplots = {}
+        self.rrstats = []
+        self.rrcompare = False
+        self.rrtoken = CancelToken()
+        self._rriter = None
+        self.boundtoken = CancelToken()
+        self._bounditer = None
+        self.rrcache = None
+        self.stackstats = None
+        self.stackkey = None
+        self.stacktoken = CancelToken()
+        self.stackthread = None
+        self.lastframe = -1
+        self.correction = None
+        self.mask = None
+        self.bounds = (None, None)
+
+    def _cachesize_changed(self):
+        '''Applies a new image cache budget given in megabytes'''
+
+        self.cache.budget = max(0, self.cachesize) * 2**20
+        self.cache.shrink()
+        return
 
     ##############################################
     # Tasks  
     ##############################################
+    def addNewImages(self, paths, sizes=None, mtimes=None, **kwargs):
+        '''Add new images
+        
+        Appends a batch of frames to the frame index and updates the frame
+        range of the UI once for the whole batch.
+        
+        Args:
+            paths:  File paths of the images.
+            sizes:  File sizes of the images, if known.
+            mtimes: Modification times of the images, if known.
+        '''
+        
+        if not paths:
+            return
+        self.datalist.extend(paths, sizes, mtimes)
+        self.hasImage = True
+        self.datalistlengthadd = True
+        return
+
     def addNewImage(self, path, **kwargs):
         '''Add new image
         
-        Adds new image and create jobs to process new image.
-        
         Args:
             path: File path of the image.
-        Exceptions:
-            TypeError: path is not a valid image path
         '''
         
-        #print 'Image Added'
-        listn = len(self.datalist)
-        self.datalist.append(Image(listn, path))
-        self.hasImage = True
-        self.jobqueue.put(['datalistlengthadd'])
+        self.addNewImages([path])
         return
    
     
@@ -117,27 +187,104 @@ class RawViewer(HasTraits):
         '''
         
         print 'Plot Data'
-        self.pic.load()
-        self.imageplot = self.display.plotImage(self.pic, self.imageplot)
+        pic = self.pic
+        pic.load()
+        if pic.n >= 0:
+            self.lastframe = pic.n
+        old = self.display.image
+        if old is not None and old is not pic:
+            # The integral image is only built for ROI statistics of the
+            # displayed frame, see Image.integralImage.
+            old.integral = None
+        self.imageplot = self.display.plotImage(pic, self.imageplot)
+        # Account for the pyramid levels in the cache budget.
+        self.cache.update(pic)
         #TODO
-        self.histogram = self.display.plotHistogram(self.pic, self.histogram)
-        self.plot1d = self.display.plotHistogram(self.pic, None)
+        # While the user is scrubbing, a sampled histogram is shown and
+        # replaced by the exact one once the queue has caught up.
+        exact = self.jobqueue.empty()
+        self.histogram = self.display.plotHistogram(pic, self.histogram, exact)
+        if not exact:
+            self.jobqueue.put(['exacthist', [pic]])
+        self.plotIntegration(pic)
         return
 
+    def plotIntegration(self, pic):
+        '''Plots the azimuthally integrated pattern of a frame in the 1D Cut
+        
+        The lookup table of the integration is only built when the frame
+        shape, the geometry or the mask changes, see integrate.py.
+        
+        Args:
+            pic: The image that is displayed.
+        '''
+        
+        if not self.hasImage or pic.data is None:
+            return
+        integrator = self.integrator
+        if integrator is None or integrator.shape != pic.data.shape or \
+                integrator.mask is not self.mask:
+            try:
+                geometry = Geometry(pic.data.shape, **self.geometry)
+                integrator = AzimuthalIntegrator(geometry, self.mask)
+            except ValueError as msg:
+                print 'No 1D cut: %s' % msg
+                return
+            print geometry
+            self.integrator = integrator
+        pattern = integrator.integrate(pic.data)
+        self.plot1d = self.display.plotIntegration(integrator.radial, pattern,
+                                                   integrator.geometry.unit,
+                                                   self.plot1d)
+        return
+
+    def setGeometry(self, centre=None, pixelsize=0.2, distance=None, 
+                    nbins=None):
+        '''Sets the detector geometry of the 1D cut
+        
+        Args:
+            centre:    Beam centre (column, row) in pixels, None for the
+                       centre of the frame.
+            pixelsize: Pixel size in mm.
+            distance:  Sample to detector distance in mm. None plots over
+                       the radius in pixels rather than 2theta.
+            nbins:     Number of bins, None for one per pixel of radius.
+        '''
+        
+        self.geometry = {'centre': centre, 'pixelsize': pixelsize,
+                         'distance': distance, 'nbins': nbins}
+        self.integrator = None
+        self.plotIntegration(self.pic)
+        return
+
+    def plotExactHistogram(self, pic):
+        '''Replaces a sampled histogram by the exact one
+        
+        Args:
+            pic: The image whose sampled histogram was plotted.
+        '''
+        
+        if pic is self.pic and pic.data is not None:
+            self.histogram = self.display.plotHistogram(pic, self.histogram)
+        return
+
+    # Fired with the choice of every newly created RR plot.
+    rrplotadded = Event
+
     # TODO
     datalistlengthadd = Event
     def datalistLengthAdd(self):
-        '''Add datalistlength by 1
+        '''Sync datalistlength with the length of the frame index
         
         Notice:
             Only use this method to modify the datalistlength
             otherwise there will be some problem of frame range in UI
         '''
 
-        self.datalistlength += 1
+        self.datalistlength = len(self.datalist)
         return
 
-    def startLoad(self, dirpath):
+    def startLoad(self, dirpath, live=False):
         '''Start loading thread
         
         Display is reset if there is already data plotted. A LoadImage object
@@ -147,7 +294,9 @@ class RawViewer(HasTraits):
         of the image paths in the folder to the jobqueue.  
         
         Args:
-            dirpath: The folder path containing tiff files.
+            dirpath: The folder path containing tiff files, or an HDF5 stack.
+                     See stack.py.
+            live:    Keep adding frames written to the folder after loading.
         Exceptions:
             No exceptions are thrown. However, if dirpath contains no tiff files
             or the folder path is nonexistant, the message variable of loadimage
@@ -155,25 +304,28 @@ class RawViewer(HasTraits):
         '''
         
         print 'Load Started'
+        if self.loadimage is not None:
+            self.loadimage.stop()
         if self.hasImage == True:
             self.resetViewer()   
-        self.loadimage = LoadImage(self.jobqueue, dirpath) 
+        try:
+            self.rrcache = RRCache(dirpath)
+        except (IOError, OSError):
+            self.rrcache = None
+        self.loadimage = LoadImage(self.jobqueue, dirpath, live) 
         self.loadimage.start()
               
-    # TODO: not as important
     def initCache(self):
         '''Initialize the Image Cache
         
-        Creates the initial image chache. The first image is loaded and ploted
-        to the screen. Then the next two are loaded.
+        Loads the first image through the image cache and plots it to the
+        screen.
         '''
         
         print 'Init Cache'
-        self.pic = self.datalist[0]
-        for i in range(2):
-            pic = self.datalist[i]
-            self.cache.append(pic)
-            pic.load()
+        self.newndx = 0
+        self.pic = self.cache.get(self.datalist[0])
+        self.prefetcher.update(self.datalist, 0, 1)
         return 
 
     def changeIndex(self, newndx):
@@ -194,7 +346,10 @@ class RawViewer(HasTraits):
         
         currentpos = self.pic.n
 
-        if newndx - currentpos == -1:
+        if currentpos < 0 and 0 <= newndx < self.datalistlength:
+            # A stack image is shown, see showStackImage.
+            self.updateCache('click')
+        elif newndx - currentpos == -1:
             print 'Click left'
             self.updateCache('left')
         elif newndx - currentpos == 1:
@@ -211,86 +366,37 @@ class RawViewer(HasTraits):
     def updateCache(self, strnext):
         '''Updates the image cache
         
-        Loads and plots the image at index strnext. Two other images are loaded
-        behind and infront of that index. If this index is the first or last
-        in the list, it will only have one in front or behind loaded.
+        Moves one image left or right, or to the image at self.newndx, and
+        plots it. The image is taken from the image cache, which only decodes
+        it if it is not already held in memory. The prefetcher then starts
+        loading the images around it in the direction of travel.
         
         Args:
-            strnext: An integer representing the next image index
+            strnext: 'left', 'right' or 'click'.
         '''
         
         print 'Update Cache'
-        print self.cache
         n = self.pic.n
+        if n == -1:
+            # Moving on from a stack image starts at the last frame shown.
+            n = self.lastframe
         if n == -1:
             print 'Cannot traverse ' + strnext
             return
         if strnext == 'left':
-            self.newndx = n - 1
-            print '%d -> %d' % (n, self.newndx)
             if n == 0:
                 return
-            else:
-                self._innerCache(n, -1)
+            self.newndx = n - 1
         elif strnext == 'right':
-            self.newndx = n + 1
-            print '%d -> %d' % (n, self.newndx)
             if n == self.datalistlength - 1:
                 return
-            else:
-                self.cache.reverse()
-                self._innerCache(n, 1)
-                self.cache.reverse()
-        elif strnext == 'click':
-            print '%d -> %d' % (n, self.newndx)
-            self.cache.clear()
-            if self.newndx == 0:
-                self.initCache()
-            else:
-                self.pic = self.datalist[self.newndx]
-
-                self.cache.append(self.datalist[self.newndx-1])
-                self.cache.append(self.pic)
-                if self.newndx is not self.datalistlength - 1:
-                    self.cache.append(self.datalist[self.newndx+1])
-                else:
-                    self.cache.append(Image(-1, ''))
-
-                #for i in range(2):
-                #    n = self.newndx - i
-                #    pic = self.datalist[n]
-                #    self.cache.appendleft(pic)
-                #    if i == 0:
-                #        self.pic = pic
-                #        self.plotnow = {}
-                #if self.newndx is not self.datalistlength - 1:
-                #    temp = self.datalist[self.newndx+1]
-                #    self.cache.append(temp)
-                #else:
-                    self.cache.append(Image(-1, ''))
-                    
+            self.newndx = n + 1
+        print '%d -> %d' % (n, self.newndx)
+        self.prefetcher.record(self.newndx)
+        self.pic = self.cache.get(self.datalist[self.newndx])
+        self.prefetcher.update(self.datalist, self.newndx, self.newndx - n)
         print self.cache
-        return
-
-    def _innerCache(self, n, i):
-        '''Plots new index
-        
-        Pops off the left side of cache and plots it. The cache is then updated.
-        
-        Args;
-            n: The new index.
-            i: Direction the index has traveled. -1 for left and 1 for right.
-        '''
-        
-        self.pic = self.cache.popleft()
-
-        self.cache.appendleft(self.pic)
-        if (n > 1 and i == -1) or (n < self.datalistlength-2 and i == 1):
-            pic = self.datalist[n+i*2]
-            self.cache.appendleft(pic)
-
-        if (n == 1 and i == -1) or (n == self.datalistlength-2 and i == 1):
-            self.cache.pop()
+        print self.prefetcher
         return
 
     def createRRPlot(self, rrchoice):
@@ -299,6 +405,10 @@ class RawViewer(HasTraits):
         Creates a reduced representation plot for the image that is currently
         being displayed. 
         
+        The frames are reduced by queued 'extendrr' jobs. Generating a plot
+        that already exists resumes a cancelled reduction. The rrplotadded
+        event is fired with rrchoice once a new plot exists.
+        
         Args:
             rrchoice: The reduced representation to be plotted.
         
@@ -310,36 +420,426 @@ class RawViewer(HasTraits):
         elif rrchoice == 'Choose a Reduced Representation':
             return
 
-        if rrchoice == 'Mean':
-            f = lambda x: np.mean(x)
+        if rrchoice in BOUNDCHOICES and self.bounds[0] is None:
+            print 'Select a range on the histogram first'
+            return
 
-        elif rrchoice == 'Total Intensity':
-            f = lambda x: np.sum(x)
+        if rrchoice in self.rrplots:
+            # A cancelled reduction, or bound count, resumes where it
+            # stopped.
+            self.jobqueue.put(['extendrr', []], token=self.rrtoken)
+            return
+        self.rrplots[rrchoice] = rrplot = self.display.plotRRMap(None, rrchoice, None)
 
-        elif rrchoice == 'Standard Deviation':
-            f = lambda x: np.std(x)
+        print 'Generating Intensity Map........'
+        if (rrchoice in DIFFCHOICES and not self.rrcompare and
+                (self.rrstats or self._rriter is not None)):
+            # The frames so far were not compared with the ones before.
+            self.rrplotadded = rrchoice
+            self.resetRRPlots()
+            return
+        # Frames reduced for an earlier choice are served from their stats.
+        if self.rrstats:
+            stats = np.array(self.rrstats, dtype=STATS_DTYPE)
+            self.display.plotRRMap(rrValue(stats, rrchoice, *self.bounds),
+                                   rrchoice, rrplot)
+        self.display.flushRRMap(rrplot)
+        self.rrplotadded = rrchoice
+        self.jobqueue.put(['extendrr', []], token=self.rrtoken)
 
-        elif rrchoice == 'Pixels Above Upper Bound':
+        #self.hascmap = True
+        return
+
+    def extendRRPlots(self, token=None):
+        '''Reduces frames that are not in the RR plots yet
+        
+        Every frame added since the last reduction is reduced once and its
+        value is appended to all existing reduced representation plots.
+        Frames are only compared with the ones before them when one of the
+        plots is in DIFFCHOICES, see RREngine.imap. At
+        most RRCHUNK frames are handled per call; the rest is queued as a
+        continuation 'extendrr' job carrying the cancellation token, so that
+        navigation jobs are processed in between.
+        
+        Args:
+            token: The CancelToken of a continuation, None for a new request.
+                   A new request is ignored while a reduction is running,
+                   since the running one picks up new frames when done.
+        '''
+        
+        if not self.rrplots:
+            return
+        if token is None:
+            if self._rriter is not None:
+                return
+            token = self.rrtoken
+        if token.cancelled:
             return
 
-        elif rrchoice == 'Pixels Below Lower Bound':
+        for count in range(RRCHUNK):
+            if self._rriter is None:
+                start = len(self.rrstats)
+                if start >= len(self.datalist):
+                    break
+                self.rrengine.nprocs = max(1, self.nprocs)
+                paths = self.datalist.paths(start)
+                keys = self.datalist.keys(start)
+                compare = any(c in self.rrplots for c in DIFFCHOICES)
+                if start == 0:
+                    self.rrcompare = compare
+                prev = prevkey = prevstats = None
+                if start > 0:
+                    # Frame differences continue from the last reduced frame.
+                    prev = self.datalist.path(start - 1)
+                    prevkey = self.datalist.keys(start - 1, start)[0]
+                    prevstats = self.rrstats[-1]
+                statsiter = self.rrengine.imap(paths, cache=self.rrcache,
+                                               keys=keys, prev=prev,
+                                               prevkey=prevkey,
+                                               compare=self.rrcompare,
+                                               prevstats=prevstats)
+                self._rriter = enumerate(statsiter, start)
+            try:
+                i, stats = next(self._rriter)
+            except StopIteration:
+                self._rriter = None
+                continue
+            print '%d: %s........Reduced' % (i, self.datalist.name(i))
+            self.rrstats.append(stats)
+            for rrchoice, rrplot in self.rrplots.items():
+                self.display.plotRRMap(rrValue(stats, rrchoice,
+                                               *self.bounds),
+                                       rrchoice, rrplot)
+        else:
+            self.jobqueue.put(['extendrr', [token]], token=token)
             return
 
-        if rrchoice not in self.rrplots:
-            self.rrplots[rrchoice] = rrplot = self.display.plotRRMap(None, rrchoice, None)
+        for rrplot in self.rrplots.values():
+            self.display.flushRRMap(rrplot)
+        print 'Loading Complete'
+        self.countBounds()
+        return
+
+    def cancelRR(self):
+        '''Stops the running reduction
+        
+        Queued continuations are dropped and the frames reduced so far stay
+        in the plots. Generating any of the plots again resumes from there.
+        Counting the pixels within the bounds and gathering stack
+        statistics are stopped as well.
+        '''
+        
+        self.rrtoken.cancel()
+        self.rrtoken = CancelToken()
+        self._rriter = None
+        self.boundtoken.cancel()
+        self.boundtoken = CancelToken()
+        self._bounditer = None
+        self.stacktoken.cancel()
+        self.stacktoken = CancelToken()
+        for rrplot in self.rrplots.values():
+            self.display.flushRRMap(rrplot)
+        return
+
+    def stackImage(self, choice):
+        '''Shows a per-pixel statistic over all frames
+        
+        The statistics are gathered once in a background thread, over the
+        worker processes, see RREngine.pixelStats, and kept until frames
+        are added or their correction changes. Other statistics are then
+        shown without reading the frames again.
+        
+        Args:
+            choice: The statistic, one of pixelstats.IMAGES.
+        '''
+        
+        if len(self.datalist) == 0:
+            return
+        key = (len(self.datalist), self.correction)
+        if self.stackstats is not None and self.stackkey == key:
+            self.showStackImage(choice)
+            return
+        if self.stackthread is not None and self.stackthread.is_alive():
+            print 'Stack statistics are already being gathered'
+            return
+        print 'Gathering stack statistics........'
+        self.stackthread = threading.Thread(target=self._gatherStackStats,
+                                            args=(self.datalist.paths(), key,
+                                                  choice, self.stacktoken))
+        self.stackthread.daemon = True
+        self.stackthread.start()
+        return
+
+    def _gatherStackStats(self, paths, key, choice, token):
+        engine = RREngine(max(1, self.nprocs))
+        engine.correction = key[1]
+        try:
+            stats = engine.pixelStats(paths, token)
+        except (IOError, ValueError) as msg:
+            print 'Stack statistics failed: %s' % msg
+            return
+        finally:
+            engine.close()
+        if stats is not None:
+            self.jobqueue.put(['showstack', [choice, stats, key]], 
+                              token=token)
+        return
+
+    def showStackImage(self, choice, stats=None, key=None):
+        '''Displays a per-pixel statistic in the image plot
+        
+        The image is shown like a frame, with its histogram and 1D cut, and
+        the arrow keys go back to the frames.
+        
+        Args:
+            choice: The statistic, one of pixelstats.IMAGES.
+            stats:  Newly gathered PixelStats, kept for later choices.
+            key:    The frame count and correction stats were gathered with.
+        '''
+        
+        if stats is not None:
+            if key != (len(self.datalist), self.correction):
+                print 'Stack statistics are out of date'
+            self.stackstats = stats
+            self.stackkey = key
+        stats = self.stackstats
+        if stats is None:
+            return
+        pic = Image(-1, '')
+        pic.name = '%s of %d frames' % (choice, stats.n)
+        pic.data = stats.image(choice)
+        pic.mask = self.mask
+        print pic.name
+        self.pic = pic
+        return
+
+    def setBounds(self, lower, upper):
+        '''Sets the pixel value range selected on the histogram
+        
+        The 'Pixels Above Upper Bound' and 'Pixels Below Lower Bound' plots
+        are recomputed for all reduced frames at once from their cumulative
+        histograms, without reading the frames again. Where those only give
+        an estimate, the frames are counted exactly in the background, see
+        countBounds.
+        
+        Args:
+            lower: Lower bound of the selected range.
+            upper: Upper bound of the selected range.
+        '''
+        
+        self.bounds = (min(lower, upper), max(lower, upper))
+        print 'Bounds: %g to %g' % self.bounds
+        self.plotBounds()
+        self.countBounds()
+        return
+
+    def plotBounds(self):
+        '''Redraws the RR plots that depend on the bounds'''
+        
+        if not self.rrstats:
+            return
+        stats = np.array(self.rrstats, dtype=STATS_DTYPE)
+        for rrchoice in BOUNDCHOICES:
+            rrplot = self.rrplots.get(rrchoice)
+            if rrplot is not None:
+                self.display.clearRRMap(rrplot)
+                self.display.plotRRMap(rrValue(stats, rrchoice, 
+                                               *self.bounds),
+                                       rrchoice, rrplot)
+                self.display.flushRRMap(rrplot)
+        return
+
+    def countBounds(self, token=None):
+        '''Counts the pixels outside the bounds exactly
+        
+        Frames for which the cumulative histograms only give an estimate,
+        see reduction.boundsExact, are counted from their value histograms
+        in the RR cache, or read again where there are none, and their
+        counts replace the ones in their statistics, in memory and in the
+        RR cache. Like extendRRPlots, at most RRCHUNK frames are handled per
+        call and the rest is queued as a continuation 'countbounds' job. The
+        bound plots are redrawn when all frames are counted.
+        
+        Args:
+            token: The CancelToken of a continuation, None to start over
+                   with the current bounds.
+        '''
+        
+        if token is None:
+            self.boundtoken.cancel()
+            self.boundtoken = token = CancelToken()
+            self._bounditer = None
+            if (self.bounds[0] is None or not self.rrstats or
+                    not any(c in self.rrplots for c in BOUNDCHOICES)):
+                return
+            stats = np.array(self.rrstats, dtype=STATS_DTYPE)
+            indices = np.flatnonzero(~boundsExact(stats, *self.bounds))
+            if len(indices) == 0:
+                return
+            print 'Counting %d frames within bounds........' % len(indices)
+            self.rrengine.nprocs = max(1, self.nprocs)
+            paths = [self.datalist.path(i) for i in indices]
+            keys = self.datalist.keys()
+            self._bounditer = izip(indices, self.rrengine.countBounds(
+                                       paths, *self.bounds,
+                                       cache=self.rrcache,
+                                       keys=[keys[i] for i in indices]))
+        if token.cancelled or self._bounditer is None:
+            return
+
+        lower, upper = self.bounds
+        counted = []
+        for count in range(RRCHUNK):
+            try:
+                i, (below, above) = next(self._bounditer)
+            except StopIteration:
+                break
+            rec = np.array(self.rrstats[i], dtype=STATS_DTYPE)
+            rec['below'], rec['above'] = below, above
+            rec['lowerbound'], rec['upperbound'] = lower, upper
+            self.rrstats[i] = rec[()]
+            counted.append(i)
         else:
+            self.storeCounts(counted)
+            self.jobqueue.put(['countbounds', [token]], token=token)
             return
+        self.storeCounts(counted)
 
-        print 'Generating Intensity Map........'
-        for i, image in enumerate(self.datalist):
-            image.load()
-            print '%d: %s........Loaded' % (i, image.name)
-            rr = f(image.data)
-            rrplot = self.display.plotRRMap(rr, rrchoice, rrplot)
-            image.data = None
+        self._bounditer = None
+        self.plotBounds()
+        print 'Counting Complete'
+        return
 
-        #self.hascmap = True
-        print 'Loading Complete'
+    def storeCounts(self, indices):
+        '''Writes the statistics of recounted frames back to the RR cache
+        
+        They are stored the way extendRRPlots reduced them, so later
+        reductions are served the exact counts.
+        
+        Args:
+            indices: Indices of the frames in rrstats.
+        '''
+        
+        if self.rrcache is None or not indices:
+            return
+        entries = []
+        for i in indices:
+            keys = self.datalist.keys(max(i - 1, 0), i + 1)
+            prev = None
+            if i > 0:
+                prev = (self.datalist.path(i - 1), keys[0])
+            entries.append((self.datalist.path(i), keys[-1], self.rrstats[i],
+                            prev))
+        self.rrcache.store(entries, tag=self.rrengine.tag())
+        return
+
+    def resetRRPlots(self):
+        '''Empties the RR plots and reduces all frames again
+        
+        Used when the frames themselves change, e.g. with their correction.
+        '''
+        
+        self.cancelRR()
+        self.rrstats = []
+        for rrplot in self.rrplots.values():
+            self.display.clearRRMap(rrplot)
+        self.extendRRPlots()
+        return
+
+    def setDark(self, paths):
+        '''Sets the dark frame subtracted from every frame
+        
+        The displayed frame and the reduced representations are redone
+        with the corrected frames.
+        
+        Args:
+            paths: File paths of the dark frames. With several, their median
+                   is used. An empty list turns the correction off.
+        '''
+        
+        correction = None
+        if paths:
+            try:
+                correction = loadDark(paths)
+            except (IOError, ValueError) as msg:
+                print 'Dark frame not loaded: %s' % msg
+                return
+            if len(self.datalist) and self.pic.data is not None and \
+                    self.pic.data.shape != correction.dark.shape:
+                print 'Dark frame does not match the frames'
+                return
+            print correction
+        self.correction = correction
+        self.rrengine.correction = correction
+        self.datalist.setCorrection(correction)
+        self.prefetcher.cancel()
+        self.cache.clear()
+        if self.pic.n >= 0:
+            self.cache.get(self.pic)
+            self.plotData()
+            self.prefetcher.update(self.datalist, self.pic.n, 1)
+        self.resetRRPlots()
+        return
+
+    def setMask(self, path=None):
+        '''Sets the pixel mask applied to histograms and RR plots
+        
+        Args:
+            path: File path of the mask, see mask.loadMask. None or an empty
+                  path clears the mask.
+        '''
+        
+        mask = None
+        if path:
+            try:
+                mask = loadMask(path)
+            except (IOError, ValueError) as msg:
+                print 'Mask not loaded: %s' % msg
+                return
+        self.applyMask(mask)
+        return
+
+    def maskRect(self, x0, y0, x1, y1):
+        '''Adds a rectangle drawn on the image to the pixel mask
+        
+        Args:
+            x0, y0: Column and row of one corner, in pixels.
+            x1, y1: Column and row of the opposite corner.
+        '''
+        
+        if self.pic.n < 0 or self.pic.data is None:
+            return
+        mask = self.mask
+        if mask is None or mask.shape != self.pic.data.shape:
+            mask = PixelMask(np.zeros(self.pic.data.shape, dtype=bool))
+        self.applyMask(mask.addRect(x0, y0, x1, y1))
+        return
+
+    def applyMask(self, mask):
+        '''Makes a PixelMask the mask of all frames
+        
+        The histogram and the reduced representations are redone without
+        the masked pixels.
+        
+        Args:
+            mask: A PixelMask, or None to use all pixels.
+        '''
+        
+        if mask is not None and len(self.datalist) and \
+                self.pic.data is not None and \
+                self.pic.data.shape != mask.shape:
+            print 'Mask does not match the frames'
+            return
+        print mask if mask is not None else 'Mask cleared'
+        self.mask = mask
+        self.rrengine.mask = mask
+        self.datalist.setMask(mask)
+        self.cache.dropMasked()
+        if self.pic.n >= 0:
+            self.histogram = self.display.plotHistogram(self.pic,
+                                                        self.histogram)
+            self.plotIntegration(self.pic)
+        self.resetRRPlots()
         return
 
     def resetViewer(self):
@@ -350,20 +850,39 @@ class RawViewer(HasTraits):
         '''
         
         print 'Reset'
+        if self.loadimage is not None:
+            self.loadimage.stop()
         if self.hasImage == False:
             return
 
+        # Stop the reduction before closing the cache it reads from.
+        self.rrtoken.cancel()
+        self.rrtoken = CancelToken()
+        self._rriter = None
+        self.boundtoken.cancel()
+        self.boundtoken = CancelToken()
+        self._bounditer = None
         self.rrplots = {}
+        self.rrstats = []
+        if self.rrcache is not None:
+            self.rrcache.close()
+            self.rrcache = None
         #self.rrplot = self.display.plotImage(None, 'Total Intensity Map')
         self.hascmap = False
         self.hasImage = False
         self.newndx = -1
 
-        with self.jobqueue.mutex:
-            self.jobqueue.queue.clear()
-        
+        self.stacktoken.cancel()
+        self.stacktoken = CancelToken()
+        self.stackstats = None
+        self.stackkey = None
+        self.lastframe = -1
+        self.jobqueue.clear()
+        
+        self.prefetcher.cancel()
         self.cache.clear()
-        del self.datalist[:]
+        self.mdtable.clear()
+        self.datalist.clear()
         self.datalistlength = 0
         return
 
@@ -378,6 +897,22 @@ class RawViewer(HasTraits):
         '''
         
         self.processing_job.start()
+        self.metrics.startLogging(METRICSINTERVAL)
+        return
+
+    def dumpMetrics(self, path=None):
+        '''Writes the job processing metrics to a JSON file
+        
+        Args:
+            path: Output file path. Defaults to a time stamped file in the
+                  home directory.
+        '''
+        
+        if not path:
+            path = os.path.join(os.path.expanduser('~'), 
+                                time.strftime('pyxda-metrics-%Y%m%d-%H%M%S.json'))
+        self.metrics.dump(path)
+        print 'Metrics written to %s' % path
         return
     
     def processJob(self):
@@ -391,26 +926,52 @@ class RawViewer(HasTraits):
             jobdata = self.jobqueue.get(block=True)
             jobtype = jobdata[0]
             kwargs = jobdata[1] if len(jobdata)==2 else {}
+            token = self.metrics.begin(jobtype, self.jobqueue.qsize())
             
             #deal with different jobs
-            if jobtype == 'newimage':
+            if jobtype == 'newimages':
+                self.addNewImages(**kwargs)
+            elif jobtype == 'newimage':
                 self.addNewImage(**kwargs)
             elif jobtype == 'updatecache':
                 self.updateCache(*kwargs)
             elif jobtype == 'plotdata':
                 self.plotnow = kwargs
-            elif jobtype == 'datalistlengthadd':
-                self.datalistlengthadd = True
             elif jobtype == 'initcache':
                 self.initCache()
             elif jobtype == 'plotrr':
                 self.createRRPlot(*kwargs)
+            elif jobtype == 'exacthist':
+                self.plotExactHistogram(*kwargs)
+            elif jobtype == 'extendrr':
+                self.extendRRPlots(*kwargs)
+            elif jobtype == 'countbounds':
+                self.countBounds(*kwargs)
+            elif jobtype == 'cancelrr':
+                self.cancelRR()
+            elif jobtype == 'setdark':
+                self.setDark(*kwargs)
+            elif jobtype == 'setbounds':
+                self.setBounds(*kwargs)
+            elif jobtype == 'setmask':
+                self.setMask(*kwargs)
+            elif jobtype == 'maskrect':
+                self.maskRect(*kwargs)
+            elif jobtype == 'stackimage':
+                self.stackImage(*kwargs)
+            elif jobtype == 'showstack':
+                self.showStackImage(*kwargs)
+            elif jobtype == 'setgeometry':
+                self.setGeometry(**kwargs)
             elif jobtype == 'changendx':
                 self.changeIndex(*kwargs)
             elif jobtype == 'reset':
                 self.resetViewer()
             elif jobtype == 'startload':
                 self.startLoad(*kwargs)
+            elif jobtype == 'dumpmetrics':
+                self.dumpMetrics(*kwargs)
+            self.metrics.end(token)
             jobdata = []
             self.jobqueue.task_done()
             
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import numpy as np
+
+from histogram import histogram
+
+# Number of bins of the cumulative histogram kept per frame.
+CUMBINS = 256
+
+# Statistics gathered for every frame. 'below' and 'above' count the pixels
+# outside 'lowerbound' and 'upperbound', NaN when not counted. The
+# cumulative histogram 'cum' has bin edges cumlo + k * cumwidth; 'discrete'
+# marks integer pixels. 'diff' is the root mean square difference to the
+# previous frame and 'corr' the correlation with it, 0 and 1 for a first
+# frame, and NaN when the frame was not compared, see RREngine.imap.
+STATS_DTYPE = np.dtype([('n', np.int64),
+                        ('sum', np.float64),
+                        ('mean', np.float64),
+                        ('var', np.float64),
+                        ('min', np.float64),
+                        ('max', np.float64),
+                        ('above', np.int64),
+                        ('below', np.int64),
+                        ('lowerbound', np.float64),
+                        ('upperbound', np.float64),
+                        ('cumlo', np.float64),
+                        ('cumwidth', np.float64),
+                        ('discrete', np.bool_),
+                        ('diff', np.float64),
+                        ('corr', np.float64),
+                        ('cum', np.uint32, (CUMBINS + 1,))])
+
+# The single valued statistics, e.g. for table columns.
+SCALARFIELDS = tuple(name for name in STATS_DTYPE.names
+                     if STATS_DTYPE[name].shape == ())
+
+# Number of pixels handled per block. Small enough for a block to stay in
+# cache while every statistic is taken from it.
+BLOCKSIZE = 1 << 16
+
+def valueCounts(data, mask=None):
+    '''Counts every value of an integer frame of up to 16 bits
+
+    Args:
+        data: 2D ndarray with the frame pixels.
+        mask: Optional PixelMask of the pixels to leave out.
+    Returns:
+        A tuple (counts, offset) where counts[i] is the number of pixels of
+        value offset + i, covering every value of the pixel type.
+    Exceptions:
+        ValueError: The mask does not fit the frame, or the pixels are not
+                    integers of up to 16 bits.
+    '''
+
+    flat = np.ravel(data)
+    if flat.dtype.kind not in 'ui' or flat.dtype.itemsize > 2:
+        raise ValueError('Pixels of type %s can not be counted per value'
+                         % flat.dtype)
+    if mask is not None:
+        mask.check(data)
+        flat = flat.take(mask.valid)
+    info = np.iinfo(flat.dtype)
+    if info.min < 0:
+        flat = np.subtract(flat, info.min, dtype=np.int32)
+    return np.bincount(flat, minlength=info.max - info.min + 1), info.min
+
+def _countedStats(counts, offset, lower, upper):
+    '''Takes the frame statistics from the counts of every pixel value
+
+    Returns:
+        A tuple (n, sum, mean, var, min, max, above, below, cumlo,
+        cumwidth, cum), exact but for the rounding of mean and var.
+    '''
+
+    nz = np.flatnonzero(counts)
+    if len(nz) == 0:
+        return None
+    counts = counts[nz[0]:nz[-1]+1]
+    lo = int(nz[0]) + offset
+    hi = int(nz[-1]) + offset
+    values = np.arange(lo, hi + 1, dtype=np.int64)
+    # Below every value, so below[v - lo] counts the pixels below v.
+    below = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=below[1:])
+    n = int(below[-1])
+    total = int(np.dot(counts, values))
+    sumsq = int(np.dot(counts, values * values))
+    mean = total / float(n)
+    var = (n * sumsq - total * total) / float(n * n)
+    def belowValue(v):
+        return int(below[int(min(max(v - lo, 0), len(counts)))])
+    nabove = 0 if upper is None else n - belowValue(np.floor(upper) + 1)
+    nbelow = 0 if lower is None else belowValue(np.ceil(lower))
+    # The bins of histogram.histogram, a whole number of values wide.
+    width = -(-(hi - lo + 1) // CUMBINS)
+    edges = np.minimum(width * np.arange(CUMBINS + 1), len(counts))
+    cum = below[edges]
+    return (n, total, mean, var, lo, hi, nabove, nbelow, lo, width, cum)
+
+def boundCounts(hist, lower, upper):
+    '''Counts the pixels outside bounds exactly from a value histogram
+
+    Args:
+        hist:  A tuple (values, counts) of the pixel values that occur, in
+               ascending order, and their counts, see frameStats.
+        lower: Pixels strictly below this value are counted.
+        upper: Pixels strictly above this value are counted.
+    Returns:
+        A tuple (below, above).
+    '''
+
+    values, counts = hist
+    below = counts[:np.searchsorted(values, lower, 'left')].sum()
+    above = counts[np.searchsorted(values, upper, 'right'):].sum()
+    return int(below), int(above)
+
+def frameStats(data, lower=None, upper=None, blocksize=BLOCKSIZE, mask=None,
+               prev=None, prevstats=None, hist=False):
+    '''Computes all frame statistics in one pass
+
+    Integer frames of up to 16 bits are counted per pixel value with a
+    single np.bincount, and every statistic, including the cumulative
+    histogram, follows exactly from the counts. Other frames are walked
+    block by block and every statistic is accumulated from a block while
+    it is still in cache. Their sum is exact for integers of up to 32 bits,
+    and their variance comes from a numerically stable pairwise merge of
+    block means. Their cumulative histogram over the value range found is
+    taken in a second pass, see countBelow. Masked pixels are left out,
+    see mask.PixelMask. With the previous frame, the squared difference to
+    it is summed block by block, and the correlation follows from that and
+    the means and variances of both frames.
+
+    Args:
+        data:      2D ndarray with the frame pixels.
+        lower:     Pixels strictly below this value are counted in 'below'.
+        upper:     Pixels strictly above this value are counted in 'above'.
+        blocksize: Number of pixels per block.
+        mask:      Optional PixelMask of the pixels to leave out.
+        prev:      The previous frame, if any. Ignored if its shape differs.
+        prevstats: The statistics of prev, computed from it if omitted.
+        hist:      If True the value histogram is returned as well.
+    Returns:
+        A record of STATS_DTYPE, or with hist a tuple (record, hist). hist
+        is a tuple (values, counts) of the pixel values that occur and
+        their counts, see boundCounts, or None for frames that are not
+        counted per value.
+    Exceptions:
+        ValueError: The mask does not fit the frame.
+    '''
+
+    flat = np.ravel(data)
+    if mask is not None:
+        mask.check(data)
+    discrete = flat.dtype.kind in 'ui'
+    valuehist = None
+    if discrete and flat.dtype.itemsize <= 2:
+        counts, offset = valueCounts(data, mask)
+        values = _countedStats(counts, offset, lower, upper)
+        nz = np.flatnonzero(counts)
+        valuehist = ((nz + offset).astype(np.int32),
+                     counts[nz].astype(np.uint32))
+    else:
+        values = _blockStats(data, lower, upper, blocksize, mask)
+    if values is None:
+        stats = np.zeros((), STATS_DTYPE)[()]
+        return (stats, valuehist) if hist else stats
+    n, total, mean, var = values[:4]
+
+    diff = 0.0
+    corr = 1.0
+    if prev is not None and np.shape(prev) == np.shape(data):
+        if prevstats is None:
+            prevstats = frameStats(prev, blocksize=blocksize, mask=mask)
+        diff = frameDifference(data, prev, n, blocksize, mask)
+        corr = _correlation(mean, var, diff, prevstats)
+    stats = np.zeros((), STATS_DTYPE)
+    bounds = tuple(np.nan if b is None else b for b in (lower, upper))
+    stats[()] = (values[:8] + bounds + values[8:10] + (discrete, diff, corr,
+                 values[10]))
+    return (stats[()], valuehist) if hist else stats[()]
+
+def _blockStats(data, lower, upper, blocksize, mask):
+    '''Accumulates the frame statistics block by block
+
+    Returns:
+        A tuple like _countedStats, or None if there are no pixels.
+    '''
+
+    flat = np.ravel(data)
+    blocks = {} if mask is None else mask.blocks(blocksize)
+    exactsum = flat.dtype.kind in 'ui' and flat.dtype.itemsize <= 4
+    acc = np.uint64 if flat.dtype.kind == 'u' else np.int64
+    total = 0
+    mean = 0.0
+    m2 = 0.0
+    lo = None
+    hi = None
+    above = 0
+    below = 0
+    n = 0
+    for start in xrange(0, flat.size, blocksize):
+        blk = flat[start:start+blocksize]
+        if start in blocks:
+            blk = blk.take(blocks[start])
+        bn = blk.size
+        if bn == 0:
+            continue
+        bmin = blk.min()
+        bmax = blk.max()
+        lo = bmin if lo is None or bmin < lo else lo
+        hi = bmax if hi is None or bmax > hi else hi
+        if exactsum:
+            bsum = int(blk.sum(dtype=acc))
+        else:
+            bsum = float(blk.sum(dtype=np.float64))
+        bmean = bsum / float(bn)
+        dev = np.subtract(blk, bmean, dtype=np.float64)
+        bm2 = float(np.dot(dev, dev))
+        delta = bmean - mean
+        m2 += bm2 + delta * delta * n * bn / (n + bn)
+        mean += delta * bn / (n + bn)
+        total += bsum
+        if upper is not None:
+            above += np.count_nonzero(blk > upper)
+        if lower is not None:
+            below += np.count_nonzero(blk < lower)
+        n += bn
+    if n == 0:
+        return None
+    if exactsum:
+        mean = total / float(n)
+    counts, edges = histogram(data, CUMBINS, mask=mask, vrange=(lo, hi))
+    cum = np.empty(CUMBINS + 1, dtype=np.uint32)
+    cum[0] = 0
+    np.cumsum(counts, out=cum[1:len(counts)+1])
+    cum[len(counts)+1:] = n
+    return (n, total, mean, m2 / n, lo, hi, above, below, edges[0],
+            edges[1] - edges[0], cum)
+
+def frameDifference(data, prev, n, blocksize=BLOCKSIZE, mask=None):
+    '''Computes the root mean square difference of two frames
+
+    Args:
+        data:      2D ndarray with the frame pixels.
+        prev:      The previous frame, of the same shape.
+        n:         Number of pixels left after the mask, at least 1.
+        blocksize: Number of pixels per block.
+        mask:      Optional PixelMask of the pixels to leave out.
+    Returns:
+        The difference, as stored in 'diff'.
+    '''
+
+    return np.sqrt(_diffSquares(data, prev, blocksize, mask) / float(n))
+
+def frameCorrelation(stats, prevstats):
+    '''Takes the correlation of two frames from their statistics
+
+    No pixels are read, the correlation follows from the frame difference
+    and the means and variances of both frames.
+
+    Args:
+        stats:     A record of STATS_DTYPE with the 'diff' to the frame
+                   before.
+        prevstats: The record of the frame before.
+    Returns:
+        The correlation, as stored in 'corr'.
+    '''
+
+    return _correlation(stats['mean'], stats['var'], stats['diff'],
+                        prevstats)
+
+def _correlation(mean, var, diff, prevstats):
+    pvar = prevstats['var']
+    # var(a - b) = var(a) + var(b) - 2 cov(a, b)
+    vard = diff * diff - (mean - prevstats['mean']) ** 2
+    if var > 0 and pvar > 0:
+        corr = (var + pvar - vard) / (2 * np.sqrt(var * pvar))
+        return min(max(corr, -1.0), 1.0)
+    elif vard > 0:
+        return 0.0
+    return 1.0
+
+def _diffSquares(data, prev, blocksize, mask):
+    '''Sums the squared differences of the pixels of two frames'''
+
+    flat = np.ravel(data)
+    pflat = np.ravel(prev)
+    blocks = {} if mask is None else mask.blocks(blocksize)
+    exact = all(a.dtype.kind in 'ui' and a.dtype.itemsize <= 2
+                for a in (flat, pflat))
+    diffsq = 0
+    for start in xrange(0, flat.size, blocksize):
+        blk = flat[start:start+blocksize]
+        pblk = pflat[start:start+blocksize]
+        if start in blocks:
+            blk = blk.take(blocks[start])
+            pblk = pblk.take(blocks[start])
+        if exact:
+            d = blk.astype(np.int64)
+            d -= pblk
+            diffsq += int(np.dot(d, d))
+        else:
+            d = np.subtract(blk, pblk, dtype=np.float64)
+            diffsq += float(np.dot(d, d))
+    return diffsq
+
+def _cumPosition(recs, value):
+    '''Returns the position of value in units of cumulative histogram bins'''
+    value = np.where(recs['discrete'], np.ceil(value), value)
+    width = np.where(recs['cumwidth'] > 0, recs['cumwidth'], 1.0)
+    return value, np.clip((value - recs['cumlo']) / width, 0, CUMBINS)
+
+def countBelow(stats, value):
+    '''Counts the pixels below a value from the cumulative histograms
+
+    Where value falls outside the pixel range, or on a bin edge of integer
+    pixels, the count is exact, see exactBelow. Otherwise the pixels of the
+    bin holding value are taken to be spread evenly over it, which is only
+    an estimate: a frame with a single hot pixel has nearly all of its
+    pixels in the first bin. Frames are not read again, so many frames can
+    be thresholded at once.
+
+    Args:
+        stats: A record or array of records of STATS_DTYPE.
+        value: Pixels strictly below this value are counted.
+    Returns:
+        The number of pixels, or an array of numbers when stats is an
+        array.
+    '''
+
+    recs = np.atleast_1d(stats)
+    value, pos = _cumPosition(recs, value)
+    i = np.minimum(pos.astype(np.intp), CUMBINS - 1)
+    rows = np.arange(len(recs))
+    cum = recs['cum']
+    lo = cum[rows, i].astype(np.float64)
+    hi = cum[rows, i + 1].astype(np.float64)
+    counts = lo + (pos - i) * (hi - lo)
+    counts[value > recs['max']] = recs['n'][value > recs['max']]
+    return counts if np.ndim(stats) else counts[0]
+
+def exactBelow(stats, value):
+    '''Tells where countBelow is exact
+
+    That is where value is at most the minimum or above the maximum pixel,
+    or where integer pixels have a bin edge at value. The bins of integer
+    frames are a whole number of values wide and hold their lower edge.
+
+    Args:
+        stats: A record or array of records of STATS_DTYPE.
+        value: The value passed to countBelow.
+    Returns:
+        A boolean, or an array of booleans when stats is an array.
+    '''
+
+    recs = np.atleast_1d(stats)
+    value, pos = _cumPosition(recs, value)
+    edge = recs['discrete'] & (pos == np.floor(pos)) & (pos < CUMBINS)
+    exact = edge | (value <= recs['min']) | (value > recs['max'])
+    return exact if np.ndim(stats) else exact[0]
+
+def _upperBelow(stats, upper):
+    # Integer pixels above upper are those not below floor(upper) + 1.
+    return np.where(stats['discrete'], np.floor(upper) + 1, upper)
+
+def boundsExact(stats, lower, upper):
+    '''Tells where rrValue serves the bound choices exactly
+
+    That is where the pixels outside the bounds were counted with these
+    bounds, or the cumulative histograms give them exactly, see exactBelow.
+    The other frames must be read again for exact counts.
+
+    Args:
+        stats: An array of records of STATS_DTYPE.
+        lower: Lower bound of 'Pixels Below Lower Bound'.
+        upper: Upper bound of 'Pixels Above Upper Bound'.
+    Returns:
+        An array of booleans.
+    '''
+
+    stats = np.atleast_1d(stats)
+    return (((stats['lowerbound'] == lower) | exactBelow(stats, lower)) &
+            ((stats['upperbound'] == upper) |
+             exactBelow(stats, _upperBelow(stats, upper))))
+
+def rrValue(stats, rrchoice, lower=None, upper=None):
+    '''Extracts a reduced representation from frame statistics
+
+    Args:
+        stats:    A record or array of records of STATS_DTYPE.
+        rrchoice: The reduced representation, as listed in the ControlPanel.
+        lower:    Lower bound for 'Pixels Below Lower Bound'. Defaults to
+                  the one the statistics were gathered with. Frames whose
+                  pixels were counted with another bound are taken from
+                  the cumulative histograms, see boundsExact.
+        upper:    Upper bound for 'Pixels Above Upper Bound', like lower.
+    Returns:
+        The value, or an array of values when stats is an array.
+    Exceptions:
+        KeyError: rrchoice can not be served from frame statistics.
+    '''
+
+    if rrchoice == 'Mean':
+        return stats['mean']
+    elif rrchoice == 'Total Intensity':
+        return stats['sum']
+    elif rrchoice == 'Standard Deviation':
+        return np.sqrt(stats['var'])
+    elif rrchoice == 'Frame Difference':
+        return stats['diff']
+    elif rrchoice == 'Frame Correlation':
+        return stats['corr']
+    n = np.maximum(np.asarray(stats['n'], dtype=float), 1)
+    if rrchoice == 'Pixels Above Upper Bound':
+        if upper is None:
+            return stats['above'] / n
+        counts = stats['n'] - countBelow(stats, _upperBelow(stats, upper))
+        return np.where(stats['upperbound'] == upper, stats['above'],
+                        counts) / n
+    elif rrchoice == 'Pixels Below Lower Bound':
+        if lower is None:
+            return stats['below'] / n
+        return np.where(stats['lowerbound'] == lower, stats['below'],
+                        countBelow(stats, lower)) / n
+    raise KeyError('Unknown reduced representation: %s' % rrchoice)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import numpy as np
+
+class IntegralImage(object):
+    '''Summed area tables of a frame for region statistics
+
+    Entry (i, j) of a table holds the total of all pixels above and left of
+    pixel (i, j), so the total over any rectangle takes four lookups. Tables
+    of the pixel values and of their squares are kept, and with a mask also
+    one of the number of valid pixels. Integer frames of up to 16 bits are
+    summed exactly in 64 bit integers. Other frames are summed in floats,
+    relative to the frame mean so that the variance keeps its precision.
+    '''
+
+    def __init__(self, data, mask=None):
+        '''Constructor called when an IntegralImage object is initialized
+
+        Args:
+            data: 2D ndarray with the frame pixels.
+            mask: Optional PixelMask of the pixels to leave out.
+        '''
+
+        self.shape = data.shape
+        exact = data.dtype.kind in 'ui' and data.dtype.itemsize <= 2
+        acc = np.int64 if exact else np.float64
+        values = data.astype(acc)
+        self.offset = 0.0
+        if not exact:
+            self.offset = float(values.mean())
+            values -= self.offset
+        if mask is not None:
+            mask.check(data)
+            values[mask.masked] = 0
+            self.count = self._table(~mask.masked, np.int32)
+        else:
+            self.count = None
+        self.sum = self._table(values, acc)
+        np.multiply(values, values, out=values)
+        self.sumsq = self._table(values, acc)
+        return
+
+    def _table(self, values, dtype):
+        h, w = self.shape
+        table = np.zeros((h + 1, w + 1), dtype=dtype)
+        np.cumsum(values, axis=0, dtype=dtype, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+        return table
+
+    @property
+    def nbytes(self):
+        '''Number of bytes held by the tables'''
+        count = 0 if self.count is None else self.count.nbytes
+        return self.sum.nbytes + self.sumsq.nbytes + count
+
+    def _total(self, table, y0, x0, y1, x1):
+        return (table[y1, x1] - table[y0, x1] - table[y1, x0]
+                + table[y0, x0])
+
+    def stats(self, x0, y0, x1, y1):
+        '''Returns the statistics of a rectangle
+
+        The rectangle covers every pixel it touches and is clipped to the
+        frame.
+
+        Args:
+            x0, y0: Column and row of one corner, in pixels.
+            x1, y1: Column and row of the opposite corner.
+        Returns:
+            A dict with the number of pixels 'n', and their 'sum', 'mean'
+            and 'std'.
+        '''
+
+        h, w = self.shape
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        x0 = min(max(int(np.floor(x0)), 0), w)
+        y0 = min(max(int(np.floor(y0)), 0), h)
+        x1 = min(max(int(np.ceil(x1)), x0), w)
+        y1 = min(max(int(np.ceil(y1)), y0), h)
+        if self.count is None:
+            n = (x1 - x0) * (y1 - y0)
+        else:
+            n = int(self._total(self.count, y0, x0, y1, x1))
+        total = self._total(self.sum, y0, x0, y1, x1)
+        if n == 0:
+            return {'n': 0, 'sum': 0.0, 'mean': 0.0, 'std': 0.0}
+        totalsq = self._total(self.sumsq, y0, x0, y1, x1)
+        if self.sum.dtype.kind == 'i':
+            var = (n * int(totalsq) - int(total) ** 2) / float(n * n)
+        else:
+            mean = total / n
+            var = max(totalsq / n - mean * mean, 0.0)
+        total = float(total) + n * self.offset
+        return {'n': n, 'sum': total, 'mean': total / n,
+                'std': float(np.sqrt(var))}
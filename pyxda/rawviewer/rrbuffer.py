@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import numpy as np
+
+class RRBuffer(object):
+    '''Growable array of reduced representation values
+
+    Values are appended into a preallocated array whose capacity doubles
+    whenever it fills up, so appending n values costs O(n) overall. The
+    values and their frame indices are exposed as views, which can be
+    handed to a plot without copying.
+    '''
+
+    def __init__(self, capacity=1024):
+        '''Constructor called when an RRBuffer object is initialized
+
+        Args:
+            capacity: Number of values to preallocate room for.
+        '''
+
+        self.size = 0
+        self._values = np.empty(capacity, dtype=np.float64)
+        self._index = np.arange(capacity, dtype=np.float64)
+        return
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self._values)
+
+    @property
+    def values(self):
+        '''View of the appended values'''
+        return self._values[:self.size]
+
+    @property
+    def index(self):
+        '''View of the frame indices of the appended values'''
+        return self._index[:self.size]
+
+    def append(self, values):
+        '''Appends one value or an array of values
+
+        Args:
+            values: Scalar or 1D array of values.
+        '''
+
+        values = np.atleast_1d(values)
+        end = self.size + len(values)
+        if end > self.capacity:
+            capacity = self.capacity
+            while capacity < end:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:self.size] = self.values
+            self._values = grown
+            self._index = np.arange(capacity, dtype=np.float64)
+        self._values[self.size:end] = values
+        self.size = end
+        return
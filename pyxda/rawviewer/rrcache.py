@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import zlib
+import hashlib
+import sqlite3
+
+import numpy as np
+
+from reduction import STATS_DTYPE
+
+CACHENAME = '.pyxda-rrcache.sqlite'
+
+# Table of the statistics.
+TABLE = 'rrstats'
+
+# Table of the value histograms, see reduction.frameStats.
+HISTTABLE = 'rrhists'
+
+# Layout of the database, kept as its user_version. Databases of another
+# layout are emptied when opened.
+LAYOUT = 6
+
+# Number of paths looked up per query. SQLite allows at most 999 query
+# parameters by default.
+LOOKUPBATCH = 500
+
+def userCacheDir():
+    '''Returns the per-user pyxda cache directory'''
+
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'pyxda')
+
+class RRCache(object):
+    '''Persistent store of per-frame statistics
+
+    Statistics are kept in an SQLite database next to the frames, or in the
+    user cache directory when the dataset directory is read-only. Entries
+    are keyed by the frame path relative to the dataset directory and a tag
+    naming the correction applied to the frames, and are only used while the
+    file size and modification time still match. The differences to the
+    previous frame are only valid for the same previous frame, so its path,
+    size and modification time must match as well. Array valued statistics,
+    such as the cumulative histograms, are stored as blobs. The value
+    histograms of integer frames are kept in a table of their own, as
+    compressed blobs, so that pixels outside any bounds can be counted
+    exactly without reading the frames.
+    '''
+
+    def __init__(self, dirpath, cachedir=None):
+        '''Constructor called when an RRCache object is initialized
+
+        Args:
+            dirpath:  The dataset directory, or an HDF5 stack file whose
+                      directory is then used.
+            cachedir: Directory for the database when dirpath is not
+                      writable. Defaults to userCacheDir().
+        '''
+
+        self.dirpath = os.path.abspath(dirpath)
+        if os.path.isfile(self.dirpath):
+            self.dirpath = os.path.dirname(self.dirpath)
+        if os.access(self.dirpath, os.W_OK):
+            self.dbpath = os.path.join(self.dirpath, CACHENAME)
+        else:
+            cachedir = cachedir or userCacheDir()
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+            key = hashlib.md5(self.dirpath).hexdigest()
+            self.dbpath = os.path.join(cachedir, key + '.sqlite')
+        self.fields = STATS_DTYPE.names
+        self._conn = None
+        return
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = conn = sqlite3.connect(self.dbpath,
+                                                check_same_thread=False)
+            if conn.execute('PRAGMA user_version').fetchone()[0] != LAYOUT:
+                # Statistics of another layout can not be read, which
+                # includes tables of earlier layouts under other names.
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")]
+                with conn:
+                    for table in tables:
+                        conn.execute('DROP TABLE "%s"' % table)
+                    conn.execute('PRAGMA user_version = %d' % LAYOUT)
+            conn.execute('CREATE TABLE IF NOT EXISTS %s '
+                         '(path TEXT, tag TEXT, prev TEXT, '
+                         'prevsize INTEGER, prevmtime REAL, '
+                         'size INTEGER, mtime REAL, '
+                         'lower REAL, upper REAL, %s, '
+                         'PRIMARY KEY (path, tag))'
+                         % (TABLE, ', '.join(self.fields)))
+            conn.execute('CREATE TABLE IF NOT EXISTS %s '
+                         '(path TEXT, tag TEXT, size INTEGER, mtime REAL, '
+                         'hist BLOB, PRIMARY KEY (path, tag))' % HISTTABLE)
+        return self._conn
+
+    def _select(self, columns, table, relpaths, tag):
+        '''Reads the rows of the given paths, keyed by path'''
+
+        # Only the rows of the requested paths are read, through the
+        # primary key, so a batch costs the same however large the cache.
+        rows = {}
+        try:
+            conn = self._connect()
+            for start in xrange(0, len(relpaths), LOOKUPBATCH):
+                batch = relpaths[start:start+LOOKUPBATCH]
+                query = ('SELECT path, %s FROM %s '
+                         'WHERE tag = ? AND path IN (%s)'
+                         % (columns, table, ', '.join('?' * len(batch))))
+                for row in conn.execute(query, [tag] + batch):
+                    rows[row[0]] = row[1:]
+        except sqlite3.Error as msg:
+            print 'RR cache unavailable: %s' % msg
+        return rows
+
+    def _keys(self, paths, keys):
+        '''Returns the given keys, or stats the files'''
+        if keys is not None:
+            return list(keys)
+        keys = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                keys.append((st.st_size, st.st_mtime))
+            except OSError:
+                keys.append(None)
+        return keys
+
+    def lookup(self, paths, lower=None, upper=None, keys=None, tag='',
+               prev=None):
+        '''Looks up cached statistics for frames
+
+        Args:
+            paths: List of frame file paths.
+            lower: Lower bound the statistics must have been gathered with.
+            upper: Upper bound the statistics must have been gathered with.
+            keys:  The (size, mtime) of every file, if already known from a
+                   directory scan. The files are stat'ed otherwise.
+            tag:   Correction and mask the statistics must have been
+                   gathered with, see RREngine.tag.
+            prev:  The (path, key) of the frame before paths[0], if any.
+        Returns:
+            A tuple (stats, keys). stats holds a STATS_DTYPE record for each
+            cache hit and None for each miss. keys holds the (size, mtime)
+            of every file, or None if it could not be read.
+        '''
+
+        relpaths = [os.path.relpath(path, self.dirpath) for path in paths]
+        rows = self._select('prev, prevsize, prevmtime, size, mtime, lower, '
+                            'upper, ' + ', '.join(self.fields), TABLE,
+                            relpaths, tag)
+        keys = self._keys(paths, keys)
+        prevs = [prev] + zip(paths, keys)[:-1]
+        stats = []
+        for relpath, key, before in zip(relpaths, keys, prevs):
+            row = rows.get(relpath)
+            ident = self._prev(before)
+            if key is None or row is None or ident[0] is None or \
+                    tuple(row[:7]) != ident + key + (lower, upper):
+                stats.append(None)
+            else:
+                rec = np.zeros((), STATS_DTYPE)
+                rec[()] = tuple(self._decode(f, value) for f, value
+                                in zip(self.fields, row[7:]))
+                stats.append(rec[()])
+        return stats, keys
+
+    def store(self, entries, lower=None, upper=None, tag=''):
+        '''Stores statistics for frames
+
+        Args:
+            entries: List of (path, key, stats, prev) tuples, where key is
+                     the (size, mtime) returned by lookup and prev the
+                     (path, key) of the frame before, or None. Entries
+                     without a key are skipped.
+            lower:   Lower bound the statistics were gathered with.
+            upper:   Upper bound the statistics were gathered with.
+            tag:     Correction and mask the statistics were gathered with.
+        '''
+
+        rows = []
+        for path, key, stats, prev in entries:
+            if key is None:
+                continue
+            row = ((os.path.relpath(path, self.dirpath), tag) +
+                   self._prev(prev) + key + (lower, upper))
+            rows.append(row + tuple(self._encode(stats[f])
+                                    for f in self.fields))
+        if not rows:
+            return
+        marks = ', '.join('?' * (9 + len(self.fields)))
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO %s VALUES (%s)'
+                                 % (TABLE, marks), rows)
+        except sqlite3.Error as msg:
+            print 'RR cache not updated: %s' % msg
+        return
+
+    def lookupHistograms(self, paths, keys=None, tag=''):
+        '''Looks up cached value histograms for frames
+
+        Args:
+            paths: List of frame file paths.
+            keys:  The (size, mtime) of every file, like for lookup.
+            tag:   Correction and mask the histograms must have been taken
+                   with, see RREngine.tag.
+        Returns:
+            A tuple (hists, keys). hists holds a (values, counts) tuple,
+            see reduction.boundCounts, for each cache hit and None for each
+            miss. keys is like for lookup.
+        '''
+
+        relpaths = [os.path.relpath(path, self.dirpath) for path in paths]
+        rows = self._select('size, mtime, hist', HISTTABLE, relpaths, tag)
+        keys = self._keys(paths, keys)
+        hists = []
+        for relpath, key in zip(relpaths, keys):
+            row = rows.get(relpath)
+            if key is None or row is None or tuple(row[:2]) != key:
+                hists.append(None)
+            else:
+                hists.append(self._decodeHist(row[2]))
+        return hists, keys
+
+    def storeHistograms(self, entries, tag=''):
+        '''Stores value histograms for frames
+
+        Args:
+            entries: List of (path, key, hist) tuples, where key is like for
+                     store and hist is a (values, counts) tuple. Entries
+                     without a key or a histogram are skipped.
+            tag:     Correction and mask the histograms were taken with.
+        '''
+
+        rows = [(os.path.relpath(path, self.dirpath), tag) + tuple(key) +
+                (self._encodeHist(hist),)
+                for path, key, hist in entries
+                if key is not None and hist is not None]
+        if not rows:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO %s VALUES '
+                                 '(?, ?, ?, ?, ?)' % HISTTABLE, rows)
+        except sqlite3.Error as msg:
+            print 'RR cache not updated: %s' % msg
+        return
+
+    def _encodeHist(self, hist):
+        # Differences of the sorted values compress far better.
+        values, counts = hist
+        steps = np.ediff1d(values, to_begin=values[:1]).astype('<i4')
+        return sqlite3.Binary(zlib.compress(steps.tostring() +
+                                            counts.astype('<u4').tostring()))
+
+    def _decodeHist(self, blob):
+        buf = zlib.decompress(blob)
+        half = len(buf) // 2
+        values = np.cumsum(np.frombuffer(buf[:half], dtype='<i4'),
+                           dtype=np.int32)
+        return values, np.frombuffer(buf[half:], dtype='<u4')
+
+    def _prev(self, prev):
+        '''Identifies the previous frame by its relative path and key'''
+        if prev is None:
+            return ('', -1, -1.0)
+        path, key = prev
+        if key is None:
+            # The previous frame could not be stat'ed, see lookup.
+            return (None, None, None)
+        return (os.path.relpath(path, self.dirpath),) + tuple(key)
+
+    def _encode(self, value):
+        if np.ndim(value):
+            return sqlite3.Binary(np.ascontiguousarray(value).tostring())
+        return value.item()
+
+    def _decode(self, field, value):
+        dtype = STATS_DTYPE[field]
+        if dtype.shape:
+            return np.frombuffer(value, dtype=dtype.base)
+        return value
+
+    def close(self):
+        '''Closes the database connection'''
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        return
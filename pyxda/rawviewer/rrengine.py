@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+from reduction import frameStats, boundCounts, frameDifference, \
+                      frameCorrelation, STATS_DTYPE
+from pixelstats import PixelStats
+from tiffreader import readFrame
+
+# Number of newly reduced frames written to the cache at a time.
+STOREBATCH = 256
+
+# Most consecutive frames handed to a pool worker at a time. A worker keeps
+# the previous frame of a run resident for the frame differences, and reads
+# it once more only for the first frame of the run, when frames are
+# compared.
+RUNLENGTH = 16
+
+# DarkCorrection and PixelMask of the pool worker process, see _initWorker.
+_correction = None
+_mask = None
+
+def _initWorker(correction, mask):
+    '''Hands the correction and mask to a pool worker once, at its start'''
+    global _correction, _mask
+    _correction = correction
+    _mask = mask
+    return
+
+def _readFrame(path, correction):
+    data = readFrame(path)
+    if correction is not None:
+        data = correction.apply(data)
+    return data
+
+def _reduceRun(args, correction=None, mask=None):
+    '''Decode consecutive frames and gather their statistics
+
+    Runs inside a pool worker, so only the paths travel to the worker and
+    only the statistics records travel back. Only the frame being reduced
+    and the one before it are held in memory. The record of the frame
+    before paths[0] is not known here, so the correlation of the first
+    frame is left NaN, to be taken from the records in order, see
+    RREngine._correlate.
+
+    Args:
+        args:       Tuple of (paths, prev, lower, upper, compare), where
+                    prev is the path of the frame before paths[0], or None.
+                    Without compare the frames are not compared to the
+                    frame before and 'diff' and 'corr' are NaN.
+        correction: DarkCorrection applied to the frames. Defaults to the
+                    one the worker was started with.
+        mask:       PixelMask of the pixels to leave out. Defaults to the
+                    one the worker was started with.
+    Returns:
+        A generator yielding a tuple (stats, hist) per path, a record of
+        reduction.STATS_DTYPE and the value histogram, see
+        reduction.frameStats.
+    '''
+
+    paths, prev, lower, upper, compare = args
+    correction = correction or _correction
+    mask = mask or _mask
+    prevdata = prevstats = None
+    if compare and prev is not None:
+        prevdata = _readFrame(prev, correction)
+    for path in paths:
+        data = _readFrame(path, correction)
+        stats, hist = frameStats(data, lower, upper, mask=mask, hist=True)
+        if not compare or (prevdata is not None and stats['n'] > 0 and
+                           prevdata.shape == data.shape):
+            rec = np.array(stats, dtype=STATS_DTYPE)
+            if compare:
+                rec['diff'] = frameDifference(data, prevdata, stats['n'],
+                                              mask=mask)
+                rec['corr'] = np.nan
+                if prevstats is not None:
+                    rec['corr'] = frameCorrelation(rec, prevstats)
+            else:
+                rec['diff'] = rec['corr'] = np.nan
+            stats = rec[()]
+        if compare:
+            prevdata, prevstats = data, stats
+        yield stats, hist
+    return
+
+def _reduceRunList(args):
+    return list(_reduceRun(args))
+
+def _countRun(args, correction=None, mask=None):
+    '''Count the pixels outside bounds in consecutive frames
+
+    Runs inside a pool worker like _reduceRun, but only the bound counts
+    are taken.
+
+    Args:
+        args:       Tuple of (paths, prev, lower, upper, compare). prev and
+                    compare are ignored.
+        correction: DarkCorrection applied to the frames. Defaults to the
+                    one the worker was started with.
+        mask:       PixelMask of the pixels to leave out. Defaults to the
+                    one the worker was started with.
+    Returns:
+        A generator yielding a tuple (below, above) per path.
+    '''
+
+    paths, prev, lower, upper, compare = args
+    correction = correction or _correction
+    mask = mask or _mask
+    for path in paths:
+        data = _readFrame(path, correction)
+        if mask is not None:
+            mask.check(data)
+            data = np.ravel(data).take(mask.valid)
+        yield (int(np.count_nonzero(data < lower)),
+               int(np.count_nonzero(data > upper)))
+    return
+
+def _countRunList(args):
+    return list(_countRun(args))
+
+def _runs(items, runlength):
+    '''Groups (path, prev) pairs into runs of consecutive frames
+
+    Returns:
+        A generator yielding (paths, prev) per run.
+    '''
+
+    run = []
+    first = None
+    for path, prev in items:
+        if run and (prev != run[-1] or len(run) >= runlength):
+            yield run, first
+            run = []
+        if not run:
+            first = prev
+        run.append(path)
+    if run:
+        yield run, first
+    return
+
+def _chain(paths, prev=None):
+    '''Pairs every path with the path before it'''
+    for path in paths:
+        yield path, prev
+        prev = path
+    return
+
+def _stackStats(paths, correction=None, token=None):
+    '''Gather the per-pixel statistics of consecutive frames
+
+    Runs inside a pool worker on one part of the stack, see
+    RREngine.pixelStats.
+
+    Args:
+        paths:      List of frame file paths.
+        correction: DarkCorrection applied to the frames. Defaults to the
+                    one the worker was started with.
+        token:      Optional CancelToken checked before every frame, when
+                    run in the calling process.
+    Returns:
+        A PixelStats, or None if cancelled.
+    '''
+
+    correction = correction or _correction
+    stats = PixelStats()
+    for path in paths:
+        if token is not None and token.cancelled:
+            return None
+        stats.add(_readFrame(path, correction))
+    return stats
+
+class RREngine(object):
+    '''Parallel reduced representation engine
+
+    Fans frame decoding and reduction out over a multiprocessing pool and
+    hands the results back in frame order. At most maxinflight frames are
+    queued in the pool at any time, so memory use stays bounded no matter
+    how long the scan is.
+
+    Frames are dark corrected first when a DarkCorrection is set as the
+    correction attribute, and pixels of a PixelMask set as the mask attribute
+    are left out. Both are sent to every worker once. Workers get runs of
+    consecutive frames, so that every frame is compared to the one before
+    it without being decoded twice.
+    '''
+
+    def __init__(self, nprocs=None, maxinflight=None):
+        '''Constructor called when an RREngine object is initialized
+
+        Args:
+            nprocs:      Number of worker processes. Defaults to the number
+                         of cores. A value of 1 reduces in the calling thread.
+            maxinflight: Maximum number of frames submitted to the pool but
+                         not yet handed back. Defaults to 4 runs of
+                         RUNLENGTH frames per worker.
+        '''
+
+        self.nprocs = nprocs or multiprocessing.cpu_count()
+        self.maxinflight = maxinflight
+        self.correction = None
+        self.mask = None
+        self._pool = None
+        self._poolsize = 0
+        self._poolsetup = (None, None)
+        return
+
+    def _getPool(self):
+        '''Returns a pool with nprocs workers, creating it if needed'''
+
+        setup = (self.correction, self.mask)
+        if self._pool is not None and (self._poolsize != self.nprocs or
+                any(a is not b for a, b in zip(setup, self._poolsetup))):
+            self.close()
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.nprocs, _initWorker, setup)
+            self._poolsize = self.nprocs
+            self._poolsetup = setup
+        return self._pool
+
+    def tag(self):
+        '''Names the correction and mask for the RR cache'''
+
+        tags = []
+        if self.correction is not None:
+            tags.append('dark:' + self.correction.key)
+        if self.mask is not None:
+            tags.append('mask:' + self.mask.key)
+        return ' '.join(tags)
+
+    def imap(self, paths, lower=None, upper=None, cache=None, keys=None,
+             prev=None, prevkey=None, compare=True, prevstats=None):
+        '''Reduce frames in parallel
+
+        Every frame is decoded once and all of its statistics are gathered
+        in the same pass, see reduction.frameStats. Comparing every frame
+        with the one before it costs a pass of its own, and a decode of the
+        frame before every run, so it can be left out.
+
+        Args:
+            paths:   Iterable of frame file paths.
+            lower:   Lower bound for the 'below' pixel count.
+            upper:   Upper bound for the 'above' pixel count.
+            cache:   Optional RRCache. Frames found in it are not decoded
+                     and newly reduced frames are stored in it.
+            keys:    Optional (size, mtime) of every path for the cache, see
+                     RRCache.lookup.
+            prev:    Path of the frame before the first one, if any, for
+                     the frame difference.
+            prevkey: Optional (size, mtime) of prev for the cache.
+            compare: If False the frames are not compared and their 'diff'
+                     and 'corr' are NaN. Cached records of frames that were
+                     not compared are not used otherwise.
+            prevstats: The statistics record of prev, if known. It is taken
+                     from prev otherwise, if needed.
+        Returns:
+            A generator yielding one statistics record per path, in path
+            order.
+        '''
+
+        if cache is not None:
+            return self._imapCached(list(paths), lower, upper, cache, keys,
+                                    prev, prevkey, compare, prevstats)
+        results = self._imapItems(_chain(paths, prev), lower, upper,
+                                  compare=compare)
+        return self._correlate((stats for stats, hist in results), prev,
+                               prevstats)
+
+    def countBounds(self, paths, lower, upper, cache=None, keys=None):
+        '''Count the pixels outside bounds in parallel
+
+        Only used to count exactly what the cumulative histograms of the
+        statistics can not, see reduction.boundsExact. Frames whose value
+        histogram is cached are counted from it, the others are decoded
+        again.
+
+        Args:
+            paths: Iterable of frame file paths.
+            lower: Pixels strictly below this value are counted.
+            upper: Pixels strictly above this value are counted.
+            cache: Optional RRCache holding value histograms.
+            keys:  Optional (size, mtime) of every path for the cache.
+        Returns:
+            A generator yielding a tuple (below, above) per path, in path
+            order.
+        '''
+
+        if cache is None:
+            return self._imapItems(_chain(paths), lower, upper, _countRun,
+                                   _countRunList)
+        return self._countCached(list(paths), lower, upper, cache, keys)
+
+    def _countCached(self, paths, lower, upper, cache, keys=None):
+        hists, keys = cache.lookupHistograms(paths, keys, self.tag())
+        misses = [path for path, hist in zip(paths, hists) if hist is None]
+        print '%d of %d frames counted from cached histograms' % (
+            len(paths) - len(misses), len(paths))
+        counted = self._imapItems(_chain(misses), lower, upper, _countRun,
+                                  _countRunList)
+        for hist in hists:
+            if hist is None:
+                yield next(counted)
+            else:
+                yield boundCounts(hist, lower, upper)
+        return
+
+    def _imapItems(self, items, lower, upper, reduce=_reduceRun,
+                   reducelist=_reduceRunList, compare=True):
+        if self.nprocs <= 1:
+            return (stats for run, prev in _runs(items, RUNLENGTH)
+                    for stats in reduce((run, prev, lower, upper, compare),
+                                        self.correction, self.mask))
+        return self._imapPool(items, lower, upper, reducelist, compare)
+
+    def _imapPool(self, items, lower, upper, reducelist=_reduceRunList,
+                  compare=True):
+        pool = self._getPool()
+        maxinflight = self.maxinflight or 4 * RUNLENGTH * self.nprocs
+        runlength = max(1, min(RUNLENGTH, maxinflight // self.nprocs))
+        pending = deque()
+        inflight = 0
+        for run, prev in _runs(items, runlength):
+            args = ((run, prev, lower, upper, compare),)
+            pending.append(pool.apply_async(reducelist, args))
+            inflight += len(run)
+            while inflight >= maxinflight:
+                results = pending.popleft().get()
+                inflight -= len(results)
+                for stats in results:
+                    yield stats
+        while pending:
+            for stats in pending.popleft().get():
+                yield stats
+        return
+
+    def _correlate(self, statsiter, prev, prevstats):
+        '''Completes the correlations left out by _reduceRun, in order'''
+        for stats in statsiter:
+            stats = self._correlation(stats, prev, prevstats)
+            prevstats = stats
+            yield stats
+        return
+
+    def _correlation(self, stats, prev, prevstats):
+        if not np.isnan(stats['corr']) or np.isnan(stats['diff']):
+            return stats
+        if prevstats is None:
+            # Only the frame before the first one can be unknown.
+            prevstats = frameStats(_readFrame(prev, self.correction),
+                                   mask=self.mask)
+        rec = np.array(stats, dtype=STATS_DTYPE)
+        rec['corr'] = frameCorrelation(stats, prevstats)
+        return rec[()]
+
+    def _imapCached(self, paths, lower, upper, cache, keys=None, prev=None,
+                    prevkey=None, compare=True, prevstats=None):
+        tag = self.tag()
+        if prev is not None and prevkey is None:
+            try:
+                st = os.stat(prev)
+                prevkey = (st.st_size, st.st_mtime)
+            except OSError:
+                pass
+        cached, keys = cache.lookup(paths, lower, upper, keys, tag,
+                                    prev and (prev, prevkey))
+        if compare:
+            cached = [None if stats is not None and np.isnan(stats['diff'])
+                      else stats for stats in cached]
+        prevs = [prev] + paths[:-1]
+        prevkeys = [prevkey] + keys[:-1]
+        misses = [(path, before) for path, before, stats
+                  in zip(paths, prevs, cached) if stats is None]
+        print '%d of %d frames found in cache' % (len(paths) - len(misses),
+                                                  len(paths))
+        computed = self._imapItems(misses, lower, upper, compare=compare)
+        fresh = []
+        hists = []
+        try:
+            for path, stats, key, before, beforekey in zip(paths, cached, keys,
+                                                           prevs, prevkeys):
+                if stats is None:
+                    stats, hist = next(computed)
+                    stats = self._correlation(stats, prev, prevstats)
+                    fresh.append((path, key, stats,
+                                  before and (before, beforekey)))
+                    hists.append((path, key, hist))
+                    if len(fresh) >= STOREBATCH:
+                        cache.store(fresh, lower, upper, tag)
+                        cache.storeHistograms(hists, tag)
+                        fresh = []
+                        hists = []
+                prevstats = stats
+                yield stats
+        finally:
+            cache.store(fresh, lower, upper, tag)
+            cache.storeHistograms(hists, tag)
+        return
+
+    def pixelStats(self, paths, token=None):
+        '''Per-pixel statistics over all frames
+
+        The frames are split into one run of consecutive frames per worker,
+        so every worker reads its part of the dataset in order, and the
+        partial statistics are merged in frame order. The pixel mask does
+        not apply, every pixel gets its own statistics.
+
+        Args:
+            paths: List of frame file paths.
+            token: Optional CancelToken. Once cancelled the workers are
+                   stopped and None is returned.
+        Returns:
+            A PixelStats, or None if there are no frames or it was
+            cancelled.
+        Exceptions:
+            ValueError: The frames differ in shape.
+        '''
+
+        paths = list(paths)
+        if not paths:
+            return None
+        if self.nprocs <= 1:
+            return _stackStats(paths, self.correction, token)
+        pool = self._getPool()
+        nparts = min(self.nprocs, len(paths))
+        bounds = [len(paths) * i // nparts for i in range(nparts + 1)]
+        results = [pool.apply_async(_stackStats, (paths[a:b],))
+                   for a, b in zip(bounds, bounds[1:])]
+        stats = PixelStats()
+        for result in results:
+            while True:
+                if token is not None and token.cancelled:
+                    self.close()
+                    return None
+                if result.ready():
+                    break
+                result.wait(0.1)
+            stats.merge(result.get())
+        return stats
+
+    def close(self):
+        '''Terminates the worker pool'''
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._poolsize = 0
+            self._poolsetup = (None, None)
+        return
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import re
+import stat
+import fnmatch
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from metadata import MetadataTable
+from stack import isStack, scanStack
+
+# Number of frames in the first batch, kept small so the first frame is
+# shown quickly, and in every following batch.
+FIRSTBATCH = 64
+SCANBATCH = 1024
+
+ORDERS = ('natural', 'imageNumber')
+
+_DIGITS = re.compile(r'(\d+)')
+
+def naturalKey(name):
+    '''Sort key ordering embedded numbers by value, so frame2 < frame10'''
+    parts = _DIGITS.split(name)
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    parts[0::2] = [part.lower() for part in parts[0::2]]
+    return parts
+
+def _imageNumberKey(path, md):
+    try:
+        return (0, int(md['imageNumber']), naturalKey(path))
+    except (KeyError, ValueError):
+        return (1, 0, naturalKey(path))
+
+def _listEntries(dirpath, pattern):
+    '''Lists the matching file names of a directory with their entries
+
+    os.scandir, or the scandir backport, reports file types without a stat
+    call per file. Without either, names come from os.listdir and include
+    directories, which are dropped once stat'ed.
+    '''
+
+    if scandir is not None:
+        for entry in scandir(dirpath):
+            if fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                yield entry.name, entry
+    else:
+        for name in fnmatch.filter(os.listdir(dirpath), pattern):
+            yield name, None
+
+def scanDirectory(dirpath, pattern='*.tif', order='natural', mdtable=None,
+                  firstbatch=FIRSTBATCH, batchsize=SCANBATCH):
+    '''Lists the frames of a directory in order, in batches
+
+    Only file names are read before the order is known. Every batch is then
+    stat'ed and handed out as soon as it is ready, so the first frames can be
+    shown while the rest of a large directory is still being processed.
+    Files that disappear during the scan, and anything that is not a regular
+    file, are left out.
+
+    Args:
+        dirpath:    The folder path containing the frames.
+        pattern:    Shell pattern of the frame file names.
+        order:      'natural' sorts by file name with embedded numbers
+                    compared by value. 'imageNumber' sorts by the imageNumber
+                    entry of the .metadata sidecars, which are all parsed.
+        mdtable:    MetadataTable to parse the sidecars into for the
+                    'imageNumber' order.
+        firstbatch: Number of frames in the first batch.
+        batchsize:  Number of frames in every following batch.
+    Returns:
+        A generator yielding (paths, sizes, mtimes) lists per batch.
+    Exceptions:
+        OSError:    dirpath can not be listed.
+        ValueError: order is not one of ORDERS.
+    '''
+
+    if order not in ORDERS:
+        raise ValueError('Unknown frame order: %s' % order)
+    entries = dict(_listEntries(dirpath, pattern))
+    paths = [os.path.join(dirpath, name) for name in entries]
+    if order == 'natural':
+        paths.sort(key=naturalKey)
+    else:
+        mdtable = mdtable or MetadataTable()
+        keys = dict((path, _imageNumberKey(path, md)) for path, md in
+                    zip(paths, mdtable.parseAll(paths)))
+        paths.sort(key=keys.get)
+
+    start = 0
+    size = firstbatch
+    while start < len(paths):
+        batch = ([], [], [])
+        for path in paths[start:start+size]:
+            entry = entries[os.path.basename(path)]
+            try:
+                st = entry.stat() if entry is not None else os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            batch[0].append(path)
+            batch[1].append(st.st_size)
+            batch[2].append(st.st_mtime)
+        start += size
+        size = batchsize
+        if batch[0]:
+            yield batch
+    return
+
+def scanDataset(path, pattern='*.tif', order='natural', mdtable=None,
+                firstbatch=FIRSTBATCH, batchsize=SCANBATCH):
+    '''Lists the frames of a directory or of an HDF5 stack, in batches
+
+    Stack frames are listed in stack order, see stack.scanStack, and
+    pattern and order only apply to directories. See scanDirectory for the
+    arguments.
+    '''
+
+    if isStack(path):
+        if order not in ORDERS:
+            raise ValueError('Unknown frame order: %s' % order)
+        return scanStack(path, firstbatch, batchsize)
+    return scanDirectory(path, pattern, order, mdtable, firstbatch, batchsize)
+
+def listFrames(dirpath, pattern='*.tif', order='natural'):
+    '''Returns the ordered paths of all frames of a directory
+
+    See scanDirectory for the arguments.
+    '''
+
+    return [path for batch in scanDirectory(dirpath, pattern, order)
+            for path in batch[0]]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+import heapq
+import itertools
+import Queue
+
+# Job priorities, lower values are processed first. Jobs of equal priority
+# are processed in the order they were queued.
+CONTROL = 0
+INTERACTIVE = 1
+LOAD = 2
+IDLE = 3
+BULK = 4
+
+PRIORITIES = {
+    'reset':                CONTROL,
+    'startload':            CONTROL,
+    'cancelrr':             CONTROL,
+    'updatecache':          INTERACTIVE,
+    'changendx':            INTERACTIVE,
+    'plotdata':             INTERACTIVE,
+    'setdark':              INTERACTIVE,
+    'setmask':              INTERACTIVE,
+    'setbounds':            INTERACTIVE,
+    'maskrect':             INTERACTIVE,
+    'setgeometry':          INTERACTIVE,
+    'showstack':            INTERACTIVE,
+    'plotrr':               INTERACTIVE,
+    'newimages':            LOAD,
+    'newimage':             LOAD,
+    'initcache':            LOAD,
+    'exacthist':            IDLE,
+    'dumpmetrics':          IDLE,
+    'stackimage':           BULK,
+    'extendrr':             BULK,
+    'countbounds':          BULK,
+    }
+
+class CancelToken(object):
+    '''Flag shared by the jobs of one piece of work
+
+    Once cancelled, queued jobs carrying the token are dropped by the
+    JobQueue and running jobs stop at their next check.
+    '''
+
+    def __init__(self):
+        self.cancelled = False
+        return
+
+    def cancel(self):
+        self.cancelled = True
+        return
+
+class JobQueue(Queue.Queue):
+    '''Priority queue of RawViewer jobs
+
+    A drop-in replacement for Queue.Queue taking the same ['jobtype', args]
+    lists. Jobs are handed out by the priority of their type, see
+    PRIORITIES, so navigation is never stuck behind bulk reduction work.
+    Jobs put with a CancelToken are skipped once the token is cancelled.
+    '''
+
+    def _init(self, maxsize):
+        self.queue = []
+        self.seq = itertools.count()
+        return
+
+    def _qsize(self, len=len):
+        return len(self.queue)
+
+    def _put(self, entry):
+        heapq.heappush(self.queue, entry)
+        return
+
+    def _get(self):
+        return heapq.heappop(self.queue)
+
+    def put(self, item, block=True, timeout=None, token=None):
+        '''Queues a job
+
+        Args:
+            item:  Job list, ['jobtype'] or ['jobtype', args].
+            token: Optional CancelToken of the job.
+        '''
+
+        priority = PRIORITIES.get(item[0], LOAD)
+        Queue.Queue.put(self, (priority, next(self.seq), item, token),
+                        block, timeout)
+        return
+
+    def get(self, block=True, timeout=None):
+        '''Returns the most urgent job that has not been cancelled'''
+
+        while True:
+            priority, seq, item, token = Queue.Queue.get(self, block, timeout)
+            if token is None or not token.cancelled:
+                return item
+            self.task_done()
+
+    def clear(self):
+        '''Drops all queued jobs'''
+
+        with self.mutex:
+            dropped = len(self.queue)
+            del self.queue[:]
+            self.unfinished_tasks = max(0, self.unfinished_tasks - dropped)
+            if self.unfinished_tasks == 0:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+        return
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import threading
+
+import numpy as np
+
+# A dataset can be a single HDF5 file holding all frames in the 'frames'
+# dataset, chunked one frame per chunk, their original file names in
+# 'names' and every .metadata entry as a column of the 'metadata' group.
+# Frame i of a stack is addressed by the path '<stack file>::<i>'.
+STACKSEP = '::'
+STACKEXTS = ('.h5', '.hdf5')
+FRAMES = 'frames'
+NAMES = 'names'
+METADATA = 'metadata'
+
+# Open stack files by (process id, path). Pool workers open their own,
+# after closing those inherited from their parent, see openStack.
+_files = {}
+_lock = threading.Lock()
+
+# Frame names of the stacks read so far by path, see frameName.
+_names = {}
+
+def isStack(path):
+    '''Returns True if path is an HDF5 stack file'''
+    return (os.path.splitext(path)[1].lower() in STACKEXTS and
+            os.path.isfile(path))
+
+def stackPath(h5path, i):
+    '''Returns the path of frame i of a stack'''
+    return '%s%s%d' % (h5path, STACKSEP, i)
+
+def splitStackPath(path):
+    '''Splits the path of a stack frame
+
+    Args:
+        path: A frame path.
+    Returns:
+        A tuple (stack file path, frame index), or None if path is not the
+        path of a stack frame.
+    '''
+
+    h5path, sep, i = path.rpartition(STACKSEP)
+    if not sep or not i.isdigit():
+        return None
+    return h5path, int(i)
+
+def openStack(h5path):
+    '''Returns the open h5py.File of a stack, opening it if needed
+
+    Exceptions:
+        IOError: The file can not be opened.
+    '''
+
+    import h5py
+    pid = os.getpid()
+    key = (pid, h5path)
+    with _lock:
+        # A forked process shares the HDF5 state of the files its parent
+        # had open, which would be reused by a new open of the same file.
+        for inherited in [k for k in _files if k[0] != pid]:
+            fp = _files.pop(inherited)
+            if fp.id.valid:
+                fp.close()
+        fp = _files.get(key)
+        if fp is None or not fp.id.valid:
+            fp = _files[key] = h5py.File(h5path, 'r')
+    return fp
+
+def closeStacks(h5path=None):
+    '''Closes the stack files opened by this process
+
+    Their frame names are read again when next needed.
+
+    Args:
+        h5path: File path of the stack to close. Defaults to all of them.
+    '''
+
+    with _lock:
+        for key in [key for key in _names if h5path in (None, key)]:
+            del _names[key]
+        pid = os.getpid()
+        for key in [key for key in _files if key[0] == pid and
+                    h5path in (None, key[1])]:
+            fp = _files.pop(key)
+            if fp.id.valid:
+                fp.close()
+    return
+
+def readStackFrame(path):
+    '''Reads the pixel data of a stack frame
+
+    Args:
+        path: Path of the frame, see stackPath.
+    Returns:
+        A 2D ndarray with the frame pixels.
+    Exceptions:
+        IOError:    The stack can not be read.
+        IndexError: The stack has no such frame.
+    '''
+
+    h5path, i = splitStackPath(path)
+    return openStack(h5path)[FRAMES][i]
+
+def readStackNames(h5path):
+    '''Reads the original file names of all frames of a stack
+
+    Args:
+        h5path: File path of the stack.
+    Returns:
+        A list with the name of every frame, in stack order. Stacks written
+        without names give an empty list.
+    Exceptions:
+        IOError: The stack can not be read.
+    '''
+
+    names = openStack(h5path).get(NAMES)
+    if names is None:
+        return []
+    return [str(name) for name in names[...].tolist()]
+
+def frameName(path):
+    '''Returns the file name of a frame
+
+    Stack frames are named after the file they were converted from, see
+    writeStack. The names of a stack are read once, on first use.
+
+    Args:
+        path: A frame path.
+    Returns:
+        The file name, or the base name of path when it is not known.
+    '''
+
+    split = splitStackPath(path)
+    if split is None:
+        return os.path.basename(path)
+    h5path, i = split
+    names = _names.get(h5path)
+    if names is None:
+        try:
+            names = readStackNames(h5path)
+        except IOError as msg:
+            print 'Frame names of %s not read: %s' % (h5path, msg)
+            names = []
+        with _lock:
+            _names[h5path] = names
+    if i < len(names):
+        return names[i]
+    return os.path.basename(path)
+
+def scanStack(h5path, firstbatch=64, batchsize=1024):
+    '''Lists the frames of a stack in stack order, in batches
+
+    Only the shape of the frames dataset is read. Every frame carries the
+    size and modification time of the stack file.
+
+    Args:
+        h5path:     File path of the stack.
+        firstbatch: Number of frames in the first batch.
+        batchsize:  Number of frames in every following batch.
+    Returns:
+        A generator yielding (paths, sizes, mtimes) lists per batch.
+    Exceptions:
+        IOError: The stack can not be read.
+        OSError: The stack can not be stat'ed.
+    '''
+
+    st = os.stat(h5path)
+    count = len(openStack(h5path)[FRAMES])
+    start = 0
+    size = firstbatch
+    while start < count:
+        stop = min(start + size, count)
+        yield ([stackPath(h5path, i) for i in xrange(start, stop)],
+               [st.st_size] * (stop - start), [st.st_mtime] * (stop - start))
+        start = stop
+        size = batchsize
+    return
+
+def readStackMetadata(h5path):
+    '''Reads the metadata of all frames of a stack
+
+    Every column is read at once. Entries stored as empty strings, which
+    stand for entries missing from a frame, are left out.
+
+    Args:
+        h5path: File path of the stack.
+    Returns:
+        A list with the metadata dict of every frame, in stack order.
+    Exceptions:
+        IOError: The stack can not be read.
+    '''
+
+    fp = openStack(h5path)
+    mds = [{} for i in xrange(len(fp[FRAMES]))]
+    group = fp.get(METADATA)
+    if group is None:
+        return mds
+    for key in group:
+        for md, value in zip(mds, group[key][...].tolist()):
+            if value:
+                md[str(key)] = str(value)
+    return mds
+
+def writeStack(path, frames, names, mds=(), compression='lzf', level=1):
+    '''Writes frames to an HDF5 stack
+
+    Args:
+        path:        Output file path.
+        frames:      Iterable of 2D ndarrays of the same shape and type.
+        names:       File names of the frames.
+        mds:         Metadata dicts of the frames, if any.
+        compression: h5py compression filter, or None. 'lzf' decodes about
+                     twice as fast as 'gzip', which other HDF5 readers
+                     support as well.
+        level:       Compression level of the 'gzip' filter.
+    Returns:
+        The number of frames written.
+    Exceptions:
+        ValueError: The frames differ in shape or type.
+    '''
+
+    import h5py
+    names = list(names)
+    closeStacks(path)
+    with h5py.File(path, 'w') as fp:
+        dset = None
+        for i, frame in enumerate(frames):
+            if dset is None:
+                dset = fp.create_dataset(FRAMES, (len(names),) + frame.shape,
+                        dtype=frame.dtype, chunks=(1,) + frame.shape,
+                        compression=compression, shuffle=bool(compression),
+                        compression_opts=level if compression == 'gzip'
+                                         else None)
+            elif frame.shape != dset.shape[1:] or frame.dtype != dset.dtype:
+                raise ValueError('Frame %s is %s %s, not %s %s' % (names[i],
+                        frame.dtype, frame.shape, dset.dtype, dset.shape[1:]))
+            dset[i] = frame
+        if dset is None:
+            fp.create_dataset(FRAMES, (0, 0, 0), dtype=np.uint16)
+        fp.create_dataset(NAMES, data=np.array(names, dtype='S'))
+        group = fp.create_group(METADATA)
+        mds = list(mds)
+        for key in sorted(set(key for md in mds for key in md)):
+            values = np.array([md.get(key, '') for md in mds], dtype='S')
+            group.create_dataset(key, data=values)
+    return len(names)
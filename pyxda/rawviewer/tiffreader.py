@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import struct
+
+import numpy as np
+import fabio
+
+from stack import STACKSEP, readStackFrame
+
+# TIFF tags needed to locate an uncompressed pixel block.
+WIDTH = 256
+LENGTH = 257
+BITSPERSAMPLE = 258
+COMPRESSION = 259
+STRIPOFFSETS = 273
+SAMPLESPERPIXEL = 277
+STRIPBYTECOUNTS = 279
+PLANARCONFIG = 284
+TILEWIDTH = 322
+SAMPLEFORMAT = 339
+
+# Sizes and struct codes of the TIFF field types that may hold these tags.
+FIELDTYPES = {1: (1, 'B'), 3: (2, 'H'), 4: (4, 'I'), 16: (8, 'Q')}
+SAMPLEKINDS = {1: 'u', 2: 'i', 3: 'f'}
+
+def tiffLayout(path):
+    '''Locates the pixel block of an uncompressed TIFF
+
+    Only the first image of the file is considered. It qualifies when it is
+    uncompressed, has one sample per pixel, is stored in strips rather than
+    tiles, and its strips follow each other without gaps.
+
+    Args:
+        path: File path of the image.
+    Returns:
+        A tuple (offset, dtype, shape) describing the pixel block, or None if
+        the file is not a TIFF that can be mapped directly.
+    '''
+
+    if STACKSEP in path:
+        return None
+    try:
+        with open(path, 'rb') as fp:
+            head = fp.read(8)
+            if head[:4] == 'II*\0':
+                bo = '<'
+            elif head[:4] == 'MM\0*':
+                bo = '>'
+            else:
+                return None
+            fp.seek(struct.unpack(bo + 'I', head[4:8])[0])
+            count = struct.unpack(bo + 'H', fp.read(2))[0]
+            entries = fp.read(12 * count)
+            tags = {}
+            for i in range(count):
+                tag, ftype, n = struct.unpack(bo + 'HHI',
+                                              entries[12*i:12*i+8])
+                if ftype not in FIELDTYPES:
+                    continue
+                size, code = FIELDTYPES[ftype]
+                if n * size <= 4:
+                    raw = entries[12*i+8:12*i+8+n*size]
+                else:
+                    fp.seek(struct.unpack(bo + 'I', entries[12*i+8:12*i+12])[0])
+                    raw = fp.read(n * size)
+                tags[tag] = struct.unpack(bo + code * n, raw)
+    except (IOError, struct.error):
+        return None
+
+    get = lambda tag, default=None: tags.get(tag, (default,))[0]
+    if (get(COMPRESSION, 1) != 1 or get(SAMPLESPERPIXEL, 1) != 1 or
+            get(PLANARCONFIG, 1) != 1 or TILEWIDTH in tags or
+            WIDTH not in tags or LENGTH not in tags or
+            STRIPOFFSETS not in tags or STRIPBYTECOUNTS not in tags):
+        return None
+    bits = get(BITSPERSAMPLE, 1)
+    kind = SAMPLEKINDS.get(get(SAMPLEFORMAT, 1))
+    if kind is None or bits not in (8, 16, 32, 64):
+        return None
+    dtype = np.dtype('%s%s%d' % (bo, kind, bits // 8))
+    shape = (get(LENGTH), get(WIDTH))
+    offsets = tags[STRIPOFFSETS]
+    counts = tags[STRIPBYTECOUNTS]
+    for i in range(len(offsets) - 1):
+        if offsets[i] + counts[i] != offsets[i+1]:
+            return None
+    if sum(counts) < shape[0] * shape[1] * dtype.itemsize:
+        return None
+    return offsets[0], dtype, shape
+
+def readFrame(path, layout=None):
+    '''Reads the pixel data of a frame
+
+    Uncompressed TIFFs are returned as a read-only memory map of the pixel
+    block, so no copy is made and pages are only read when touched. Frames
+    of HDF5 stacks are read from their chunk, see stack.py. Every other
+    file is decoded with fabio.
+
+    Args:
+        path:   File path of the image.
+        layout: Layout returned by tiffLayout for this file, if known. An
+                empty tuple marks a file known not to be mappable.
+    Returns:
+        A 2D ndarray with the frame pixels.
+    '''
+
+    if STACKSEP in path:
+        return readStackFrame(path)
+    if layout is None:
+        layout = tiffLayout(path)
+    if layout:
+        offset, dtype, shape = layout
+        try:
+            return np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                             shape=shape)
+        except ValueError:
+            # The file is shorter than its header claims.
+            pass
+    return fabio.open(path).data
@@ -25,7 +25,6 @@ from rawviewer import RawViewer
 from controlpanel import ControlPanel, MetadataPanel, MessageLog
 from handler import PyXDAHandler
 import sys
-import time
 from enthought.pyface.image_resource import ImageResource
 
 LOGO = ImageResource('SrXes-Icon.ico')
@@ -51,6 +50,10 @@ class UserInterface(HasTraits):
 
         self.rawviewer.startProcessJob()
         self.cpanel.sync_trait('datalistlength', self.rawviewer)
+        self.cpanel.sync_trait('nprocs', self.rawviewer)
+        self.cpanel.sync_trait('cachesize', self.rawviewer)
+        self.rawviewer.display.sync_trait('roistats', self.cpanel, 
+                                          mutual=False)
 
         self.imagepanel = Instance(Component)
         self.createImagePanel()
@@ -110,12 +113,52 @@ class UserInterface(HasTraits):
     def _generate_fired(self):
         '''Generate Intensity button has been pushed
         
-        Creates a reduced representation plot in the GUI.
+        Creates a reduced representation plot in the GUI, see
+        _rrplotadded_fired.
         '''
         
         self.rawviewer.jobqueue.put(['plotrr', [self.cpanel.rrchoice]])
-        time.sleep(0.5)
-        self.updateRRPanel(self.cpanel.rrchoice)
+        return
+    
+    @on_trait_change('rawviewer.rrplotadded', post_init=True)
+    def _rrplotadded_fired(self, choice):
+        '''A reduced representation plot has been created
+        
+        Adds it to the reduced representation panel.
+        '''
+        
+        self.updateRRPanel(choice)
+        return
+    
+    @on_trait_change('cpanel.cancel', post_init=True)
+    def _cancel_fired(self):
+        '''Cancel button has been pushed
+        
+        Stops generating reduced representations and stack statistics.
+        '''
+        
+        self.rawviewer.jobqueue.put(['cancelrr'])
+        return
+    
+    @on_trait_change('cpanel.showstack', post_init=True)
+    def _showstack_fired(self):
+        '''Show Stack Image button has been pushed
+        
+        Displays the selected per-pixel statistic over all frames, such as
+        the mean frame, in the image plot.
+        '''
+        
+        self.rawviewer.jobqueue.put(['stackimage', [self.cpanel.stackimage]])
+        return
+    
+    @on_trait_change('cpanel.dumpmetrics', post_init=True)
+    def _dumpmetrics_fired(self):
+        '''Dump Metrics button has been pushed
+        
+        Writes the job processing metrics to a file in the home directory.
+        '''
+        
+        self.rawviewer.jobqueue.put(['dumpmetrics'])
         return
     
     @on_trait_change('cpanel.dirpath', post_init=True)
@@ -128,7 +171,89 @@ class UserInterface(HasTraits):
         string explaining the error.
         '''
         
-        self.rawviewer.jobqueue.put(['startload', [self.cpanel.dirpath]])
+        self.rawviewer.jobqueue.put(['startload', [self.cpanel.dirpath,
+                                                   self.cpanel.live]])
+
+    @on_trait_change('cpanel.stackpath', post_init=True)
+    def _stackpath_changed(self):
+        '''HDF5 stack has been selected
+        
+        Loads the frames of the stack in place of a directory, see stack.py.
+        '''
+        
+        if self.cpanel.stackpath:
+            self.rawviewer.jobqueue.put(['startload', [self.cpanel.stackpath,
+                                                       False]])
+        return
+
+    @on_trait_change('cpanel.live', post_init=True)
+    def _live_changed(self):
+        '''Live mode has been switched on or off
+        
+        Reloads the current directory so that it is watched for new frames,
+        or no longer watched.
+        '''
+        
+        if self.cpanel.dirpath:
+            self._dirpath_changed()
+        return
+    
+    @on_trait_change('cpanel.darkpath', post_init=True)
+    def _darkpath_changed(self):
+        '''Dark frame has been selected or cleared
+        
+        Frames are dark corrected with the selected frame from now on, and 
+        the displayed frame and reduced representations are redone.
+        '''
+        
+        darkpath = self.cpanel.darkpath
+        self.rawviewer.jobqueue.put(['setdark', [[darkpath] if darkpath 
+                                                 else []]])
+        return
+    
+    @on_trait_change('cpanel.maskpath', post_init=True)
+    def _maskpath_changed(self):
+        '''Mask file has been selected
+        
+        Masked pixels are left out of the histogram and reduced 
+        representations from now on.
+        '''
+        
+        self.rawviewer.jobqueue.put(['setmask', [self.cpanel.maskpath]])
+        return
+    
+    @on_trait_change('cpanel.clearmask', post_init=True)
+    def _clearmask_fired(self):
+        '''Clear Mask button has been pushed
+        
+        Removes the mask loaded from file and the regions drawn on the image.
+        '''
+        
+        self.rawviewer.jobqueue.put(['setmask', [None]])
+        return
+    
+    @on_trait_change('cpanel.beamx, cpanel.beamy, cpanel.distance, '
+                     'cpanel.pixelsize', post_init=True)
+    def _geometry_changed(self):
+        '''Beam centre, distance or pixel size has been changed
+        
+        The 1D cut is integrated with the new geometry. A negative beam 
+        centre stands for the centre of the frame, and a distance of zero 
+        plots over the radius in pixels rather than 2theta.
+        '''
+        
+        cpanel = self.cpanel
+        centre = None
+        if cpanel.beamx >= 0 and cpanel.beamy >= 0:
+            centre = (cpanel.beamx, cpanel.beamy)
+        distance = cpanel.distance if cpanel.distance > 0 else None
+        if distance is not None and cpanel.pixelsize <= 0:
+            return
+        self.rawviewer.jobqueue.put(['setgeometry', 
+                                     {'centre': centre, 
+                                      'pixelsize': cpanel.pixelsize,
+                                      'distance': distance}])
+        return
     
     @on_trait_change('rawviewer.pic', post_init=True)
     def _pic_changed(self):
@@ -217,10 +342,12 @@ class UserInterface(HasTraits):
             choice: the new variable for the RR. eg: mean, total intensity...
         '''
         
-        rrplots = getattr(self.rawviewer, 'rrplots')
+        rrplot = self.rawviewer.rrplots.get(choice)
+        if rrplot is None:
+            return
         
-        if rrplots[choice] not in self.rrpanel._components:
-            self.rrpanel.add(rrplots[choice])
+        if rrplot not in self.rrpanel._components:
+            self.rrpanel.add(rrplot)
 
         self.rrpanel.invalidate_and_redraw()
         return
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+import os
+import time
+import fnmatch
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from scanner import naturalKey
+
+# inotify event masks, see inotify(7).
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+class DirectoryWatcher(object):
+    """Reports files that appear in a directory once they are complete
+    
+    Uses inotify where the C library provides it and falls back to listing
+    the directory on every poll otherwise. With inotify a file is reported
+    once its writer has closed it or it was moved into the directory. Files
+    found when listing the directory, at startup or without inotify, are
+    reported once their size has stopped changing between two polls. Every
+    file is reported only once.
+    """
+
+    def __init__(self, dirpath, pattern='*.tif', known=()):
+        """Constructor called when a DirectoryWatcher object is initialized
+        
+        Args:
+            dirpath: Path of the directory to watch.
+            pattern: Shell pattern of the file names to report.
+            known:   Paths that must not be reported.
+        """
+
+        self.dirpath = os.path.normpath(dirpath)
+        self.pattern = pattern
+        self.known = set(os.path.normpath(path) for path in known)
+        self.pending = {}
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO
+            if fd >= 0 and libc.inotify_add_watch(fd, dirpath, mask) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        except (OSError, AttributeError):
+            pass
+        # Frames written before the watch was set up.
+        self._scan()
+        return
+
+    def _scan(self):
+        for name in fnmatch.filter(os.listdir(self.dirpath), self.pattern):
+            path = os.path.join(self.dirpath, name)
+            if path not in self.known:
+                self.pending.setdefault(path, -1)
+        return
+
+    def poll(self, timeout):
+        """Waits up to timeout seconds for new files
+        
+        Args:
+            timeout: Maximum number of seconds to wait.
+        Returns:
+            A naturally sorted list of paths of new, completely written files.
+        """
+
+        ready = set()
+        if self.fd is not None:
+            for name, mask in self._readEvents(timeout):
+                path = os.path.join(self.dirpath, name)
+                if path not in self.known:
+                    ready.add(path)
+                    self.pending.pop(path, None)
+        else:
+            time.sleep(timeout)
+            self._scan()
+
+        for path, size in self.pending.items():
+            try:
+                newsize = os.path.getsize(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if newsize > 0 and newsize == size:
+                ready.add(path)
+                del self.pending[path]
+            else:
+                self.pending[path] = newsize
+
+        self.known.update(ready)
+        return sorted(ready, key=naturalKey)
+
+    def _readEvents(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        try:
+            buf = os.read(self.fd, 65536)
+        except OSError:
+            return events
+        pos = 0
+        while pos + 16 <= len(buf):
+            wd, mask, cookie, length = struct.unpack('iIII', buf[pos:pos+16])
+            name = buf[pos+16:pos+16+length].rstrip('\0')
+            pos += 16 + length
+            if fnmatch.fnmatch(name, self.pattern):
+                events.append((name, mask))
+        return events
+
+    def close(self):
+        """Stops watching the directory"""
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        return
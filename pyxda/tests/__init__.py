@@ -25,6 +25,29 @@ def testsuite():
     import unittest
     modulenames = '''
         pyxda.tests.testbarebones
+        pyxda.tests.testrrengine
+        pyxda.tests.testreduction
+        pyxda.tests.testrrcache
+        pyxda.tests.testimagecache
+        pyxda.tests.testprefetch
+        pyxda.tests.testtiffreader
+        pyxda.tests.testwatcher
+        pyxda.tests.testrrbuffer
+        pyxda.tests.testhistogram
+        pyxda.tests.testpyramid
+        pyxda.tests.testbatch
+        pyxda.tests.testbenchmarks
+        pyxda.tests.testmetrics
+        pyxda.tests.testscheduler
+        pyxda.tests.testmetadata
+        pyxda.tests.testframeindex
+        pyxda.tests.testscanner
+        pyxda.tests.testcorrection
+        pyxda.tests.testmask
+        pyxda.tests.testroi
+        pyxda.tests.testintegrate
+        pyxda.tests.teststack
+        pyxda.tests.testpixelstats
     '''.split()
     suite = unittest.TestSuite()
     loader = unittest.defaultTestLoader
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+
+"""Benchmarks of loading, caching and reduction on synthetic datasets.
+
+Run with
+
+python -m pyxda.tests.benchmarks --output results.json
+python -m pyxda.tests.benchmarks --baseline results.json
+
+The second form exits with a non-zero status when a benchmark got slower
+than its baseline by more than the threshold.
+"""
+
+import sys
+import json
+import time
+import shutil
+import Queue
+import platform
+import tempfile
+import argparse
+
+import numpy as np
+
+from pyxda.tests.synthetic import makeDataset
+from pyxda.rawviewer.imagecontainer import Image, ImageCache
+from pyxda.rawviewer.metadata import parseMetadata, MetadataTable
+from pyxda.rawviewer.frameindex import FrameIndex
+from pyxda.rawviewer.histogram import histogram
+from pyxda.rawviewer.rrengine import RREngine
+from pyxda.rawviewer.reduction import frameStats, CUMBINS
+from pyxda.rawviewer.tiffreader import readFrame
+
+# Slowdowns shorter than this many seconds are never flagged as regressions.
+MINDELTA = 1e-3
+
+# Number of frames held in memory for the frame statistics kernels.
+FRAMESTATSFRAMES = 8
+
+def bestTime(func, repeat, setup=None):
+    '''Returns the shortest wall time of repeat calls of func'''
+    best = None
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def runBenchmarks(paths, repeat=3, nprocs=None):
+    '''Times the data path of the raw viewer on a list of frames
+
+    Image.load is timed including one read of every pixel, since memory
+    mapped frames are only read when touched. Benchmarks that need Chaco
+    are reported as skipped when it is not installed.
+
+    Args:
+        paths:  Frame file paths.
+        repeat: Number of repetitions, the fastest is kept.
+        nprocs: Number of RR engine worker processes.
+    Returns:
+        A dict mapping benchmark names to dicts with 'seconds' and
+        'perframe', or 'skipped' with the reason.
+    '''
+    n = len(paths)
+    results = {}
+    def record(name, seconds, count=n):
+        results[name] = {'seconds': seconds, 'perframe': seconds / count}
+
+    def load():
+        for path in paths:
+            image = Image(0, path)
+            image.load()
+            image.data.max()
+    record('Image.load', bestTime(load, repeat))
+
+    record('_parseMD', bestTime(lambda: [parseMetadata(p) for p in paths],
+                                repeat))
+    record('MetadataTable.parseAll',
+           bestTime(lambda: MetadataTable().parseAll(paths, nprocs), repeat))
+
+    record('FrameIndex.extend',
+           bestTime(lambda: FrameIndex().extend(paths), repeat))
+
+    images = [Image(i, path) for i, path in enumerate(paths)]
+    caches = []
+    def newCache():
+        for image in images:
+            image.release()
+        caches[:] = [ImageCache()]
+    def traverse():
+        cache = caches[0]
+        for image in images + images[::-1]:
+            cache.get(image)
+    record('ImageCache traversal', bestTime(traverse, repeat, newCache))
+
+    engine = RREngine(nprocs)
+    try:
+        record('RREngine.imap', bestTime(lambda: list(engine.imap(paths)),
+                                         repeat))
+    finally:
+        engine.close()
+
+    image = images[0]
+    image.load()
+    record('histogram', bestTime(lambda: histogram(image.data), repeat))
+
+    # The fused kernel against separate numpy passes for the same numbers.
+    frames = [np.array(readFrame(path)) for path in paths[:FRAMESTATSFRAMES]]
+    def naiveStats():
+        for data in frames:
+            data.sum(dtype=np.float64)
+            data.std(dtype=np.float64)
+            data.min()
+            data.max()
+            np.count_nonzero(data < 100)
+            np.count_nonzero(data > 1000)
+            np.histogram(data, CUMBINS)
+    record('frameStats', bestTime(lambda: [frameStats(data, 100, 1000)
+                                           for data in frames], repeat),
+           len(frames))
+    record('naive frame statistics', bestTime(naiveStats, repeat),
+           len(frames))
+
+    try:
+        from pyxda.rawviewer.rawviewer import RawViewer
+        from pyxda.rawviewer.display import Display
+        from pyxda.rawviewer.scheduler import CancelToken
+    except ImportError as msg:
+        results['createRRPlot'] = {'skipped': str(msg)}
+        results['Display.plotHistogram'] = {'skipped': str(msg)}
+        return results
+
+    viewer = RawViewer()
+    viewer.nprocs = nprocs or viewer.nprocs
+    viewer.datalist.extend(paths)
+    viewer.datalistlength = n
+    def resetRR():
+        viewer.rrtoken.cancel()
+        viewer.rrtoken = CancelToken()
+        viewer._rriter = None
+        viewer.jobqueue.clear()
+        viewer.rrplots = {}
+        viewer.rrstats = []
+    def createRR():
+        # Run the queued reduction jobs, as the job thread would, so the
+        # whole RR pass is timed.
+        viewer.createRRPlot('Mean')
+        while True:
+            try:
+                jobdata = viewer.jobqueue.get(block=False)
+            except Queue.Empty:
+                break
+            if jobdata[0] == 'extendrr':
+                viewer.extendRRPlots(*jobdata[1])
+            viewer.jobqueue.task_done()
+    record('createRRPlot', bestTime(createRR, repeat, resetRR))
+    viewer.rrengine.close()
+
+    display = Display(Queue.Queue())
+    display.plotImage(image)
+    plot = display.plotHistogram(image)
+    def clearHist():
+        image.hist = None
+    record('Display.plotHistogram', 
+           bestTime(lambda: display.plotHistogram(image, plot), repeat,
+                    clearHist))
+    return results
+
+def compareResults(results, baseline, threshold=0.2):
+    '''Compares benchmark results against a baseline
+
+    Args:
+        results:   Dict returned by runBenchmarks.
+        baseline:  Dict returned by runBenchmarks on an earlier run.
+        threshold: Allowed relative slowdown before a regression is flagged.
+                   Slowdowns below MINDELTA seconds are ignored as noise.
+    Returns:
+        A list of (name, baseline seconds, seconds, ratio, regressed) tuples
+        for the benchmarks timed in both runs.
+    '''
+    rows = []
+    for name in sorted(results):
+        new = results[name].get('seconds')
+        old = baseline.get(name, {}).get('seconds')
+        if new is None or old is None:
+            continue
+        ratio = new / old if old > 0 else float('inf')
+        regressed = ratio > 1 + threshold and new - old > MINDELTA
+        rows.append((name, old, new, ratio, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyxda.tests.benchmarks')
+    parser.add_argument('--frames', type=int, default=20,
+            help='number of frames (default: 20)')
+    parser.add_argument('--size', type=int, default=2048,
+            help='frame width and height in pixels (default: 2048)')
+    parser.add_argument('--dtype', default='uint16',
+            help='pixel dtype (default: uint16)')
+    parser.add_argument('--repeat', type=int, default=3,
+            help='repetitions per benchmark (default: 3)')
+    parser.add_argument('-j', '--nprocs', type=int,
+            help='RR engine worker processes (default: all cores)')
+    parser.add_argument('--dataset',
+            help='directory for the synthetic dataset, kept after the run')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+            help='allowed relative slowdown (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    dirpath = args.dataset or tempfile.mkdtemp(prefix='pyxda-bench-')
+    try:
+        paths = makeDataset(dirpath, args.frames, (args.size, args.size),
+                            np.dtype(args.dtype))
+        results = runBenchmarks(paths, args.repeat, args.nprocs)
+    finally:
+        if args.dataset is None:
+            shutil.rmtree(dirpath)
+
+    for name in sorted(results):
+        res = results[name]
+        if 'skipped' in res:
+            print '%-24s skipped (%s)' % (name, res['skipped'])
+        else:
+            print '%-24s %9.4f s %9.2f ms/frame' % (name, res['seconds'],
+                                                    1e3 * res['perframe'])
+    if args.output:
+        report = {'config': {'frames': args.frames, 'size': args.size,
+                             'dtype': args.dtype, 'repeat': args.repeat,
+                             'nprocs': args.nprocs},
+                  'platform': platform.platform(),
+                  'python': platform.python_version(),
+                  'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'results': results}
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['results']
+        print
+        print '%-24s %10s %10s %7s' % ('benchmark', 'baseline', 'now', 'ratio')
+        for name, old, new, ratio, slower in compareResults(results, baseline,
+                                                            args.threshold):
+            print '%-24s %10.4f %10.4f %7.2f%s' % (name, old, new, ratio,
+                                                  slower and '  REGRESSION' or '')
+            regressed = regressed or slower
+    return int(regressed)
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# End of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Synthetic detector datasets for tests and benchmarks.
+"""
+
+import os
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+METADATA = '''[metadata]
+qxrdVersion=0.0.0
+dataType=%(dtype)s
+imageNumber=%(n)d
+fileBase=%(name)s
+fileName=%(path)s
+height=%(height)d
+width=%(width)d
+summedExposures=1
+'''
+
+def makeFrame(n, shape=(2048, 2048), dtype=np.uint16, seed=0):
+    '''Returns a synthetic powder diffraction frame
+
+    The frame holds Poisson noise on a background plus a few concentric
+    rings whose intensity drifts with the frame number n.
+    '''
+    rs = np.random.RandomState(seed + n)
+    y, x = np.indices(shape, dtype=np.float32)
+    r = np.hypot(x - shape[1] / 2.0, y - shape[0] / 2.0)
+    signal = 100.0 + 50.0 * (1 + 0.01 * n) * (np.cos(r / 7.0) ** 8)
+    frame = rs.poisson(signal)
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'ui':
+        frame = np.clip(frame, 0, np.iinfo(dtype).max)
+    return frame.astype(dtype)
+
+def makeDataset(dirpath, nframes=10, shape=(2048, 2048), dtype=np.uint16,
+                metadata=True, prefix='frame'):
+    '''Writes a series of synthetic TIFF frames
+
+    Args:
+        dirpath:  Directory to write to. It is created if needed.
+        nframes:  Number of frames.
+        shape:    (height, width) of the frames.
+        dtype:    Pixel dtype.
+        metadata: Also write a .metadata sidecar for every frame.
+        prefix:   File name prefix, followed by the zero padded frame number.
+    Returns:
+        The list of frame paths.
+    '''
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+    paths = []
+    for n in range(nframes):
+        name = '%s-%05d.tif' % (prefix, n)
+        path = os.path.join(dirpath, name)
+        tifimage(data=makeFrame(n, shape, dtype)).write(path)
+        if metadata:
+            with open(path + '.metadata', 'w') as fp:
+                fp.write(METADATA % {'dtype': np.dtype(dtype).name, 'n': n,
+                                     'name': name, 'path': path,
+                                     'height': shape[0], 'width': shape[1]})
+        paths.append(path)
+    return paths
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the headless batch reduction.
+"""
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.batch import reduceDirectory
+
+##############################################################################
+class TestReduceDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for i in range(3):
+            data = np.zeros((8, 8), dtype=np.uint16) + i
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+        with open(os.path.join(self.tmpdir, 'frame1.tif.metadata'), 'w') as fp:
+            fp.write('[Metadata]\nimageNumber=1\n')
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_csv(self):
+        """check the CSV output holds one row per frame.
+        """
+        output = os.path.join(self.tmpdir, 'out.csv')
+        info = reduceDirectory(self.tmpdir, output, nprocs=1, metadata=True)
+        self.assertEqual(3, info['frames'])
+        with open(output) as fp:
+            lines = [line for line in fp if not line.startswith('#')]
+        rows = list(csv.reader(lines))
+        self.assertEqual(['path', 'name', 'n', 'sum', 'mean'], rows[0][1:6])
+        self.assertEqual('imageNumber', rows[0][-1])
+        self.assertEqual([0.0, 1.0, 2.0], [float(row[5]) for row in rows[1:]])
+        self.assertEqual(['', '1', ''], [row[-1] for row in rows[1:]])
+        return
+
+
+    def test_empty(self):
+        """check a directory without frames is rejected.
+        """
+        self.assertRaises(IOError, reduceDirectory, self.tmpdir,
+                          pattern='*.edf')
+        return
+
+# End of class TestReduceDirectory
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the synthetic datasets and benchmark comparison.
+"""
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyxda.tests.synthetic import makeDataset
+from pyxda.tests.benchmarks import compareResults
+from pyxda.rawviewer.imagecontainer import Image
+
+##############################################################################
+class TestBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_dataset(self):
+        """check synthetic frames and sidecars can be read back.
+        """
+        paths = makeDataset(self.tmpdir, 3, (32, 48), np.uint32)
+        image = Image(2, paths[2])
+        image.load()
+        self.assertEqual((32, 48), image.data.shape)
+        self.assertEqual(np.uint32, image.data.dtype)
+        self.assertEqual('2', image.metadata['imageNumber'])
+        return
+
+
+    def test_compare(self):
+        """check slowdowns beyond the threshold are flagged.
+        """
+        baseline = {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0},
+                    'c': {'skipped': 'no chaco'}}
+        results = {'a': {'seconds': 1.1}, 'b': {'seconds': 1.5},
+                   'c': {'seconds': 1.0}}
+        rows = compareResults(results, baseline, threshold=0.2)
+        self.assertEqual([('a', False), ('b', True)],
+                         [(row[0], row[4]) for row in rows])
+        return
+
+# End of class TestBenchmarks
+
+if __name__ == '__main__':
+    unittest.main()
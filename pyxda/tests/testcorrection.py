@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the dark frame correction.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.correction import DarkCorrection, loadDark
+from pyxda.rawviewer.imagecontainer import Image
+from pyxda.rawviewer.rrengine import RREngine
+from pyxda.rawviewer.rrcache import RRCache
+
+##############################################################################
+class TestDarkCorrection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(3):
+            data = np.arange(8*8, dtype=np.uint16).reshape(8, 8) + 10 * i
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.paths.append(path)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_apply(self):
+        """check unsigned frames are clipped and writable ones kept.
+        """
+        correction = DarkCorrection(np.full((2, 2), 5.0))
+        data = np.array([[3, 5], [6, 100]], dtype=np.uint16)
+        out = correction.apply(data)
+        self.assertTrue(out is data)
+        self.assertEqual([[0, 0], [1, 95]], out.tolist())
+        data = np.array([[3.5, 5], [6, 100]], dtype=np.float32)
+        data.flags.writeable = False
+        out = correction.apply(data)
+        self.assertFalse(out is data)
+        self.assertEqual(np.float32, out.dtype)
+        self.assertEqual([[-1.5, 0], [1, 95]], out.tolist())
+        self.assertRaises(ValueError, correction.apply, np.zeros((3, 2)))
+        return
+
+
+    def test_median(self):
+        """check several dark frames are combined by their median.
+        """
+        correction = loadDark(self.paths)
+        self.assertEqual(np.arange(64).reshape(8, 8).tolist(),
+                         (correction.dark - 10).tolist())
+        self.assertNotEqual(loadDark(self.paths[:1]).key, correction.key)
+        return
+
+
+    def test_load(self):
+        """check frames are corrected on load and in the RR engine.
+        """
+        correction = loadDark(self.paths[:1])
+        image = Image(2, self.paths[2], correction=correction)
+        image.load()
+        self.assertTrue(np.all(image.data == 20))
+        cache = RRCache(self.tmpdir)
+        try:
+            for nprocs in (1, 2):
+                engine = RREngine(nprocs)
+                engine.correction = correction
+                stats = list(engine.imap(self.paths, cache=cache))
+                engine.close()
+                self.assertEqual([0, 640, 1280], [s['sum'] for s in stats])
+            raw = list(RREngine(1).imap(self.paths, cache=cache))
+            self.assertEqual(2016, raw[0]['sum'])
+        finally:
+            cache.close()
+        return
+
+# End of class TestDarkCorrection
+
+if __name__ == '__main__':
+    unittest.main()
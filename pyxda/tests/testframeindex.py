@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the compact frame index.
+"""
+
+import gc
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyxda.tests.synthetic import makeDataset
+from pyxda.rawviewer.frameindex import FrameIndex
+
+##############################################################################
+class TestFrameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = makeDataset(self.tmpdir, 5, (8, 8), np.uint16)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_extend(self):
+        """check paths and file stats survive growing the index.
+        """
+        index = FrameIndex(capacity=2)
+        self.assertEqual(0, index.extend(self.paths[:3]))
+        self.assertEqual(3, index.extend(self.paths[3:]))
+        self.assertEqual(5, len(index))
+        self.assertEqual(self.paths, index.paths())
+        self.assertEqual(self.paths[2:4], index.paths(2, 4))
+        self.assertEqual(self.paths[4], index.path(4))
+        self.assertTrue(np.all(index.sizes > 0))
+        index.append('missing.tif', 7, 1.5)
+        self.assertEqual([7, 1.5], [index.sizes[-1], index.mtimes[-1]])
+        return
+
+
+    def test_handles(self):
+        """check handles are shared while referenced and made on demand.
+        """
+        index = FrameIndex()
+        index.extend(self.paths)
+        image = index[-1]
+        self.assertEqual(4, image.n)
+        self.assertEqual(self.paths[4], image.path)
+        self.assertTrue(image is index[4])
+        self.assertEqual(self.paths[1:3], [im.path for im in index[1:3]])
+        image.load()
+        del image
+        gc.collect()
+        self.assertTrue(index[4].data is None)
+        self.assertRaises(IndexError, index.__getitem__, 5)
+        return
+
+
+    def test_clear(self):
+        """check clearing empties the index.
+        """
+        index = FrameIndex()
+        index.extend(self.paths)
+        index.clear()
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.paths())
+        index.extend(self.paths[:1])
+        self.assertEqual(self.paths[:1], index.paths())
+        return
+
+# End of class TestFrameIndex
+
+if __name__ == '__main__':
+    unittest.main()
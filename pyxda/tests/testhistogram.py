@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the histogram engine.
+"""
+
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.histogram import histogram
+
+##############################################################################
+class TestHistogram(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(1)
+        self.data = rs.randint(100, 30000, size=(1000, 1000)).astype(np.uint16)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_integer_bins(self):
+        """check integer counts agree with np.histogram on the same edges.
+        """
+        counts, edges = histogram(self.data, bins=1000)
+        self.assertTrue(len(counts) <= 1000)
+        self.assertEqual(len(counts) + 1, len(edges))
+        self.assertEqual(100, edges[0])
+        ref = np.histogram(self.data, bins=edges - 0.5)[0]
+        self.assertTrue(np.array_equal(ref, counts))
+        return
+
+
+    def test_signed(self):
+        """check negative integer values.
+        """
+        data = np.array([[-3, -3, 0], [2, 2, 2]], dtype=np.int32)
+        counts, edges = histogram(data, bins=10)
+        self.assertEqual([2, 0, 0, 1, 0, 3], list(counts))
+        self.assertEqual(-3, edges[0])
+        return
+
+
+    def test_offset(self):
+        """check wide integer types with values far from zero.
+        """
+        data = self.data.astype(np.uint32) + 3000000000
+        counts, edges = histogram(data, bins=1000)
+        self.assertEqual(3000000100, edges[0])
+        ref = np.histogram(self.data, bins=edges - 3000000000.5)[0]
+        self.assertTrue(np.array_equal(ref, counts))
+        data = np.array([[2**63 + 5, 2**63 + 7], [2**63 + 5, 2**64 - 1]],
+                        dtype=np.uint64)
+        counts, edges = histogram(data[:, :1], bins=10)
+        self.assertEqual([2], list(counts))
+        self.assertEqual(float(2**63 + 5), edges[0])
+        counts, edges = histogram(data[:1], bins=10)
+        self.assertEqual([1, 0, 1], list(counts))
+        # Wide value ranges are left to np.histogram.
+        counts, edges = histogram(data, bins=10)
+        self.assertEqual(4, counts.sum())
+        self.assertEqual(3, counts[0])
+        return
+
+
+    def test_sampled(self):
+        """check a sampled histogram approximates the exact one.
+        """
+        exact, edges = histogram(self.data, bins=100)
+        approx, edges2 = histogram(self.data, bins=100, exact=False)
+        self.assertAlmostEqual(1.0, approx.sum() / float(exact.sum()), 2)
+        return
+
+
+    def test_float(self):
+        """check float frames fall back to np.histogram.
+        """
+        data = self.data.astype(np.float32)
+        counts, edges = histogram(data, bins=50)
+        ref, refedges = np.histogram(data, bins=50)
+        self.assertTrue(np.array_equal(ref, counts))
+        return
+
+# End of class TestHistogram
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the least recently used image cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.imagecontainer import Image, ImageCache
+from pyxda.rawviewer.pyramid import buildPyramid
+
+##############################################################################
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.images = []
+        for i in range(4):
+            data = np.zeros((16, 16), dtype=np.uint16) + i
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.images.append(Image(i, path))
+        # 512 bytes per frame, room for two frames.
+        self.cache = ImageCache(budget=1024)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_hits(self):
+        """check repeated lookups are served from memory.
+        """
+        for image in self.images[:2] * 3:
+            self.assertEqual(image.n, self.cache.get(image).data[0, 0])
+        self.assertEqual(2, self.cache.misses)
+        self.assertEqual(4, self.cache.hits)
+        self.assertEqual(1024, self.cache.nbytes)
+        return
+
+
+    def test_lru_eviction(self):
+        """check the least recently used frame is released.
+        """
+        im0, im1, im2 = self.images[:3]
+        self.cache.get(im0)
+        self.cache.get(im1)
+        self.cache.get(im0)
+        self.cache.get(im2)
+        self.assertTrue(0 in self.cache and 2 in self.cache)
+        self.assertFalse(1 in self.cache)
+        self.assertTrue(im1.data is None)
+        self.assertEqual(1024, self.cache.nbytes)
+        return
+
+
+    def test_derived(self):
+        """check pyramid levels built after adding count in the budget.
+        """
+        im0, im1 = self.images[:2]
+        self.cache.get(im0)
+        self.cache.get(im1)
+        self.assertEqual(1024, self.cache.nbytes)
+        im1.levels = buildPyramid(im1.data, minsize=4)
+        extra = sum(level.nbytes for level in im1.levels[1:])
+        self.assertEqual(512 + extra, im1.nbytes)
+        self.cache.update(im1)
+        self.assertTrue(im0.data is None)
+        self.assertEqual(im1.nbytes, self.cache.nbytes)
+        return
+
+
+    def test_pinned(self):
+        """check the frame last returned by get is kept.
+        """
+        im0, im1, im2 = self.images[:3]
+        self.cache.get(im0)
+        for image in (im1, im2):
+            image.load()
+            self.cache.add(image)
+        self.assertTrue(0 in self.cache and 2 in self.cache)
+        self.assertFalse(1 in self.cache)
+        self.assertTrue(im0.data is not None)
+        self.assertEqual(1024, self.cache.nbytes)
+        return
+
+
+    def test_clear(self):
+        """check clear releases everything.
+        """
+        for image in self.images:
+            self.cache.get(image)
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.nbytes)
+        self.assertTrue(all(image.data is None for image in self.images))
+        return
+
+# End of class TestImageCache
+
+if __name__ == '__main__':
+    unittest.main()
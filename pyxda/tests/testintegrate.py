@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for azimuthal integration with a sparse lookup table.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.integrate import Geometry, AzimuthalIntegrator, buildLUT
+from pyxda.rawviewer.mask import PixelMask
+
+##############################################################################
+class TestAzimuthalIntegrator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.geometry = Geometry((60, 80), (30.2, 25.7))
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_geometry(self):
+        """check the pattern range and the geometry keys.
+        """
+        g = self.geometry
+        self.assertEqual(0.0, g.range()[0])
+        self.assertAlmostEqual(np.hypot(79 - 30.2, 59 - 25.7), g.range()[1])
+        self.assertEqual(g.nbins, len(g.axis()))
+        g2 = Geometry((60, 80), (30.2, 25.7), distance=200.0)
+        self.assertNotEqual(g.key, g2.key)
+        self.assertAlmostEqual(np.degrees(np.arctan(0.2 * g.rmax / 200.0)),
+                               g2.range()[1])
+        # A beam centre off the frame.
+        g3 = Geometry((60, 80), (-10, 25))
+        self.assertEqual(10.0, g3.rmin)
+        self.assertRaises(ValueError, Geometry, (60, 80), pixelsize=0,
+                          distance=100.0)
+        return
+
+
+    def test_integrate(self):
+        """check patterns of flat and radial frames.
+        """
+        ai = AzimuthalIntegrator(self.geometry, cachedir=False)
+        flat = np.empty((60, 80), dtype=np.uint16)
+        flat.fill(7)
+        self.assertTrue(np.allclose(7, ai.integrate(flat)))
+        radial = self.geometry.pixels()
+        pattern = ai.integrate(radial)
+        self.assertTrue(np.allclose(ai.radial[2:-2], pattern[2:-2], atol=0.5))
+        self.assertRaises(ValueError, ai.integrate, flat[:, :40])
+        return
+
+
+    def test_mask(self):
+        """check masked pixels are left out of the pattern.
+        """
+        masked = np.zeros((60, 80), dtype=bool)
+        masked[:, 50:] = True
+        mask = PixelMask(masked)
+        ai = AzimuthalIntegrator(self.geometry, mask, cachedir=False)
+        data = np.ones((60, 80), dtype=np.float32)
+        data[masked] = 1e6
+        pattern = ai.integrate(data)
+        covered = np.asarray(ai.lut.sum(axis=1)).ravel() > 0
+        self.assertTrue(np.allclose(1, pattern[covered]))
+        self.assertFalse(covered.all())
+        self.assertRaises(ValueError, AzimuthalIntegrator, self.geometry,
+                          PixelMask(np.zeros((10, 10), dtype=bool)))
+        return
+
+
+    def test_cache(self):
+        """check lookup tables are stored on disk and read back.
+        """
+        ai = AzimuthalIntegrator(self.geometry, cachedir=self.tmpdir)
+        self.assertTrue(os.path.exists(ai.path))
+        ai2 = AzimuthalIntegrator(self.geometry, cachedir=self.tmpdir)
+        self.assertEqual(0, (ai.lut != ai2.lut).nnz)
+        with open(ai.path, 'wb') as fp:
+            fp.write('broken')
+        ai3 = AzimuthalIntegrator(self.geometry, cachedir=self.tmpdir)
+        self.assertEqual(0, (ai.lut != ai3.lut).nnz)
+        ref = buildLUT(self.geometry)
+        self.assertEqual(0, (ai.lut != ref).nnz)
+        return
+
+# End of class TestAzimuthalIntegrator
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for pixel masks.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.mask import PixelMask, loadMask
+from pyxda.rawviewer.reduction import frameStats
+from pyxda.rawviewer.histogram import histogram
+
+##############################################################################
+class TestPixelMask(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rs = np.random.RandomState(3)
+        self.data = rs.randint(0, 1000, (40, 50)).astype(np.uint16)
+        masked = np.zeros((40, 50), dtype=bool)
+        masked[10:20, 5:15] = True
+        masked[33, 7] = True
+        self.data[masked] = 60000
+        self.mask = PixelMask(masked)
+        self.valid = self.data[~masked]
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_stats(self):
+        """check masked statistics match those of the valid pixels.
+        """
+        for dtype in (np.uint16, np.float64):
+            data = self.data.astype(dtype)
+            stats = frameStats(data, 100, 900, blocksize=128, mask=self.mask)
+            ref = frameStats(self.valid.astype(dtype), 100, 900)
+            for field in ('n', 'sum', 'min', 'max', 'above', 'below'):
+                self.assertEqual(ref[field], stats[field])
+            self.assertAlmostEqual(ref['var'], stats['var'], 6)
+        full = PixelMask(np.ones((40, 50), dtype=bool))
+        self.assertEqual(0, frameStats(self.data, mask=full)['n'])
+        self.assertRaises(ValueError, frameStats, self.data[:3],
+                          mask=self.mask)
+        return
+
+
+    def test_histogram(self):
+        """check masked pixels are left out of histograms.
+        """
+        counts, edges = histogram(self.data, mask=self.mask)
+        self.assertEqual(self.valid.size, counts.sum())
+        self.assertTrue(edges[-1] <= 1000)
+        data = np.tile(self.data, (20, 20))
+        mask = PixelMask(np.tile(self.mask.masked, (20, 20)))
+        counts, edges = histogram(data, exact=False, mask=mask)
+        self.assertTrue(edges[-1] <= 1000)
+        return
+
+
+    def test_rect(self):
+        """check drawn rectangles are added and clipped to the frame.
+        """
+        mask = self.mask.addRect(45.5, 39.2, 60, 30)
+        self.assertEqual(len(self.mask) + 5 * 10, len(mask))
+        self.assertTrue(mask.masked[39, 49])
+        self.assertNotEqual(self.mask.key, mask.key)
+        return
+
+
+    def test_load(self):
+        """check masks are read from .npy files.
+        """
+        path = os.path.join(self.tmpdir, 'mask.npy')
+        np.save(path, self.mask.masked.astype(np.uint8))
+        mask = loadMask(path)
+        self.assertEqual(self.mask.key, mask.key)
+        self.assertEqual(self.valid.size, len(mask.valid))
+        return
+
+# End of class TestPixelMask
+
+if __name__ == '__main__':
+    unittest.main()
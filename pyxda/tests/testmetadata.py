@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for lazy and bulk metadata parsing.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyxda.tests.synthetic import makeDataset
+from pyxda.rawviewer import metadata
+from pyxda.rawviewer.metadata import MetadataTable, PARSECHUNK
+from pyxda.rawviewer.imagecontainer import Image
+
+##############################################################################
+class TestMetadataTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = makeDataset(self.tmpdir, 3, (8, 8), np.uint16)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_lazy(self):
+        """check sidecars are only read when the metadata is asked for.
+        """
+        table = MetadataTable()
+        image = Image(1, self.paths[1], table)
+        self.assertEqual(0, len(table))
+        self.assertEqual('1', image.metadata['imageNumber'])
+        self.assertTrue(self.paths[1] in table)
+        os.remove(self.paths[1] + '.metadata')
+        image = Image(1, self.paths[1], table)
+        self.assertEqual('1', image.metadata['imageNumber'])
+        return
+
+
+    def test_missing(self):
+        """check frames without a sidecar have empty metadata.
+        """
+        os.remove(self.paths[0] + '.metadata')
+        self.assertEqual({}, Image(0, self.paths[0]).metadata)
+        return
+
+
+    def test_parseAll(self):
+        """check the bulk parse matches per-frame parsing.
+        """
+        paths = makeDataset(self.tmpdir, PARSECHUNK + 5, (4, 4), np.uint8,
+                            prefix='bulk')
+        table = MetadataTable()
+        poolmin = metadata.POOLMIN
+        metadata.POOLMIN = PARSECHUNK
+        try:
+            mds = table.parseAll(paths, nprocs=2)
+        finally:
+            metadata.POOLMIN = poolmin
+        self.assertEqual(len(paths), len(table))
+        self.assertEqual([Image(i, p).metadata for i, p in enumerate(paths)],
+                         mds)
+        return
+
+# End of class TestMetadataTable
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the job processing metrics.
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from pyxda.rawviewer.metrics import JobMetrics
+
+##############################################################################
+class TestJobMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = JobMetrics()
+        self.metrics.addGauge('hitrate', lambda: 0.5)
+        for depth in (3, 7, 1):
+            token = self.metrics.begin('updatecache', depth)
+            self.metrics.end(token)
+        self.metrics.end(('plotrr', self.metrics.begin('plotrr', 0)[1] - 2.0))
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_snapshot(self):
+        """check counts, percentiles, depths and gauges.
+        """
+        snap = self.metrics.snapshot()
+        self.assertEqual(3, snap['jobs']['updatecache']['count'])
+        self.assertTrue(snap['jobs']['plotrr']['p50'] >= 2.0)
+        self.assertEqual(0, snap['queuedepth'])
+        self.assertEqual(7, snap['maxqueuedepth'])
+        self.assertEqual(0.5, snap['hitrate'])
+        self.assertTrue('plotrr' in self.metrics.logLine())
+        return
+
+
+    def test_dump(self):
+        """check the dump holds the queue depth history.
+        """
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.metrics.dump(path)
+            with open(path) as fp:
+                dump = json.load(fp)
+        finally:
+            os.remove(path)
+        self.assertEqual([3, 7, 1, 0], [d[1] for d in dump['depthhistory']])
+        return
+
+# End of class TestJobMetrics
+
+if __name__ == '__main__':
+    unittest.main()
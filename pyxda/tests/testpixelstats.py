@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for streaming per-pixel stack statistics.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.pixelstats import PixelStats, IMAGES
+from pyxda.rawviewer.rrengine import RREngine
+from pyxda.rawviewer.correction import DarkCorrection
+from pyxda.rawviewer.scheduler import CancelToken
+
+##############################################################################
+class TestPixelStats(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(3)
+        self.frames = [rs.randint(0, 4000, (12, 20)).astype(np.uint16)
+                       for i in range(9)]
+        self.stack = np.array(self.frames, dtype=np.float64)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def check(self, stats, stack):
+        self.assertEqual(len(stack), stats.n)
+        self.assertTrue(np.allclose(stack.mean(axis=0), stats.image('Mean')))
+        self.assertTrue(np.allclose(stack.var(axis=0),
+                                    stats.image('Variance')))
+        self.assertTrue(np.allclose(stack.std(axis=0),
+                                    stats.image('Standard Deviation')))
+        self.assertTrue(np.array_equal(stack.max(axis=0),
+                                       stats.image('Maximum')))
+        self.assertTrue(np.array_equal(stack.min(axis=0),
+                                       stats.image('Minimum')))
+        return
+
+
+    def test_add(self):
+        """check streamed statistics match the whole stack.
+        """
+        stats = PixelStats()
+        for frame in self.frames:
+            stats.add(frame)
+        self.check(stats, self.stack)
+        for name in IMAGES:
+            self.assertEqual((12, 20), stats.image(name).shape)
+        self.assertRaises(KeyError, stats.image, 'Median')
+        self.assertRaises(ValueError, stats.add, np.zeros((3, 3)))
+        return
+
+
+    def test_merge(self):
+        """check merged parts match the whole stack.
+        """
+        parts = [PixelStats() for i in range(3)]
+        for i, frame in enumerate(self.frames):
+            parts[min(i // 2, 2)].add(frame)
+        stats = PixelStats().merge(parts[0]).merge(PixelStats())
+        stats.merge(parts[1]).merge(parts[2])
+        self.check(stats, self.stack)
+        return
+
+
+    def test_stability(self):
+        """check the variance keeps its precision on a large offset.
+        """
+        rs = np.random.RandomState(4)
+        stack = 1e9 + rs.normal(0, 1e-2, (50, 4, 4))
+        stats = PixelStats()
+        for frame in stack[:20]:
+            stats.add(frame)
+        rest = PixelStats()
+        for frame in stack[20:]:
+            rest.add(frame)
+        stats.merge(rest)
+        ref = stack.var(axis=0)
+        self.assertTrue(np.allclose(ref, stats.variance(), rtol=1e-6))
+        return
+
+# End of class TestPixelStats
+
+##############################################################################
+class TestEnginePixelStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rs = np.random.RandomState(5)
+        self.frames = []
+        self.paths = []
+        for i in range(7):
+            data = rs.randint(100, 4000, (16, 32)).astype(np.uint16)
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.frames.append(data)
+            self.paths.append(path)
+        self.stack = np.array(self.frames, dtype=np.float64)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_pool(self):
+        """check statistics gathered over a pool match the serial ones.
+        """
+        engine = RREngine(3)
+        try:
+            stats = engine.pixelStats(self.paths)
+        finally:
+            engine.close()
+        serial = RREngine(1).pixelStats(self.paths)
+        self.assertEqual(7, stats.n)
+        self.assertTrue(np.allclose(serial.mean, stats.mean))
+        self.assertTrue(np.allclose(serial.variance(), stats.variance()))
+        self.assertTrue(np.allclose(self.stack.mean(axis=0), stats.mean))
+        self.assertEqual(None, engine.pixelStats([]))
+        return
+
+
+    def test_correction(self):
+        """check frames are dark corrected and cancellation stops.
+        """
+        engine = RREngine(2)
+        engine.correction = DarkCorrection(np.zeros((16, 32)) + 100)
+        try:
+            stats = engine.pixelStats(self.paths)
+            token = CancelToken()
+            token.cancel()
+            self.assertEqual(None, engine.pixelStats(self.paths, token))
+        finally:
+            engine.close()
+        self.assertTrue(np.allclose(self.stack.mean(axis=0) - 100,
+                                    stats.mean))
+        serial = RREngine(1)
+        self.assertEqual(None, serial.pixelStats(self.paths, token))
+        return
+
+# End of class TestEnginePixelStats
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the neighbour prefetcher.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.imagecontainer import Image, ImageCache
+from pyxda.rawviewer.prefetch import Prefetcher
+
+##############################################################################
+class TestPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.datalist = []
+        for i in range(10):
+            data = np.zeros((8, 8), dtype=np.uint16) + i
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.datalist.append(Image(i, path))
+        self.cache = ImageCache()
+        self.prefetcher = Prefetcher(self.cache, ahead=3, behind=1)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_direction(self):
+        """check frames ahead and behind are loaded.
+        """
+        self.prefetcher.update(self.datalist, 5, -1)
+        self.prefetcher.wait()
+        self.assertEqual([2, 3, 4, 6], sorted(self.cache.cache.keys()))
+        return
+
+
+    def test_hit_rate(self):
+        """check prefetched frames count as hits.
+        """
+        self.prefetcher.update(self.datalist, 0, 1)
+        self.prefetcher.wait()
+        self.prefetcher.record(1)
+        self.prefetcher.record(9)
+        self.assertEqual(1, self.prefetcher.hits)
+        self.assertEqual(1, self.prefetcher.misses)
+        self.assertEqual(0.5, self.prefetcher.hitRate())
+        return
+
+
+    def test_cancel(self):
+        """check stale requests are dropped.
+        """
+        self.prefetcher.generation += 1
+        self.prefetcher.queue.put((0, self.datalist[7]))
+        self.prefetcher.wait()
+        self.assertFalse(7 in self.cache)
+        self.assertTrue(self.datalist[7].data is None)
+        return
+
+# End of class TestPrefetcher
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the multi-resolution image pyramid.
+"""
+
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.pyramid import bin2, buildPyramid, selectLevel
+
+##############################################################################
+class TestPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.arange(8*6, dtype=np.uint16).reshape(6, 8)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_bin2(self):
+        """check mean and max binning of 2x2 blocks.
+        """
+        mean = bin2(self.data)
+        self.assertEqual((3, 4), mean.shape)
+        self.assertEqual(np.uint16, mean.dtype)
+        self.assertEqual((0 + 1 + 8 + 9) // 4, mean[0, 0])
+        mx = bin2(self.data, 'max')
+        self.assertEqual(self.data[:2, 2:4].max(), mx[0, 1])
+        return
+
+
+    def test_levels(self):
+        """check levels are halved down to the minimum size.
+        """
+        data = np.zeros((1000, 600), dtype=np.float32)
+        levels = buildPyramid(data, minsize=256)
+        self.assertTrue(levels[0] is data)
+        self.assertEqual([(1000, 600), (500, 300), (250, 150)],
+                         [level.shape for level in levels])
+        return
+
+
+    def test_select(self):
+        """check the level follows screen size and zoom.
+        """
+        self.assertEqual(2, selectLevel(4, (2048, 2048), (500, 400)))
+        self.assertEqual(3, selectLevel(4, (2048, 2048), (100, 100)))
+        self.assertEqual(0, selectLevel(4, (300, 300), (500, 400)))
+        return
+
+# End of class TestPyramid
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the fused frame statistics kernel.
+"""
+
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.reduction import frameStats, rrValue, CUMBINS
+from pyxda.rawviewer.reduction import countBelow, exactBelow, boundsExact
+from pyxda.rawviewer.reduction import boundCounts
+from pyxda.rawviewer.mask import PixelMask
+from pyxda.rawviewer import pixelbounds
+
+##############################################################################
+class TestFrameStats(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.idata = rs.randint(0, 65535, size=(100, 77)).astype(np.uint16)
+        self.fdata = rs.normal(1e4, 3.0, size=(100, 77)).astype(np.float32)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_integer(self):
+        """check exact statistics of uint16 frames across blocks.
+        """
+        data = self.idata
+        s = frameStats(data, blocksize=1000)
+        self.assertEqual(data.size, s['n'])
+        self.assertEqual(int(data.sum(dtype=np.uint64)), s['sum'])
+        self.assertEqual(data.min(), s['min'])
+        self.assertEqual(data.max(), s['max'])
+        self.assertAlmostEqual(1.0, s['mean'] / data.astype(float).mean())
+        self.assertAlmostEqual(1.0, s['var'] / data.astype(float).var())
+        # uint32 sums are exact, the variance is still accurate.
+        data = self.idata.astype(np.uint32) * 65537 + 1
+        s = frameStats(data, blocksize=1000)
+        self.assertEqual(float(int(data.sum(dtype=np.uint64))), s['sum'])
+        self.assertEqual(int(data.max()), s['max'])
+        self.assertAlmostEqual(1.0, s['var'] / data.astype(float).var())
+        # Offset and 64-bit frames are histogrammed like any other.
+        data = self.idata.astype(np.uint32) + 3000000000
+        s = frameStats(data, blocksize=1000)
+        self.assertEqual(3000000000 + int(self.idata.min()), s['min'])
+        self.assertEqual(data.size, s['cum'][-1])
+        data = np.array([[2**63 + 5, 2**64 - 1]], dtype=np.uint64)
+        s = frameStats(data)
+        self.assertEqual(2, s['cum'][-1])
+        return
+
+
+    def test_float(self):
+        """check stable variance of float frames across blocks.
+        """
+        data = self.fdata
+        s = frameStats(data, blocksize=999)
+        ref = data.astype(np.float64)
+        self.assertAlmostEqual(ref.mean(), s['mean'], 6)
+        self.assertAlmostEqual(1.0, s['var'] / ref.var(), 6)
+        return
+
+
+    def test_bounds(self):
+        """check bound counts agree with pixelbounds.
+        """
+        data = self.idata
+        s = frameStats(data, lower=1000, upper=60000, blocksize=1000)
+        self.assertAlmostEqual(pixelbounds.perc_lower_than(1000, data),
+                               rrValue(s, 'Pixels Below Lower Bound'))
+        self.assertAlmostEqual(pixelbounds.perc_greater_than(60000, data),
+                               rrValue(s, 'Pixels Above Upper Bound'))
+        return
+
+
+    def test_thresholds(self):
+        """check bound counts taken from the cumulative histograms.
+        """
+        small = self.idata[:20] // 300
+        stats = np.array([frameStats(small), frameStats(self.idata)])
+        for upper in (0, 17.5, 100, 218):
+            self.assertAlmostEqual(pixelbounds.perc_greater_than(upper, small),
+                    rrValue(stats, 'Pixels Above Upper Bound', upper=upper)[0])
+        for lower in (-1, 17.5, 100, 219):
+            self.assertAlmostEqual(pixelbounds.perc_lower_than(lower, small),
+                    rrValue(stats, 'Pixels Below Lower Bound', lower=lower)[0])
+        # Wide value ranges are interpolated within a bin.
+        values = rrValue(stats, 'Pixels Below Lower Bound', lower=30000)
+        ref = pixelbounds.perc_lower_than(30000, self.idata)
+        self.assertTrue(abs(values[1] - ref) < 1.0 / CUMBINS)
+        s = frameStats(self.fdata)
+        self.assertTrue(abs(rrValue(s, 'Pixels Below Lower Bound', lower=1e4)
+                            - pixelbounds.perc_lower_than(1e4, self.fdata))
+                        < 0.01)
+        return
+
+
+    def test_hotpixel(self):
+        """check bound counts of frames with a single hot pixel.
+        """
+        rs = np.random.RandomState(3)
+        data = rs.poisson(100, (100, 77)).astype(np.uint16)
+        data[5, 5] = 65535
+        s = frameStats(data)
+        above = 'Pixels Above Upper Bound'
+        # Within the first bin the histograms only give an estimate.
+        self.assertFalse(boundsExact(s, 90, 200)[0])
+        # Counts taken with the bounds are exact and used as such.
+        s = frameStats(data, lower=90, upper=200)
+        self.assertTrue(boundsExact(s, 90, 200)[0])
+        for upper in (110, 200):
+            s = frameStats(data, lower=90, upper=upper)
+            self.assertEqual(pixelbounds.perc_greater_than(upper, data),
+                             rrValue(s, above, upper=upper))
+        self.assertEqual(pixelbounds.perc_lower_than(90, data),
+                         rrValue(s, 'Pixels Below Lower Bound', lower=90))
+        # Bin edges and values outside the pixel range are exact.
+        edge = s['cumlo'] + 3 * s['cumwidth']
+        self.assertTrue(exactBelow(s, edge))
+        self.assertEqual(np.count_nonzero(data < edge), countBelow(s, edge))
+        self.assertTrue(exactBelow(s, 65535.5))
+        self.assertEqual(data.size, countBelow(s, 65535.5))
+        self.assertFalse(exactBelow(s, 65535))
+        self.assertTrue(exactBelow(s, data.min()))
+        self.assertEqual(0, countBelow(s, data.min()))
+        # Value histograms count any bounds exactly.
+        s, hist = frameStats(data, hist=True)
+        for lower, upper in ((90, 110), (95.5, 65534.5), (0, 65535)):
+            self.assertEqual((np.count_nonzero(data < lower),
+                              np.count_nonzero(data > upper)),
+                             boundCounts(hist, lower, upper))
+        self.assertEqual(None, frameStats(self.fdata, hist=True)[1])
+        return
+
+
+    def test_difference(self):
+        """check differences and correlations with the previous frame.
+        """
+        rs = np.random.RandomState(2)
+        prev = self.idata
+        data = (prev + rs.randint(0, 50, prev.shape)).astype(prev.dtype)
+        s = frameStats(data, prev=prev, blocksize=1000)
+        d = data.astype(np.float64) - prev
+        self.assertAlmostEqual(np.sqrt(np.mean(d * d)), s['diff'])
+        ref = np.corrcoef(data.ravel(), prev.ravel())[0, 1]
+        self.assertAlmostEqual(ref, s['corr'])
+        self.assertEqual(s['diff'], rrValue(s, 'Frame Difference'))
+        self.assertEqual(s['corr'], rrValue(s, 'Frame Correlation'))
+        first = frameStats(data)
+        self.assertEqual((0.0, 1.0), (first['diff'], first['corr']))
+        # Frames of another shape are not compared.
+        other = frameStats(data, prev=prev[:10])
+        self.assertEqual(0.0, other['diff'])
+        # Float frames, and masked pixels left out of both frames.
+        masked = np.zeros(prev.shape, dtype=bool)
+        masked[:7] = True
+        fprev = self.fdata
+        fdata = fprev * 0.5 + rs.normal(0, 1.0, fprev.shape)
+        s = frameStats(fdata, prev=fprev, mask=PixelMask(masked),
+                       blocksize=1000)
+        valid = ~masked
+        d = fdata[valid] - fprev[valid]
+        self.assertAlmostEqual(np.sqrt(np.mean(d * d)), s['diff'])
+        ref = np.corrcoef(fdata[valid], fprev[valid])[0, 1]
+        self.assertAlmostEqual(ref, s['corr'])
+        return
+
+
+    def test_rrvalue(self):
+        """check reduced representations served from the statistics.
+        """
+        data = self.idata
+        s = frameStats(data)
+        ref = data.astype(float)
+        self.assertAlmostEqual(1.0, rrValue(s, 'Standard Deviation') / ref.std())
+        self.assertEqual(ref.sum(), rrValue(s, 'Total Intensity'))
+        self.assertRaises(KeyError, rrValue, s, 'Median')
+        return
+
+# End of class TestFrameStats
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for summed area table ROI statistics.
+"""
+
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.roi import IntegralImage
+from pyxda.rawviewer.mask import PixelMask
+
+##############################################################################
+class TestIntegralImage(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(1)
+        self.idata = rs.randint(0, 65535, (60, 80)).astype(np.uint16)
+        self.fdata = rs.normal(5e4, 2.0, (60, 80)).astype(np.float32)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_integer(self):
+        """check exact rectangle statistics of integer frames.
+        """
+        integral = IntegralImage(self.idata)
+        s = integral.stats(70.5, 10, 5, 33.2)
+        ref = self.idata[10:34, 5:71].astype(np.float64)
+        self.assertEqual(ref.size, s['n'])
+        self.assertEqual(ref.sum(), s['sum'])
+        self.assertAlmostEqual(1.0, s['std'] / ref.std())
+        s = integral.stats(-10, -10, 1000, 1000)
+        self.assertEqual(self.idata.size, s['n'])
+        self.assertEqual(0, integral.stats(3, 3, 3, 9)['n'])
+        return
+
+
+    def test_float(self):
+        """check float frames keep the precision of their variance.
+        """
+        s = IntegralImage(self.fdata).stats(0, 0, 40, 30)
+        ref = self.fdata[:30, :40].astype(np.float64)
+        self.assertAlmostEqual(ref.mean(), s['mean'], 6)
+        self.assertAlmostEqual(1.0, s['std'] / ref.std(), 6)
+        return
+
+
+    def test_mask(self):
+        """check masked pixels are left out of rectangles.
+        """
+        masked = np.zeros(self.idata.shape, dtype=bool)
+        masked[20:25, :] = True
+        integral = IntegralImage(self.idata, PixelMask(masked))
+        s = integral.stats(0, 15, 80, 30)
+        ref = self.idata[15:30][~masked[15:30]].astype(np.float64)
+        self.assertEqual(ref.size, s['n'])
+        self.assertEqual(ref.sum(), s['sum'])
+        self.assertAlmostEqual(ref.mean(), s['mean'])
+        return
+
+# End of class TestIntegralImage
+
+if __name__ == '__main__':
+    unittest.main()
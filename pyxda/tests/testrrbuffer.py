@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the growable RR plot buffer.
+"""
+
+import unittest
+
+import numpy as np
+
+from pyxda.rawviewer.rrbuffer import RRBuffer
+
+##############################################################################
+class TestRRBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buf = RRBuffer(capacity=4)
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def test_append(self):
+        """check scalars and arrays are appended in order.
+        """
+        self.buf.append(1.5)
+        self.buf.append(np.array([2.0, 3.0]))
+        self.assertEqual([1.5, 2.0, 3.0], list(self.buf.values))
+        self.assertEqual([0, 1, 2], list(self.buf.index))
+        return
+
+
+    def test_growth(self):
+        """check capacity doubles and old values survive.
+        """
+        for i in range(5):
+            self.buf.append(i)
+        self.assertEqual(8, self.buf.capacity)
+        self.buf.append(np.arange(5, 20))
+        self.assertEqual(32, self.buf.capacity)
+        self.assertEqual(range(20), list(self.buf.values))
+        self.assertEqual(range(20), list(self.buf.index))
+        return
+
+# End of class TestRRBuffer
+
+if __name__ == '__main__':
+    unittest.main()
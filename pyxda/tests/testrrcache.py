@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the persistent reduced representation cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer import rrcache
+from pyxda.rawviewer.rrcache import RRCache
+from pyxda.rawviewer.rrengine import RREngine
+
+##############################################################################
+class TestRRCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(4):
+            data = np.arange(16*16, dtype=np.uint16).reshape(16, 16) + i
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            os.utime(path, (1e9, 1e9))
+            self.paths.append(path)
+        self.cache = RRCache(self.tmpdir)
+        self.engine = RREngine(nprocs=1)
+        return
+
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_roundtrip(self):
+        """check frames are served from the cache without decoding.
+        """
+        first = list(self.engine.imap(self.paths, cache=self.cache))
+        # Corrupt a frame while keeping its size and mtime.
+        with open(self.paths[0], 'r+b') as fp:
+            fp.write('\0' * 8)
+        os.utime(self.paths[0], (1e9, 1e9))
+        self.cache.close()
+        cache = RRCache(self.tmpdir)
+        second = list(self.engine.imap(self.paths, cache=cache))
+        cache.close()
+        self.assertEqual([s['sum'] for s in first], [s['sum'] for s in second])
+        self.assertEqual(first[2]['cum'].tolist(), second[2]['cum'].tolist())
+        return
+
+
+    def test_modified(self):
+        """check modified frames and other bounds are misses.
+        """
+        list(self.engine.imap(self.paths, cache=self.cache))
+        os.utime(self.paths[1], (1e9, 1e9 + 10))
+        stats, keys = self.cache.lookup(self.paths)
+        # The frame after a modified one has a new frame difference.
+        self.assertEqual([False, True, True, False],
+                         [s is None for s in stats])
+        stats, keys = self.cache.lookup(self.paths, upper=5)
+        self.assertTrue(all(s is None for s in stats))
+        return
+
+
+    def test_compare(self):
+        """check frames reduced without comparing are reduced again.
+        """
+        plain = list(self.engine.imap(self.paths, cache=self.cache,
+                                      compare=False))
+        self.assertTrue(all(np.isnan(s['diff']) for s in plain))
+        again = list(self.engine.imap(self.paths, cache=self.cache,
+                                      compare=False))
+        self.assertTrue(all(np.isnan(s['diff']) for s in again))
+        compared = list(self.engine.imap(self.paths, cache=self.cache))
+        self.assertEqual([0.0, 1.0, 1.0, 1.0],
+                         [s['diff'] for s in compared])
+        stats, keys = self.cache.lookup(self.paths)
+        self.assertEqual([1.0] * 4, [s['corr'] for s in stats])
+        return
+
+
+    def test_keys(self):
+        """check file stats from a directory scan are used as given.
+        """
+        first = list(self.engine.imap(self.paths, cache=self.cache))
+        keys = [(os.path.getsize(path), 1e9) for path in self.paths]
+        keys[2] = None
+        stats, found = self.cache.lookup(self.paths, keys=keys)
+        self.assertEqual(keys, found)
+        self.assertEqual([False, False, True, True],
+                         [s is None for s in stats])
+        self.assertEqual(first[1]['sum'], stats[1]['sum'])
+        return
+
+
+    def test_batches(self):
+        """check only the requested frames are looked up, in batches.
+        """
+        first = list(self.engine.imap(self.paths, cache=self.cache))
+        batch = rrcache.LOOKUPBATCH
+        rrcache.LOOKUPBATCH = 2
+        try:
+            before = (self.paths[0], (os.path.getsize(self.paths[0]), 1e9))
+            stats, keys = self.cache.lookup(self.paths[1:], prev=before)
+        finally:
+            rrcache.LOOKUPBATCH = batch
+        self.assertEqual([s['sum'] for s in first[1:]],
+                         [s['sum'] for s in stats])
+        stats, keys = self.cache.lookup([])
+        self.assertEqual(([], []), (stats, keys))
+        return
+
+    def test_histograms(self):
+        """check bounds are counted from cached value histograms.
+        """
+        list(self.engine.imap(self.paths[:3], cache=self.cache))
+        ref = [(np.count_nonzero(data < 100), np.count_nonzero(data > 200))
+               for data in [np.arange(256) + i for i in range(4)]]
+        # Corrupt a frame while keeping its size and mtime.
+        with open(self.paths[1], 'r+b') as fp:
+            fp.seek(-64, os.SEEK_END)
+            fp.write('\0' * 64)
+        os.utime(self.paths[1], (1e9, 1e9))
+        counts = list(self.engine.countBounds(self.paths, 100, 200,
+                                              cache=self.cache))
+        self.assertEqual(ref, counts)
+        hists, keys = self.cache.lookupHistograms(self.paths)
+        self.assertEqual([False, False, False, True],
+                         [h is None for h in hists])
+        self.assertEqual(range(2, 258), hists[2][0].tolist())
+        return
+
+
+    def test_layout(self):
+        """check databases of another layout are emptied.
+        """
+        list(self.engine.imap(self.paths, cache=self.cache))
+        conn = self.cache._connect()
+        with conn:
+            conn.execute('CREATE TABLE rrstats4 (path TEXT)')
+            conn.execute('PRAGMA user_version = %d' % (rrcache.LAYOUT - 1))
+        self.cache.close()
+        cache = RRCache(self.tmpdir)
+        stats, keys = cache.lookup(self.paths)
+        tables = [row[0] for row in cache._connect().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        cache.close()
+        self.assertTrue(all(s is None for s in stats))
+        self.assertEqual(sorted([rrcache.TABLE, rrcache.HISTTABLE]),
+                         sorted(tables))
+        return
+
+# End of class TestRRCache
+
+if __name__ == '__main__':
+    unittest.main()
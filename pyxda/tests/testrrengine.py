@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the parallel reduced representation engine.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.rrengine import RREngine
+from pyxda.rawviewer.mask import PixelMask
+
+##############################################################################
+class TestRREngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.frames = []
+        self.paths = []
+        for i in range(5):
+            data = (np.arange(32*16, dtype=np.uint16) * (i + 1)).reshape(16, 32)
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.frames.append(data)
+            self.paths.append(path)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_serial(self):
+        """check reduction in the calling thread.
+        """
+        engine = RREngine(nprocs=1)
+        rr = [s['sum'] for s in engine.imap(self.paths)]
+        self.assertEqual([float(np.sum(f)) for f in self.frames], rr)
+        return
+
+
+    def test_pool_ordered(self):
+        """check pool results come back in frame order.
+        """
+        engine = RREngine(nprocs=2, maxinflight=2)
+        try:
+            rr = [s['mean'] for s in engine.imap(self.paths)]
+        finally:
+            engine.close()
+        self.assertEqual([float(np.mean(f)) for f in self.frames], rr)
+        return
+
+
+    def test_bounds(self):
+        """check pixel bounds are passed to the workers.
+        """
+        engine = RREngine(nprocs=1)
+        stats = list(engine.imap(self.paths[:1], lower=10, upper=500))
+        data = self.frames[0]
+        self.assertEqual(np.count_nonzero(data < 10), stats[0]['below'])
+        self.assertEqual(np.count_nonzero(data > 500), stats[0]['above'])
+        self.assertEqual((10, 500), (stats[0]['lowerbound'],
+                                     stats[0]['upperbound']))
+        return
+
+
+    def test_count_bounds(self):
+        """check exact bound counts of frames read again, with a mask.
+        """
+        masked = np.zeros((16, 32), dtype=bool)
+        masked[:, :3] = True
+        ref = [(np.count_nonzero(f[~masked] < 100),
+                np.count_nonzero(f[~masked] > 1000)) for f in self.frames]
+        for nprocs in (1, 2):
+            engine = RREngine(nprocs=nprocs, maxinflight=2)
+            engine.mask = PixelMask(masked)
+            try:
+                counts = list(engine.countBounds(self.paths, 100, 1000))
+            finally:
+                engine.close()
+            self.assertEqual(ref, counts)
+        return
+
+    def test_difference(self):
+        """check frame differences across runs and continued reductions.
+        """
+        engine = RREngine(nprocs=2, maxinflight=4)
+        try:
+            pooled = list(engine.imap(self.paths))
+        finally:
+            engine.close()
+        serial = RREngine(nprocs=1)
+        rest = list(serial.imap(self.paths[2:], prev=self.paths[1]))
+        for i in range(1, 5):
+            d = self.frames[i].astype(np.float64) - self.frames[i - 1]
+            self.assertAlmostEqual(np.sqrt(np.mean(d * d)), 
+                                   pooled[i]['diff'])
+        self.assertEqual(0.0, pooled[0]['diff'])
+        self.assertEqual([s['diff'] for s in pooled[2:]], 
+                         [s['diff'] for s in rest])
+        self.assertEqual([s['corr'] for s in pooled[2:]], 
+                         [s['corr'] for s in rest])
+        for i in range(1, 5):
+            ref = np.corrcoef(self.frames[i].ravel(),
+                              self.frames[i - 1].ravel())[0, 1]
+            self.assertAlmostEqual(ref, pooled[i]['corr'])
+        # A known record of the frame before is used as it is.
+        known = list(serial.imap(self.paths[2:], prev=self.paths[1],
+                                 prevstats=pooled[1]))
+        self.assertEqual([s['corr'] for s in rest],
+                         [s['corr'] for s in known])
+        # Frames that are not compared.
+        plain = list(serial.imap(self.paths, compare=False))
+        self.assertTrue(np.isnan([(s['diff'], s['corr'])
+                                  for s in plain]).all())
+        self.assertEqual([s['mean'] for s in pooled],
+                         [s['mean'] for s in plain])
+        return
+
+# End of class TestRREngine
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the directory scanner.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyxda.rawviewer.scanner import scanDirectory, listFrames, naturalKey
+
+##############################################################################
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for n in (10, 2, 1, 33):
+            path = os.path.join(self.tmpdir, 'frame%d.tif' % n)
+            with open(path, 'w') as fp:
+                fp.write('x' * n)
+            with open(path + '.metadata', 'w') as fp:
+                fp.write('[scan]\nimageNumber=%d\n' % (40 - n))
+        os.mkdir(os.path.join(self.tmpdir, 'dir.tif'))
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def names(self, paths):
+        return [os.path.basename(path) for path in paths]
+
+
+    def test_natural(self):
+        """check frames are sorted by the value of their numbers.
+        """
+        self.assertEqual(['frame1.tif', 'frame2.tif', 'frame10.tif',
+                          'frame33.tif'], self.names(listFrames(self.tmpdir)))
+        self.assertTrue(naturalKey('B2') < naturalKey('b10'))
+        return
+
+
+    def test_imageNumber(self):
+        """check frames can be sorted by their metadata image number.
+        """
+        paths = listFrames(self.tmpdir, order='imageNumber')
+        self.assertEqual(['frame33.tif', 'frame10.tif', 'frame2.tif',
+                          'frame1.tif'], self.names(paths))
+        self.assertRaises(ValueError, listFrames, self.tmpdir, order='mtime')
+        return
+
+
+    def test_batches(self):
+        """check batches carry the file stats and grow after the first.
+        """
+        os.rmdir(os.path.join(self.tmpdir, 'dir.tif'))
+        batches = list(scanDirectory(self.tmpdir, firstbatch=1, batchsize=2))
+        self.assertEqual([1, 2, 1], [len(batch[0]) for batch in batches])
+        paths, sizes, mtimes = batches[1]
+        self.assertEqual([2, 10], sizes)
+        self.assertEqual([os.path.getmtime(path) for path in paths], mtimes)
+        return
+
+# End of class TestScanner
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the priority job queue.
+"""
+
+import unittest
+
+from pyxda.rawviewer.scheduler import JobQueue, CancelToken
+
+##############################################################################
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = JobQueue()
+        return
+
+
+    def tearDown(self):
+        return
+
+
+    def drain(self):
+        jobs = []
+        while not self.queue.empty():
+            jobs.append(self.queue.get()[0])
+            self.queue.task_done()
+        return jobs
+
+
+    def test_priority(self):
+        """check navigation preempts bulk work and loading stays in order.
+        """
+        self.queue.put(['extendrr', []])
+        self.queue.put(['newimage', {'path': 'a'}])
+        self.queue.put(['initcache'])
+        self.queue.put(['newimage', {'path': 'b'}])
+        self.queue.put(['updatecache', ['right']])
+        self.queue.put(['plotrr', ['Mean']])
+        self.queue.put(['reset'])
+        self.assertEqual(['reset', 'updatecache', 'plotrr', 'newimage',
+                          'initcache', 'newimage', 'extendrr'], self.drain())
+        return
+
+
+    def test_cancel(self):
+        """check jobs of a cancelled token are dropped.
+        """
+        token = CancelToken()
+        self.queue.put(['extendrr', [token]], token=token)
+        self.queue.put(['extendrr'])
+        token.cancel()
+        self.assertEqual(['extendrr'], self.drain())
+        self.queue.join()
+        return
+
+
+    def test_clear(self):
+        """check clear drops queued jobs and their task counts.
+        """
+        for i in range(3):
+            self.queue.put(['newimage', {'path': str(i)}])
+        self.queue.clear()
+        self.assertTrue(self.queue.empty())
+        self.queue.join()
+        return
+
+# End of class TestJobQueue
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the HDF5 stack dataset backend.
+"""
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.batch import convertDirectory, reduceDirectory
+from pyxda.rawviewer.stack import stackPath, splitStackPath, closeStacks, \
+                                  writeStack, frameName, NAMES
+from pyxda.rawviewer.scanner import scanDataset
+from pyxda.rawviewer.metadata import MetadataTable
+from pyxda.rawviewer.frameindex import FrameIndex
+from pyxda.rawviewer.tiffreader import readFrame
+from pyxda.rawviewer.rrcache import RRCache
+
+##############################################################################
+class TestStack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.framedir = os.path.join(self.tmpdir, 'frames')
+        os.mkdir(self.framedir)
+        rs = np.random.RandomState(0)
+        self.frames = []
+        for i in range(12):
+            data = rs.randint(0, 1000, (16, 24)).astype(np.uint16)
+            path = os.path.join(self.framedir, 'frame%d.tif' % i)
+            tifimage(data=data).write(path)
+            self.frames.append(data)
+        with open(os.path.join(self.framedir, 'frame10.tif.metadata'),
+                  'w') as fp:
+            fp.write('[Metadata]\nimageNumber=10\ntitle=\n')
+        self.h5path = os.path.join(self.tmpdir, 'stack.h5')
+        self.info = convertDirectory(self.framedir, self.h5path)
+        return
+
+
+    def tearDown(self):
+        closeStacks()
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_paths(self):
+        """check stack frame paths are split back.
+        """
+        path = stackPath(self.h5path, 7)
+        self.assertEqual((self.h5path, 7), splitStackPath(path))
+        self.assertEqual(None, splitStackPath(self.h5path))
+        self.assertEqual(None, splitStackPath('a::b'))
+        return
+
+
+    def test_read(self):
+        """check converted frames are read back in natural order.
+        """
+        self.assertEqual(12, self.info['frames'])
+        batches = list(scanDataset(self.h5path, firstbatch=5, batchsize=4))
+        self.assertEqual([5, 4, 3], [len(batch[0]) for batch in batches])
+        size = os.path.getsize(self.h5path)
+        self.assertEqual([size] * 5, batches[0][1])
+        index = FrameIndex()
+        for batch in batches:
+            index.extend(*batch)
+        for i in range(12):
+            self.assertTrue(np.array_equal(self.frames[i],
+                                           readFrame(index.path(i))))
+        image = index[11]
+        image.load()
+        self.assertTrue(np.array_equal(self.frames[11], image.data))
+        return
+
+
+    def test_metadata(self):
+        """check metadata columns are read for the whole stack.
+        """
+        mdtable = MetadataTable()
+        md = mdtable.get(stackPath(self.h5path, 10))
+        self.assertEqual({'imageNumber': '10'}, md)
+        self.assertEqual(12, len(mdtable))
+        self.assertEqual({}, mdtable.get(stackPath(self.h5path, 0)))
+        mds = MetadataTable().parseAll([stackPath(self.h5path, i)
+                                        for i in (10, 3)])
+        self.assertEqual('10', mds[0]['imageNumber'])
+        self.assertEqual({}, mds[1])
+        return
+
+
+    def test_names(self):
+        """check frames keep the names of the files they were converted from.
+        """
+        index = FrameIndex()
+        for batch in scanDataset(self.h5path):
+            index.extend(*batch)
+        names = ['frame%d.tif' % i for i in range(12)]
+        self.assertEqual(names, [index.name(i) for i in range(12)])
+        self.assertEqual('frame11.tif', index[11].name)
+        # Stacks written without names fall back to the frame path.
+        closeStacks()
+        with h5py.File(self.h5path, 'a') as fp:
+            del fp[NAMES]
+        self.assertEqual('stack.h5::11', frameName(index.path(11)))
+        return
+
+
+    def test_reduce(self):
+        """check a stack reduces like its directory, over a pool.
+        """
+        output = os.path.join(self.tmpdir, 'rr.csv')
+        info = reduceDirectory(self.h5path, nprocs=2, metadata=True)
+        self.assertEqual(output, info['output'])
+        # The stack file is counted once, not once per frame.
+        self.assertAlmostEqual(os.path.getsize(self.h5path) / 2.0**20,
+                               info['mbpersecond'] * info['seconds'])
+        with open(output) as fp:
+            rows = list(csv.reader(line for line in fp 
+                                   if not line.startswith('#')))
+        means = [float(row[5]) for row in rows[1:]]
+        self.assertTrue(np.allclose([f.mean() for f in self.frames], means))
+        self.assertEqual('frame3.tif', rows[4][2])
+        self.assertEqual('10', rows[11][-1])
+        cache = RRCache(self.h5path)
+        self.assertEqual(self.tmpdir, cache.dirpath)
+        key = (os.path.getsize(self.h5path), os.path.getmtime(self.h5path))
+        stats, keys = cache.lookup([stackPath(self.h5path, 3)], keys=[key],
+                                   prev=(stackPath(self.h5path, 2), key))
+        self.assertEqual(means[3], stats[0]['mean'])
+        cache.close()
+        return
+
+
+    def test_write(self):
+        """check frames of another shape are rejected.
+        """
+        frames = [np.zeros((4, 4)), np.zeros((4, 5))]
+        self.assertRaises(ValueError, writeStack, self.h5path, frames,
+                          ['a', 'b'])
+        return
+
+# End of class TestStack
+
+if __name__ == '__main__':
+    unittest.main()
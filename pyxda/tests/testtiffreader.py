@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the memory-mapped TIFF reader.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+import fabio
+from fabio.tifimage import tifimage
+
+from pyxda.rawviewer.tiffreader import tiffLayout, readFrame
+
+def writeStrips(path, data, rowsperstrip, bo='>', skip=()):
+    '''Writes an uncompressed TIFF with several strips, leaving out the
+    tags in skip'''
+    height, width = data.shape
+    nstrips = (height + rowsperstrip - 1) // rowsperstrip
+    stripbytes = [min(rowsperstrip, height - i * rowsperstrip) * width * 2
+                  for i in range(nstrips)]
+    ntags = 8 - len(skip)
+    ifd = 8
+    extra = ifd + 2 + 12 * ntags + 4
+    pixels = extra + 8 * nstrips
+    offsets = [pixels + sum(stripbytes[:i]) for i in range(nstrips)]
+    entries = [(256, 4, 1, width), (257, 4, 1, height), (258, 3, 1, 16),
+               (259, 3, 1, 1), (273, 4, nstrips, extra),
+               (277, 3, 1, 1), (278, 4, 1, rowsperstrip),
+               (279, 4, nstrips, extra + 4 * nstrips)]
+    entries = [entry for entry in entries if entry[0] not in skip]
+    with open(path, 'wb') as fp:
+        fp.write((bo == '<' and 'II*\0' or 'MM\0*') + struct.pack(bo + 'I', ifd))
+        fp.write(struct.pack(bo + 'H', ntags))
+        for tag, ftype, n, value in entries:
+            if ftype == 3 and n == 1:
+                fp.write(struct.pack(bo + 'HHIHH', tag, ftype, n, value, 0))
+            else:
+                fp.write(struct.pack(bo + 'HHII', tag, ftype, n, value))
+        fp.write(struct.pack(bo + 'I', 0))
+        fp.write(struct.pack(bo + 'I' * nstrips, *offsets))
+        fp.write(struct.pack(bo + 'I' * nstrips, *stripbytes))
+        fp.write(data.astype(bo + 'u2').tostring())
+    return
+
+##############################################################################
+class TestTiffReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.data = (np.arange(40*30) * 7 % 65536).astype(np.uint16)
+        self.data = self.data.reshape(40, 30)
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def test_fabio_tiff(self):
+        """check a TIFF written by fabio is memory mapped.
+        """
+        path = os.path.join(self.tmpdir, 'fabio.tif')
+        tifimage(data=self.data).write(path)
+        self.assertTrue(tiffLayout(path))
+        data = readFrame(path)
+        self.assertTrue(isinstance(data, np.memmap))
+        self.assertFalse(data.flags.writeable)
+        self.assertTrue(np.array_equal(fabio.open(path).data, data))
+        return
+
+
+    def test_strips(self):
+        """check contiguous big-endian strips are memory mapped.
+        """
+        path = os.path.join(self.tmpdir, 'strips.tif')
+        writeStrips(path, self.data, 7)
+        offset, dtype, shape = tiffLayout(path)
+        self.assertEqual((40, 30), shape)
+        self.assertEqual('>', dtype.byteorder)
+        self.assertTrue(np.array_equal(self.data, readFrame(path)))
+        return
+
+
+    def test_missing_tags(self):
+        """check TIFFs without their dimensions fall back to fabio.
+        """
+        for tag in (256, 257):
+            path = os.path.join(self.tmpdir, 'notag%d.tif' % tag)
+            writeStrips(path, self.data, 7, skip=(tag,))
+            self.assertEqual(None, tiffLayout(path))
+        return
+
+
+    def test_fallback(self):
+        """check other formats fall back to fabio.
+        """
+        path = os.path.join(self.tmpdir, 'frame.edf')
+        fabio.edfimage.edfimage(data=self.data).write(path)
+        self.assertEqual(None, tiffLayout(path))
+        self.assertTrue(np.array_equal(self.data, readFrame(path)))
+        return
+
+# End of class TestTiffReader
+
+if __name__ == '__main__':
+    unittest.main()
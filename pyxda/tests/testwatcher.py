@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding=utf-8
+##############################################################################
+#
+# pyxda.srxes       X-ray Data Analysis Library
+#                   (c) 2013 National Synchrotron Light Source II,
+#                   Brookhaven National Laboratory, Upton, NY.
+#                   All rights reserved.
+#
+# File coded by:    Michael Saltzman
+#
+# See AUTHORS.txt for a list of people who contributed.
+# See LICENSE.txt for license information.
+#
+##############################################################################
+
+"""Unit tests for the live mode directory watcher.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyxda.rawviewer.watcher import DirectoryWatcher
+
+##############################################################################
+class TestDirectoryWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.old = self.write('old.tif')
+        return
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+
+    def write(self, name, nbytes=16):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'ab') as fp:
+            fp.write('x' * nbytes)
+        return path
+
+
+    def test_new_frames(self):
+        """check only new, complete frames are reported once.
+        """
+        watcher = DirectoryWatcher(self.tmpdir, known=[self.old])
+        new = self.write('new.tif')
+        self.write('notes.txt')
+        found = watcher.poll(0.05) + watcher.poll(0.05)
+        self.assertEqual([new], found)
+        self.assertEqual([], watcher.poll(0.01))
+        watcher.close()
+        return
+
+
+    def test_written_in_steps(self):
+        """check frames are reported only once their writer closed them.
+        """
+        watcher = DirectoryWatcher(self.tmpdir, known=[self.old])
+        if watcher.fd is None:
+            watcher.close()
+            self.skipTest('inotify is not available')
+        path = os.path.join(self.tmpdir, 'slow.tif')
+        fp = open(path, 'wb')
+        fp.write('x' * 16)
+        fp.flush()
+        self.assertEqual([], watcher.poll(0.01))
+        self.assertEqual([], watcher.poll(0.01))
+        fp.write('x' * 16)
+        fp.flush()
+        self.assertEqual([], watcher.poll(0.01))
+        self.assertEqual([], watcher.poll(0.01))
+        fp.close()
+        self.assertEqual([path], watcher.poll(0.05))
+        self.assertEqual([], watcher.poll(0.01))
+        watcher.close()
+        return
+
+
+    def test_polling_fallback(self):
+        """check frames are held back while their size changes.
+        """
+        watcher = DirectoryWatcher(self.tmpdir, known=[self.old])
+        watcher.close()
+        path = self.write('grow.tif')
+        self.assertEqual([], watcher.poll(0.01))
+        self.write('grow.tif')
+        self.assertEqual([], watcher.poll(0.01))
+        self.assertEqual([path], watcher.poll(0.01))
+        return
+
+# End of class TestDirectoryWatcher
+
+if __name__ == '__main__':
+    unittest.main()